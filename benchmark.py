@@ -0,0 +1,423 @@
+# benchmark.py
+# ============================================
+# 性能基准测试 (开发用，不参与中枢运行)
+# 用法: python benchmark.py <场景> [参数]
+# ============================================
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, Any, List
+
+
+# ==========================================
+# 流量样本 (模拟真实互通流量的组成)
+# ==========================================
+
+def _chat_frame(i: int) -> str:
+    return json.dumps({
+        "post_type": "message", "message_type": "group", "group_id": 123456789,
+        "sender": {"nickname": f"玩家{i % 50}", "card": ""},
+        "raw_message": "今天服务器好卡啊，有人在刷红石吗？" * random.randint(1, 3),
+    }, ensure_ascii=False)
+
+
+def _notice_frame(i: int) -> str:
+    return json.dumps({
+        "post_type": "notice", "event_name": "PlayerJoinEvent", "sub_type": "player_join",
+        "server_name": "Survival", "player": {"nickname": f"Steve{i % 50}", "uuid": "0" * 32, "x": 1.0, "y": 64.0, "z": -3.5},
+    }, ensure_ascii=False)
+
+
+def _large_frame(i: int) -> str:
+    # 模拟携带 base64 图片等大数据包
+    return json.dumps({"post_type": "message", "raw_message": "A" * 65536, "seq": i})
+
+
+def build_traffic_mix(count: int) -> List[str]:
+    """
+    流量组成：70% 聊天、25% 进出服通知、5% 大数据包
+    """
+    random.seed(42)
+    frames = []
+    for i in range(count):
+        roll = random.random()
+        if roll < 0.70:
+            frames.append(_chat_frame(i))
+        elif roll < 0.95:
+            frames.append(_notice_frame(i))
+        else:
+            frames.append(_large_frame(i))
+    return frames
+
+
+# ==========================================
+# 场景: WebSocket 连接参数 (ws)
+# ==========================================
+
+WS_VARIANTS: Dict[str, Dict[str, Any]] = {
+    "默认(压缩开)": {},
+    "压缩关": {"compression": None},
+    "写缓冲 4K/1K": {"compression": None, "write_limit": (4096, 1024)},
+    "写缓冲 256K/64K": {"compression": None, "write_limit": (262144, 65536)},
+    "接收队列 4": {"compression": None, "max_queue": 4},
+    "接收队列 128": {"compression": None, "max_queue": 128},
+    "ping 1s": {"compression": None, "ping_interval": 1, "ping_timeout": 1},
+    "max_size 1MiB": {"compression": None, "max_size": 2**20},
+}
+
+
+async def _run_ws_variant(frames: List[str], options: Dict[str, Any]) -> Dict[str, float]:
+    from websockets.asyncio.server import serve
+    from websockets.asyncio.client import connect
+
+    options = {"max_size": 2**24, **options}
+    received = 0
+    done = asyncio.Event()
+
+    async def sink(websocket):
+        nonlocal received
+        async for _ in websocket:
+            received += 1
+            if received == len(frames):
+                done.set()
+
+    tracemalloc.start()
+    async with serve(sink, "127.0.0.1", 0, **options) as server:
+        port = server.sockets[0].getsockname()[1]
+        async with connect(f"ws://127.0.0.1:{port}", **options) as ws:
+            start = time.perf_counter()
+            for frame in frames:
+                await ws.send(frame)
+            await done.wait()
+            elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_bytes = sum(len(f.encode("utf-8")) for f in frames)
+    return {
+        "msg_per_s": len(frames) / elapsed,
+        "mib_per_s": total_bytes / elapsed / 2**20,
+        "peak_mib": peak / 2**20,
+    }
+
+
+def bench_ws(args):
+    frames = build_traffic_mix(args.count)
+    print(f"[ws] {args.count} 帧 (70% 聊天 / 25% 通知 / 5% 64KiB 大包)，本机回环")
+    print(f"{'参数组合':<18}{'消息/秒':>12}{'MiB/秒':>10}{'峰值内存MiB':>14}")
+    for name, options in WS_VARIANTS.items():
+        result = asyncio.run(_run_ws_variant(frames, options))
+        print(f"{name:<18}{result['msg_per_s']:>12.0f}{result['mib_per_s']:>10.1f}{result['peak_mib']:>14.1f}")
+
+
+# ==========================================
+# 场景: QQ 富文本消息段解析 (segments)
+# ==========================================
+
+def _rich_message(segment_count: int) -> List[Dict[str, Any]]:
+    kinds = [
+        {"type": "text", "data": {"text": "看这个"}},
+        {"type": "face", "data": {"id": "14"}},
+        {"type": "at", "data": {"qq": "10001"}},
+        {"type": "image", "data": {"file": "abc.jpg", "summary": "[图片]", "sub_type": 0}},
+        {"type": "text", "data": {"text": "https://example.com/a"}},
+        {"type": "reply", "data": {"id": "42"}},
+    ]
+    return [kinds[i % len(kinds)] for i in range(segment_count)]
+
+
+def _to_cq_string(segments: List[Dict[str, Any]]) -> str:
+    parts = []
+    for seg in segments:
+        if seg["type"] == "text":
+            parts.append(seg["data"]["text"])
+        else:
+            params = ",".join(f"{k}={v}" for k, v in seg["data"].items())
+            parts.append(f"[CQ:{seg['type']},{params}]")
+    return "".join(parts)
+
+
+def bench_segments(args):
+    import qqMessageParser
+
+    import groupMetaCache
+
+    # 预热群名片缓存，排除 API 调用的影响
+    groupMetaCache.observe_message({"group_id": 1, "user_id": 10001, "sender": {"card": "群友A"}})
+
+    print(f"[segments] 每种规模 {args.count} 条消息")
+    print(f"{'消息段数':>8}{'数组格式 µs/条':>16}{'CQ 字符串 µs/条':>18}")
+    for segment_count in (1, 8, 32, 128):
+        array_msg = {"message": _rich_message(segment_count)}
+        cq_msg = {"message": _to_cq_string(array_msg["message"])}
+
+        async def run(msg):
+            start = time.perf_counter()
+            for _ in range(args.count):
+                segments = qqMessageParser.parse_segments(msg)
+                await qqMessageParser.segments_to_components(segments, 1)
+            return (time.perf_counter() - start) / args.count * 1e6
+
+        array_us = asyncio.run(run(array_msg))
+        cq_us = asyncio.run(run(cq_msg))
+        print(f"{segment_count:>8}{array_us:>16.1f}{cq_us:>18.1f}")
+
+
+# ==========================================
+# 场景: 历史记录批量写入 (history)
+# ==========================================
+
+def _history_rows(frames: List[str]) -> List[tuple]:
+    rows = []
+    for i, frame in enumerate(frames):
+        data = json.loads(frame)
+        if data.get("post_type") == "notice":
+            rows.append((1.7e9 + i, "mc", data["sub_type"], data["server_name"],
+                         data["player"]["nickname"], data["player"]["uuid"], None))
+        else:
+            sender = (data.get("sender") or {}).get("nickname") or "?"
+            rows.append((1.7e9 + i, "qq", "group_message", "测试群", sender, None, data["raw_message"]))
+    return rows
+
+
+def bench_history(args):
+    import os
+    import tempfile
+    import chatHistory
+
+    rows = _history_rows(build_traffic_mix(args.count))
+    print(f"[history] {len(rows)} 条记录 (按 ws 场景的流量组成)，WAL + FTS5 trigram")
+    print(f"{'每批条数':>8}{'条/秒':>12}{'事务数':>8}{'搜索 ms':>10}")
+    for batch_size in (1, 10, 100, 1000):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.db")
+            conn = chatHistory._open_connection(path)
+            conn.executescript(chatHistory._SCHEMA)
+            conn.executescript(chatHistory._FTS_SCHEMA)
+
+            start = time.perf_counter()
+            for i in range(0, len(rows), batch_size):
+                with conn:
+                    conn.executemany(chatHistory._INSERT_SQL, rows[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            conn.execute(
+                "SELECT h.id FROM history_fts f JOIN history h ON h.id = f.rowid "
+                "WHERE history_fts MATCH ? ORDER BY h.id DESC LIMIT 10", ('"刷红石"',)
+            ).fetchall()
+            search_ms = (time.perf_counter() - start) * 1e3
+            conn.close()
+
+        transactions = (len(rows) + batch_size - 1) // batch_size
+        print(f"{batch_size:>8}{len(rows) / elapsed:>12.0f}{transactions:>8}{search_ms:>10.2f}")
+
+
+# ==========================================
+# 场景: 多进程共享监听端口 (cluster)
+# ==========================================
+
+def _cluster_server(port: int, ready):
+    """
+    子进程：SO_REUSEPORT 监听，对每帧执行与 QQ → MC 主路径相同的解析与组件转换
+    """
+    import qqMessageParser
+    import groupMetaCache
+    from websockets.asyncio.server import serve
+
+    groupMetaCache.observe_message({"group_id": 1, "user_id": 10001, "sender": {"card": "群友A"}})
+
+    async def handler(websocket):
+        async for message in websocket:
+            data = json.loads(message)
+            segments = qqMessageParser.parse_segments(data)
+            components = await qqMessageParser.segments_to_components(segments, 1)
+            json.dumps(components, ensure_ascii=False)
+            await websocket.send("1")
+
+    async def run():
+        async with serve(handler, "127.0.0.1", port, reuse_port=True, compression=None):
+            ready.set()
+            await asyncio.Future()
+
+    asyncio.run(run())
+
+
+def _cluster_client(port: int, connections: int, count: int, frame: str, results):
+    """
+    子进程：建立多条连接，每条连接发送 count 帧并等待全部回执
+    """
+    from websockets.asyncio.client import connect
+
+    async def one():
+        async with connect(f"ws://127.0.0.1:{port}", compression=None) as ws:
+            async def sender():
+                for _ in range(count):
+                    await ws.send(frame)
+
+            async def receiver():
+                for _ in range(count):
+                    await ws.recv()
+
+            await asyncio.gather(sender(), receiver())
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(connections)))
+        return time.perf_counter() - start
+
+    results.put((connections * count, asyncio.run(run())))
+
+
+def bench_cluster(args):
+    import multiprocessing
+    import os
+    import socket
+
+    max_workers = args.workers or min(4, os.cpu_count() or 1)
+    frame = json.dumps({"post_type": "message", "group_id": 1, "message": _rich_message(32)}, ensure_ascii=False)
+    print(f"[cluster] {args.clients} 个客户端进程 × {args.connections} 条连接，每条 {args.count} 帧 "
+          f"(32 段富文本)，CPU 核数 {os.cpu_count()}")
+    print(f"{'进程数':>6}{'帧/秒':>12}{'加速比':>8}")
+
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+
+        servers = []
+        for _ in range(workers):
+            ready = multiprocessing.Event()
+            proc = multiprocessing.Process(target=_cluster_server, args=(port, ready), daemon=True)
+            proc.start()
+            ready.wait(10)
+            servers.append(proc)
+
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=_cluster_client, args=(port, args.connections, args.count, frame, results))
+            for _ in range(args.clients)
+        ]
+        for proc in clients:
+            proc.start()
+        outcomes = [results.get() for _ in clients]
+        for proc in clients:
+            proc.join()
+        for proc in servers:
+            proc.terminate()
+            proc.join()
+
+        frames = sum(n for n, _ in outcomes)
+        rate = frames / max(elapsed for _, elapsed in outcomes)
+        baseline = baseline or rate
+        print(f"{workers:>6}{rate:>12.0f}{rate / baseline:>8.2f}")
+
+
+# ==========================================
+# 场景: 转发规则评估 (rules)
+# ==========================================
+
+def _rule_set(count: int) -> List[Dict[str, Any]]:
+    """
+    按玩家名 / 服务器 / 事件类型 / QQ 号 / 群号区分的规则，每 10 条中有一条带内容正则
+    """
+    rules = []
+    for i in range(count):
+        if i % 4 == 0:
+            rule = {"direction": "mc_to_qq", "match": {"sender": f"Steve{i}"}, "action": "drop"}
+        elif i % 4 == 1:
+            rule = {"direction": "mc_to_qq", "match": {"server": f"服务器{i}", "sub_type": "player_death"},
+                    "action": "redirect", "group": 100000 + i}
+        elif i % 4 == 2:
+            rule = {"direction": "qq_to_mc", "match": {"sender": 20000 + i}, "action": "drop"}
+        else:
+            # 与流量样本同群的规则只有一条
+            rule = {"direction": "qq_to_mc", "match": {"group": 123456789 if i == 3 else 300000 + i},
+                    "action": "forward"}
+        if i % 10 == 0:
+            rule["match"]["content"] = f"关键词{i}"
+        rules.append(rule)
+    return rules
+
+
+def bench_rules(args):
+    import os
+    import tempfile
+    import config
+    import forwardRules
+
+    frames = [json.loads(frame) for frame in build_traffic_mix(args.count)]
+    print(f"[rules] {len(frames)} 条消息 (按 ws 场景的流量组成)")
+    print(f"{'规则数':>8}{'编译 ms':>10}{'µs/条':>10}{'命中':>8}")
+    for rule_count in (0, 10, 100, 1000, 5000):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rules.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"rules": _rule_set(rule_count)}, f, ensure_ascii=False)
+            config.FORWARD_RULES_ENABLE = True
+            config.FORWARD_RULES_FILE = path
+            start = time.perf_counter()
+            forwardRules.load_rules()
+            compile_ms = (time.perf_counter() - start) * 1e3
+
+        matched_before = forwardRules.get_rule_stats()["matched"]
+        start = time.perf_counter()
+        for data in frames:
+            if data.get("post_type") == "notice":
+                player = data["player"]
+                forwardRules.evaluate(
+                    forwardRules.DIRECTION_MC_TO_QQ, f"{player['nickname']} 加入了游戏",
+                    server=data["server_name"], sub_type=data["sub_type"],
+                    sender=(player["nickname"], player["uuid"]),
+                )
+            else:
+                forwardRules.evaluate(
+                    forwardRules.DIRECTION_QQ_TO_MC, data["raw_message"],
+                    group=data.get("group_id"), sub_type="group_message", sender=data.get("user_id"),
+                )
+        per_msg = (time.perf_counter() - start) / len(frames) * 1e6
+        matched = forwardRules.get_rule_stats()["matched"] - matched_before
+        print(f"{rule_count:>8}{compile_ms:>10.1f}{per_msg:>10.2f}{matched:>8}")
+
+
+# ==========================================
+# 命令行入口
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="LinkMC 性能基准测试")
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    p_ws = sub.add_parser("ws", help="WebSocket 连接参数对吞吐与内存的影响")
+    p_ws.add_argument("--count", type=int, default=5000)
+    p_ws.set_defaults(func=bench_ws)
+
+    p_seg = sub.add_parser("segments", help="QQ 富文本消息段解析与组件转换")
+    p_seg.add_argument("--count", type=int, default=2000)
+    p_seg.set_defaults(func=bench_segments)
+
+    p_hist = sub.add_parser("history", help="SQLite 历史记录按批写入的吞吐与搜索延迟")
+    p_hist.add_argument("--count", type=int, default=20000)
+    p_hist.set_defaults(func=bench_history)
+
+    p_cluster = sub.add_parser("cluster", help="多进程共享 NapCat 监听端口 (SO_REUSEPORT) 的扩展性")
+    p_cluster.add_argument("--workers", type=int, default=0, help="最大进程数 (默认 min(4, CPU 核数))")
+    p_cluster.add_argument("--clients", type=int, default=2)
+    p_cluster.add_argument("--connections", type=int, default=8)
+    p_cluster.add_argument("--count", type=int, default=500)
+    p_cluster.set_defaults(func=bench_cluster)
+
+    p_rules = sub.add_parser("rules", help="转发规则数量对单条消息评估开销的影响")
+    p_rules.add_argument("--count", type=int, default=20000)
+    p_rules.set_defaults(func=bench_rules)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
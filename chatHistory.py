@@ -0,0 +1,289 @@
+# chatHistory.py
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List
+
+import config
+import memoryReport
+
+logger = logging.getLogger("ChatHistory")
+
+# ============================================================
+# 聊天 / 事件历史记录 (SQLite, WAL)
+# ============================================================
+# 说明：
+# - 事件循环只做 put_nowait 入队，不接触磁盘
+# - 独立写线程按批次 (HISTORY_BATCH_SIZE 条或 HISTORY_FLUSH_INTERVAL 秒)
+#   在一个事务中 executemany 写入
+# - WAL 模式下查询使用独立的只读连接，与写线程互不阻塞
+# - content 建立 FTS5 trigram 索引，支持中文子串搜索；
+#   关键词不足 3 个字符或 SQLite 不支持 FTS5 时退回 LIKE
+# ============================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id          INTEGER PRIMARY KEY,
+    ts          REAL    NOT NULL,
+    source      TEXT    NOT NULL,
+    kind        TEXT    NOT NULL,
+    channel     TEXT,
+    sender      TEXT,
+    player_uuid TEXT,
+    content     TEXT
+);
+CREATE INDEX IF NOT EXISTS history_kind_ts ON history (kind, ts);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5 (
+    content, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+_INSERT_SQL = (
+    "INSERT INTO history (ts, source, kind, channel, sender, player_uuid, content) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+# 事件来源
+SOURCE_QQ = "qq"
+SOURCE_MC = "mc"
+
+# 写线程停止标记
+_STOP = object()
+
+# --- 全局状态管理 ---
+# 待写入队列 (写线程启动后创建)
+_write_queue: Optional[queue.Queue] = None
+# 写线程
+_writer_thread: Optional[threading.Thread] = None
+# 是否接收新记录 (关闭流程中置为 False)
+_accepting = False
+# 数据库是否支持 FTS5
+_fts_available = False
+
+# 统计 (由事件循环与写线程分别更新各自的字段)
+_history_stats: Dict[str, int] = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "failed": 0}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def start_history_writer() -> bool:
+    """
+    [接口] 初始化数据库并启动写线程 (HISTORY_ENABLE 关闭时不做任何事)
+
+    :return: 是否已启动
+    """
+    global _write_queue, _writer_thread, _accepting, _fts_available
+
+    if not config.HISTORY_ENABLE or _writer_thread is not None:
+        return _writer_thread is not None
+
+    try:
+        conn = _open_connection(config.HISTORY_DB_FILE)
+        conn.executescript(_SCHEMA)
+        try:
+            conn.executescript(_FTS_SCHEMA)
+            _fts_available = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"[历史] 当前 SQLite 不支持 FTS5 trigram，搜索退回 LIKE: {e}")
+            _fts_available = False
+    except sqlite3.Error as e:
+        logger.error(f"[历史] 打开数据库失败 ({config.HISTORY_DB_FILE}): {e}")
+        return False
+
+    _write_queue = queue.Queue(maxsize=config.HISTORY_QUEUE_MAX)
+    _writer_thread = threading.Thread(
+        target=_writer_loop,
+        args=(conn, _write_queue, config.HISTORY_BATCH_SIZE, config.HISTORY_FLUSH_INTERVAL),
+        name="history-writer",
+        daemon=True,
+    )
+    _writer_thread.start()
+    _accepting = True
+    logger.info(f"[历史] 历史记录已启用: {config.HISTORY_DB_FILE} (FTS5: {'是' if _fts_available else '否'})")
+    return True
+
+
+def record_event(source: str, kind: str, sender: Optional[str], content: Optional[str],
+                 channel: Optional[str] = None, player_uuid: Optional[str] = None,
+                 ts: Optional[float] = None):
+    """
+    [接口] 记录一条历史 (非阻塞；队列已满时丢弃并计数)
+
+    :param source: 来源，SOURCE_QQ / SOURCE_MC
+    :param kind: 类型，QQ 群消息为 "group_message"，MC 事件为 sub_type
+    :param channel: QQ 群名 / MC 服务器名
+    """
+    if not _accepting:
+        return
+    row = (ts if ts is not None else time.time(), source, kind, channel, sender, player_uuid, content)
+    try:
+        _write_queue.put_nowait(row)
+        _history_stats["queued"] += 1
+    except queue.Full:
+        _history_stats["dropped"] += 1
+
+
+async def search_history(keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    [接口] 全文搜索聊天内容，按时间倒序
+    """
+    keyword = keyword.strip()
+    if not keyword or _write_queue is None:
+        return []
+
+    if _fts_available and len(keyword) >= 3:
+        # 整体作为一个短语匹配，避免关键词中的 FTS 语法字符被解释
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        sql = (
+            "SELECT h.ts, h.source, h.kind, h.channel, h.sender, h.content FROM history_fts f "
+            "JOIN history h ON h.id = f.rowid WHERE history_fts MATCH ? ORDER BY h.id DESC LIMIT ?"
+        )
+        params = (phrase, limit)
+    else:
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        sql = (
+            "SELECT ts, source, kind, channel, sender, content FROM history "
+            "WHERE content LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ?"
+        )
+        params = (f"%{escaped}%", limit)
+    return await asyncio.to_thread(_query, sql, params)
+
+
+async def recent_events(kind: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    [接口] 某类事件的最近记录，按时间倒序 (如 kind="player_death")
+    """
+    if _write_queue is None:
+        return []
+    sql = (
+        "SELECT ts, source, kind, channel, sender, content FROM history "
+        "WHERE kind = ? ORDER BY ts DESC LIMIT ?"
+    )
+    return await asyncio.to_thread(_query, sql, (kind, limit))
+
+
+def get_history_stats() -> Dict[str, int]:
+    """
+    [接口] 写入统计 (含当前排队条数)
+    """
+    stats = dict(_history_stats)
+    stats["pending"] = _write_queue.qsize() if _write_queue is not None else 0
+    return stats
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：待写线程写入的记录
+    """
+    if _write_queue is None:
+        return {"write_queue": {"items": 0, "bytes": 0}}
+    with _write_queue.mutex:
+        pending = list(_write_queue.queue)
+    return {"write_queue": memoryReport.usage(pending)}
+
+
+def stop_accepting():
+    """
+    [接口] 关闭流程：不再接收新记录
+    """
+    global _accepting
+    _accepting = False
+
+
+async def drain(deadline: float) -> Dict[str, int]:
+    """
+    [接口] 关闭流程：通知写线程写完剩余记录后退出，在截止时间前等待
+    """
+    if _writer_thread is None:
+        return {}
+
+    loop = asyncio.get_running_loop()
+    written_before = _history_stats["written"]
+    # 停止标记必须入队，队列满时等待写线程腾出位置
+    while loop.time() < deadline:
+        try:
+            _write_queue.put_nowait(_STOP)
+            break
+        except queue.Full:
+            await asyncio.sleep(0.05)
+
+    while _writer_thread.is_alive() and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+
+    return {
+        "drained_rows": _history_stats["written"] - written_before,
+        "pending_rows": _write_queue.qsize(),
+        "dropped_rows": _history_stats["dropped"],
+    }
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    """
+    [内部] 打开写连接：WAL + synchronous=NORMAL (断电最多丢失最后一批，不会损坏)
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _writer_loop(conn: sqlite3.Connection, q: queue.Queue, batch_size: int, flush_interval: float):
+    """
+    [内部] 写线程：攒批后在单个事务中写入，收到停止标记时写完当前批次退出
+    """
+    stopping = False
+    while not stopping:
+        item = q.get()
+        if item is _STOP:
+            break
+
+        batch = [item]
+        flush_at = time.monotonic() + flush_interval
+        while len(batch) < batch_size:
+            timeout = flush_at - time.monotonic()
+            try:
+                item = q.get(timeout=timeout) if timeout > 0 else q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+
+        try:
+            with conn:
+                conn.executemany(_INSERT_SQL, batch)
+            _history_stats["written"] += len(batch)
+            _history_stats["batches"] += 1
+        except sqlite3.Error as e:
+            _history_stats["failed"] += len(batch)
+            logger.error(f"[历史] 写入 {len(batch)} 条记录失败: {e}")
+
+    conn.close()
+
+
+def _query(sql: str, params: tuple) -> List[Dict[str, Any]]:
+    """
+    [内部] 在工作线程中用只读连接执行查询
+    """
+    conn = sqlite3.connect(f"file:{config.HISTORY_DB_FILE}?mode=ro", uri=True)
+    try:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
@@ -1,8 +1,9 @@
 import asyncio
 import json
 import logging
+import string
 import uuid
-from typing import Callable, Awaitable, Optional, Dict, Any
+from typing import Callable, Awaitable, Optional, Dict, Any, List, Set, Tuple
 
 # 引入最新的 websockets 客户端模块
 from websockets.asyncio.client import connect
@@ -11,6 +12,11 @@ from websockets import ClientConnection
 
 # 导入配置文件
 import config
+import memoryReport
+import runtimeProfile
+from deliveryTracker import DeliveryTracker
+from frameGuard import FrameGuard
+from loadShedder import SheddingQueue, classify_mc_event
 
 # 配置日志
 logger = logging.getLogger("McPluginClient")
@@ -18,10 +24,21 @@ logger = logging.getLogger("McPluginClient")
 # --- 类型定义 ---
 # 回调函数类型：接收 dict，返回 Awaitable[None]
 MessageHandlerType = Callable[[Dict[str, Any]], Awaitable[None]]
+# 连接断开回调：无参数 (如清空在线名单；断线期间的进出服事件无法得知)
+DisconnectHandlerType = Callable[[], None]
+# 多进程模式下的转发函数 (worker 进程不持有 MC 连接)
+ForwardNotifyType = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+ForwardCallType = Callable[[str, Dict[str, Any], float], Awaitable[Dict[str, Any]]]
 
 # --- 全局状态管理 ---
 # MC 插件消息接收回调
 _mcplugin_message_handler: Optional[MessageHandlerType] = None
+# MC 插件连接断开回调
+_mcplugin_disconnect_handlers: List[DisconnectHandlerType] = []
+
+# 多进程模式：转交 primary 进程发送 (由 workerCluster 注入)
+_mc_forward_notify: Optional[ForwardNotifyType] = None
+_mc_forward_call: Optional[ForwardCallType] = None
 
 # 活跃的 MC 插件连接对象
 _active_mc_ws: Optional[ClientConnection] = None
@@ -29,6 +46,40 @@ _active_mc_ws: Optional[ClientConnection] = None
 # 挂起的 API 请求字典 {echo_uuid: asyncio.Future}
 _pending_api_requests: Dict[str, asyncio.Future[Dict[str, Any]]] = {}
 
+# 异步通知的投递跟踪 (DELIVERY_CONFIRM_ENABLE 且 MCPLUGIN_ENABLE_ECHO 时启用)
+# 鹊桥响应：status == "SUCCESS" 表示成功
+_delivery = DeliveryTracker(
+    "mcplugin",
+    lambda payload: _send_to_mc_impl(payload),
+    lambda response: response.get("status", "SUCCESS") == "SUCCESS",
+)
+
+# 入站事件队列 (LOAD_SHED_ENABLE 时使用)
+_inbound_queue = SheddingQueue("mcplugin", classify_mc_event)
+
+# 入站消息大小检查与按对端的拒收统计
+_frame_guard = FrameGuard("mcplugin")
+
+# --- 优雅关闭状态 ---
+# 是否继续接收新的入站事件 (关闭后也不再重连)
+_accepting_inbound = True
+# 在途的发送 / 业务回调数量
+_inflight_sends = 0
+_inflight_handlers = 0
+# 累计完成的发送次数 (用于统计关闭期间排空的数量)
+_completed_sends = 0
+# 关闭期间丢弃的入站事件数
+_dropped_inbound = 0
+
+# 变化后需要重建连接才能生效的配置项
+_CONNECTION_SETTINGS = (
+    {"McPlugin_WS_URI", "McPlugin_WS_TOKEN", "McPlugin_SELF_NAME"}
+    | runtimeProfile.ws_option_names("mcplugin")
+)
+
+# 模板占位符解析器
+_FORMATTER = string.Formatter()
+
 
 # ==========================================
 # 对外公共接口 (Public API)
@@ -42,53 +93,145 @@ def register_mcplugin_message_handler(handler: MessageHandlerType):
     _mcplugin_message_handler = handler
     logger.info("已注册 MC 插件消息处理回调函数。")
 
-def _render_template(obj: Any, **kwargs) -> Any:
+
+def register_mcplugin_disconnect_handler(handler: DisconnectHandlerType):
+    """
+    [接口] 注册 MC 插件连接断开回调 (已建立的连接断开后调用，重连前执行)
+    """
+    _mcplugin_disconnect_handlers.append(handler)
+
+
+def register_mc_forwarder(notify: ForwardNotifyType, call: ForwardCallType):
     """
-    递归渲染 JSON 模板：
-    - str: 使用 format(**kwargs)
-    - list/dict: 递归处理内部元素
+    [接口] 注册转发函数 (多进程模式的 worker 进程)：所有发往 MC 的通知与 API 调用交给 primary
+    """
+    global _mc_forward_notify, _mc_forward_call
+    _mc_forward_notify = notify
+    _mc_forward_call = call
+
+
+def prepare_config_reload(new_config) -> Dict[str, tuple]:
+    """
+    [接口] 配置热重载 (准备阶段)：预编译新协议表，不合法时抛出 ValueError
+    """
+    return compile_mc_protocol(new_config.MCPLUGIN_PROTOCOL)
+
+
+def apply_config_reload(compiled: Dict[str, tuple], changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：切换协议表；仅当连接级配置变化时才重建 MC 连接
+    """
+    install_mc_protocol(compiled)
+
+    if not changed & _CONNECTION_SETTINGS:
+        return
+    if _active_mc_ws is not None:
+        logger.info(f"[配置重载] 连接配置已变化 ({', '.join(sorted(changed & _CONNECTION_SETTINGS))})，正在重建 MC 连接...")
+        asyncio.get_running_loop().create_task(
+            _active_mc_ws.close(code=1000, reason="config reloaded")
+        )
+
+
+def _compile_template(obj: Any) -> Callable[[Dict[str, Any]], Any]:
+    """
+    预编译 JSON 模板为渲染函数 (加载/重载时执行一次)：
+    - str: 含占位符时绑定 str.format，否则直接作为常量；
+      仅含单个占位符且参数为 list/dict 时原样嵌入
+    - list/dict: 递归编译内部元素
     - 其它 JSON 类型: 原样返回
     """
     if isinstance(obj, str):
-        try:
-            return obj.format(**kwargs)
-        except KeyError as e:
-            missing = e.args[0]
-            raise ValueError(f"Missing required parameter '{missing}'") from e
+        parsed = list(_FORMATTER.parse(obj))
+        fields = [name for _, name, _, _ in parsed if name is not None]
+        if not fields:
+            literal = obj.format()
+            return lambda kwargs: literal
+        if any(not name for name in fields):
+            raise ValueError(f"Positional placeholder is not allowed in template: {obj!r}")
+
+        fmt = obj.format
+
+        def render_str(kwargs: Dict[str, Any]) -> str:
+            try:
+                return fmt(**kwargs)
+            except KeyError as e:
+                missing = e.args[0]
+                raise ValueError(f"Missing required parameter '{missing}'") from e
+
+        # 整个字符串只有一个占位符 (如 "{components}")：
+        # 参数为 list/dict 时原样嵌入，用于传入文本组件等 JSON 结构
+        literal_text, name, spec, conversion = parsed[0]
+        if len(parsed) == 1 and not literal_text and name.isidentifier() and not spec and conversion is None:
+            def render_whole(kwargs: Dict[str, Any]) -> Any:
+                value = kwargs.get(name)
+                if isinstance(value, (list, dict)):
+                    return value
+                return render_str(kwargs)
+
+            return render_whole
+
+        return render_str
 
     if isinstance(obj, list):
-        return [_render_template(x, **kwargs) for x in obj]
+        items = [_compile_template(x) for x in obj]
+        return lambda kwargs: [render(kwargs) for render in items]
 
     if isinstance(obj, dict):
-        return {k: _render_template(v, **kwargs) for k, v in obj.items()}
+        pairs = [(k, _compile_template(v)) for k, v in obj.items()]
+        return lambda kwargs: {k: render(kwargs) for k, render in pairs}
+
+    return lambda kwargs: obj
+
+
+def compile_mc_protocol(protocol: Dict[str, Any]) -> Dict[str, tuple]:
+    """
+    [接口] 校验并预编译 MCPLUGIN_PROTOCOL
+
+    :return: {kind: (api, data 渲染函数)}
+    :raises ValueError: 协议定义不合法
+    """
+    compiled = {}
+    for kind, proto in protocol.items():
+        # 协议结构校验
+        if not isinstance(proto, dict) or "api" not in proto or "data" not in proto:
+            raise ValueError(
+                f"Invalid MCPLUGIN_PROTOCOL definition for kind '{kind}', "
+                f"must contain 'api' and 'data'"
+            )
+        try:
+            compiled[kind] = (proto["api"], _compile_template(proto["data"]))
+        except ValueError as e:
+            raise ValueError(f"Invalid template in protocol kind '{kind}': {e}") from e
+    return compiled
+
+
+def install_mc_protocol(compiled: Dict[str, tuple]):
+    """
+    [接口] 替换当前生效的已编译协议表 (配置热重载时调用)
+    """
+    global _compiled_protocol
+    _compiled_protocol = compiled
+
+
+# 当前生效的已编译协议表 (启动时编译一次，热重载时整体替换)
+_compiled_protocol: Dict[str, tuple] = compile_mc_protocol(config.MCPLUGIN_PROTOCOL)
 
-    return obj
 
 # McPlugin API配置 来自 config
 def build_mc_payload(kind: str, **kwargs) -> dict:
     try:
-        proto = config.MCPLUGIN_PROTOCOL[kind]
+        api, render_data = _compiled_protocol[kind]
     except KeyError:
         raise ValueError(f"Unknown MCPLUGIN_PROTOCOL kind: {kind}")
 
-    # 协议结构校验
-    if "api" not in proto or "data" not in proto:
-        raise ValueError(
-            f"Invalid MCPLUGIN_PROTOCOL definition for kind '{kind}', "
-            f"must contain 'api' and 'data'"
-        )
-
     try:
-        # 递归渲染整个 data 结构
-        data = _render_template(proto["data"], **kwargs)
-    except KeyError as e:
-        missing = e.args[0]
-        raise ValueError(
-            f"Missing required parameter '{missing}' for protocol kind '{kind}'"
-        ) from e
+        # 渲染整个 data 结构
+        data = render_data(kwargs)
+    except ValueError as e:
+        raise ValueError(f"{e} for protocol kind '{kind}'") from e
 
     payload = {
-        "api": proto["api"],
+        "api": api,
         "data": data,
     }
 
@@ -102,6 +245,9 @@ async def call_mc_plugin_api(kind: str, params: Optional[Dict] = None, timeout:
     [接口] 调用 MC 插件 API 并异步等待响应结果 (核心功能)
     注意：需要确认所使用的 MC 插件协议是否支持 'echo' 字段回调机制。
     """
+    if _mc_forward_call is not None:
+        return await _mc_forward_call(kind, params or {}, timeout)
+
     if not config.MCPLUGIN_ENABLE_ECHO:
         raise RuntimeError(
             "MC Plugin echo-response is disabled in config "
@@ -132,6 +278,10 @@ async def call_mc_plugin_api(kind: str, params: Optional[Dict] = None, timeout:
     except asyncio.TimeoutError:
         logger.error(f"[API调用失败] 请求 MC 超时 ({timeout}s): {kind}, echo: {request_uuid}")
         raise
+    except RuntimeError as e:
+        # 响应超过软上限被丢弃
+        logger.error(f"[API调用失败] {e}: {kind}, echo: {request_uuid}")
+        raise
     except Exception as e:
         logger.error(f"[API调用失败] 发送请求到 MC 时出错: {e}, echo: {request_uuid}")
         raise ConnectionError(f"Failed to send API request to MC: {e}") from e
@@ -142,11 +292,16 @@ async def call_mc_plugin_api(kind: str, params: Optional[Dict] = None, timeout:
 async def send_to_mc_async_notification(kind: str, **kwargs) -> bool:
     """
     [接口] 发送异步通知数据到 MC 插件 (不等待响应)
+    开启投递确认时，回执由接收循环异步匹配，失败自动重发。
     """
     try:
         # 异步通知禁止 echo
         kwargs.pop("echo", None)
+        if _mc_forward_notify is not None:
+            return await _mc_forward_notify(kind, kwargs)
         payload = build_mc_payload(kind, **kwargs)
+        if config.DELIVERY_CONFIRM_ENABLE and config.MCPLUGIN_ENABLE_ECHO:
+            return await _delivery.send(payload)
         await _send_to_mc_impl(payload)
         return True
     except Exception as e:
@@ -154,57 +309,207 @@ async def send_to_mc_async_notification(kind: str, **kwargs) -> bool:
         return False
 
 
+def stop_accepting():
+    """
+    [接口] 关闭流程：丢弃新的入站事件并停止重连 (API 响应仍会被处理)
+    """
+    global _accepting_inbound
+    _accepting_inbound = False
+
+
+async def drain(deadline: float) -> Dict[str, int]:
+    """
+    [接口] 关闭流程：在截止时间前等待在途发送、业务回调与 API 请求完成，
+    超时仍未完成的 API 请求以 ConnectionError 结束
+    """
+    loop = asyncio.get_running_loop()
+    completed_before = _completed_sends
+
+    while (_inflight_sends or _inflight_handlers or len(_inbound_queue) or _pending_api_requests
+           or _delivery.pending_count()) and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+
+    cancelled_api = 0
+    for future in list(_pending_api_requests.values()):
+        if not future.done():
+            future.set_exception(ConnectionError("MC Plugin gateway is shutting down"))
+            cancelled_api += 1
+    unacked = _delivery.abandon_all()
+
+    return {
+        "drained_sends": _completed_sends - completed_before,
+        "dropped_sends": _inflight_sends,
+        "dropped_handlers": _inflight_handlers,
+        "cancelled_api": cancelled_api,
+        "unacked_notifications": unacked,
+        "dropped_inbound": _dropped_inbound,
+        "dropped_queued": len(_inbound_queue),
+        "shed_overload": _inbound_queue.shed_total(),
+    }
+
+
+async def run_inbound_worker_task():
+    """
+    [接口] 后台任务：按顺序处理入站队列中的事件 (LOAD_SHED_ENABLE 关闭时队列始终为空)
+    """
+    while True:
+        data = await _inbound_queue.get()
+        await _dispatch_inbound(data)
+
+
+def get_load_shed_stats() -> Dict[str, Any]:
+    """
+    [接口] 入站队列统计 (排队数、最大排队时延、是否处于丢弃状态、按事件类型的丢弃数)
+    """
+    return _inbound_queue.stats()
+
+
+def get_delivery_stats() -> Dict[str, Any]:
+    """
+    [接口] 异步通知投递统计 (submitted / acked / retried / failed / success_rate 等)
+    """
+    return _delivery.stats()
+
+
+def get_frame_stats() -> Dict[str, Any]:
+    """
+    [接口] 入站消息大小限制与按对端的拒收统计
+    """
+    return _frame_guard.stats()
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：API 待响应表、投递待确认表、入站队列、连接的收发缓冲
+    """
+    return {
+        "pending_api": memoryReport.usage(_pending_api_requests),
+        **_delivery.memory_usage(),
+        "inbound_queue": _inbound_queue.memory_usage(),
+        "connections": memoryReport.connection_buffers([_active_mc_ws] if _active_mc_ws is not None else []),
+    }
+
+
+def dump_undelivered() -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    [接口] 状态快照：导出未送达的异步通知 (DELIVERY_REPLAY_TTL 秒后过期)
+    """
+    return _delivery.dump_undelivered(config.DELIVERY_REPLAY_TTL)
+
+
+def restore_undelivered(entries: List[Tuple[float, Dict[str, Any]]]):
+    """
+    [接口] 状态快照：恢复未送达的通知，连接建立后补发
+    """
+    _delivery.restore_undelivered(entries)
+
+
+async def close_connection():
+    """
+    [接口] 关闭流程：以 1001 (Going Away) 关闭 MC 插件连接
+    """
+    if _active_mc_ws is not None:
+        await _active_mc_ws.close(code=1001, reason="bridge shutting down")
+
+
 # ==========================================
 # 内部实现细节 (Internal Implementation)
 # ==========================================
 
+async def _dispatch_inbound(data: Dict[str, Any]):
+    """
+    [内部] 调用业务回调处理一条入站事件
+    """
+    global _inflight_handlers
+
+    if _mcplugin_message_handler:
+        # 【重要】保护性调用业务回调
+        _inflight_handlers += 1
+        try:
+            await _mcplugin_message_handler(data)
+        except Exception as business_err:
+            logger.error(f"[业务回调异常] 处理 MC 插件消息时出错: {business_err}", exc_info=True)
+        finally:
+            _inflight_handlers -= 1
+    elif config.DEBUG_MODE:
+        logger.debug("[接收] 收到 MC 消息但未设置回调，已丢弃。")
+
+
+def _run_disconnect_handlers():
+    """
+    [内部] 执行连接断开回调，异常只记录日志
+    """
+    for handler in _mcplugin_disconnect_handlers:
+        try:
+            handler()
+        except Exception as e:
+            logger.error(f"[连接回调异常] 执行 MC 插件断开回调时出错: {e}", exc_info=True)
+
+
+async def _replay_undelivered():
+    """
+    [内部] 连接建立后补发上次运行未送达的通知 (需开启投递确认)
+    """
+    if config.DELIVERY_CONFIRM_ENABLE and config.MCPLUGIN_ENABLE_ECHO:
+        await _delivery.replay()
+
+
 async def _send_to_mc_impl(data_dict: dict):
     """
     [内部] 底层发送实现
     """
+    global _inflight_sends, _completed_sends
+
     # 检查连接是否存在且处于打开状态
     if _active_mc_ws is None:
         raise ConnectionError("MC Plugin connection is not active.")
 
+    _inflight_sends += 1
     try:
         json_str = json.dumps(data_dict, ensure_ascii=False)
         await _active_mc_ws.send(json_str)
+        _completed_sends += 1
         if config.DEBUG_MODE and 'echo' not in data_dict:
             logger.debug(f"[中枢 -> MC插件(通知)] 已发送: {json_str[:150]}...")
     except Exception as e:
         logger.error(f"[底层发送失败] 发送数据到 MC 插件出错: {e}")
         raise
+    finally:
+        _inflight_sends -= 1
 
 
 async def run_client_task():
     """
     [内部] 客户端主任务：维护连接和监听消息
     """
-    global _active_mc_ws
-
-    extra_headers = {
-        "x-self-name": config.McPlugin_SELF_NAME,
-        "Authorization": f"Bearer {config.McPlugin_WS_TOKEN}"
-    }
+    global _active_mc_ws, _dropped_inbound
 
     logger.info(f"[服务启动] MC 插件客户端任务正在初始化，目标: {config.McPlugin_WS_URI}")
 
-    # 断线重连死循环
-    while True:
+    # 断线重连循环 (进入关闭流程后退出)
+    while _accepting_inbound:
+        # 每次重连都重新读取配置，使热重载后的地址/Token 生效
+        extra_headers = {
+            "x-self-name": config.McPlugin_SELF_NAME,
+            "Authorization": f"Bearer {config.McPlugin_WS_TOKEN}"
+        }
         try:
             logger.info(f"[连接尝试] 正在连接 MC 插件服务器...")
-            # 设置较大的 max_size 以支持接收大数据包 (如地图数据)
+            # 连接参数 (压缩、max_size、缓冲水位、心跳) 来自配置
             async with connect(config.McPlugin_WS_URI,
                                additional_headers=extra_headers,
-                               ping_interval=20,
-                               ping_timeout=20,
-                               max_size=2**24) as websocket:
+                               **runtimeProfile.ws_options("mcplugin")) as websocket:
 
                 logger.info(f"[连接成功] 已连接到 MC 插件! 双向通道建立。")
                 _active_mc_ws = websocket
+                asyncio.get_running_loop().create_task(_replay_undelivered())
 
                 # --- 消息监听循环 ---
                 async for message in websocket:
+                    # 超过软上限的消息不解析 (若是 API 响应，等待的调用立即失败)
+                    if not _frame_guard.accept(websocket, message):
+                        _frame_guard.fail_pending(message, _pending_api_requests)
+                        continue
                     try:
                         data = json.loads(message)
 
@@ -212,6 +517,9 @@ async def run_client_task():
                         if config.MCPLUGIN_ENABLE_ECHO:
                             echo_id = data.get('echo')
                             if echo_id:
+                                # 异步通知的投递回执
+                                if _delivery.resolve(echo_id, data):
+                                    continue
                                 # 处理 API 响应
                                 future = _pending_api_requests.get(echo_id)
                                 if future and not future.done():
@@ -219,17 +527,20 @@ async def run_client_task():
                                     logger.debug(f"[API响应] 收到 MC 响应 echo: {echo_id}")
                                 continue
 
+                        # 关闭流程中：不再接收新的入站事件
+                        if not _accepting_inbound:
+                            _dropped_inbound += 1
+                            continue
+
                         # 处理普通通知消息 (调用业务回调)
-                        if _mcplugin_message_handler:
-                            # 【重要】保护性调用业务回调
-                            try:
-                                await _mcplugin_message_handler(data)
-                            except Exception as business_err:
-                                logger.error(f"[业务回调异常] 处理 MC 插件消息时出错: {business_err}", exc_info=True)
-                        elif config.DEBUG_MODE:
-                            logger.debug("[接收] 收到 MC 消息但未设置回调，已丢弃。")
+                        # 开启过载保护时只入队，由 run_inbound_worker_task 按排队时延决定处理或丢弃
+                        if config.LOAD_SHED_ENABLE:
+                            await _inbound_queue.put(data)
+                        else:
+                            await _dispatch_inbound(data)
 
                     except json.JSONDecodeError:
+                        _frame_guard.record_invalid(websocket)
                         logger.warning(f"[接收] 收到 MC 插件非法 JSON 数据，长度: {len(message)}")
                 # -------------------
 
@@ -239,6 +550,8 @@ async def run_client_task():
         except (ConnectionRefusedError, OSError):
             logger.warning(f"[连接失败] 无法连接到 MC 插件 ({config.McPlugin_WS_URI})。请检查服务器是否开启。")
         except ConnectionClosed as e:
+            if _active_mc_ws is not None:
+                _frame_guard.record_close(_active_mc_ws, e)
             logger.warning(f"[连接中断] 与 MC 插件的连接意外断开，代码: {e.code}, 原因: {e.reason}")
         except Exception as e:
             logger.error(f"[连接异常] MC 插件客户端发生意外错误: {e}", exc_info=True)
@@ -247,9 +560,11 @@ async def run_client_task():
             if _active_mc_ws is not None:
                 logger.debug("[连接清理] 清除活跃连接对象标记。")
                 _active_mc_ws = None
+                _run_disconnect_handlers()
 
-            logger.info(f"[重连] {config.McPlugin_RECONNECT_INTERVAL} 秒后尝试重连 MC 插件...")
-            await asyncio.sleep(config.McPlugin_RECONNECT_INTERVAL)
+            if _accepting_inbound:
+                logger.info(f"[重连] {config.McPlugin_RECONNECT_INTERVAL} 秒后尝试重连 MC 插件...")
+                await asyncio.sleep(config.McPlugin_RECONNECT_INTERVAL)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,302 @@
+# commandRouter.py
+import asyncio
+import logging
+import time
+from typing import Callable, Awaitable, Optional, Dict, Any, List, Set, Tuple
+
+import config
+import memoryReport
+
+logger = logging.getLogger("CommandRouter")
+
+# ============================================================
+# QQ 群命令路由
+# ============================================================
+# 说明：
+# - 命令通过 @qq_command(name, role=..., cache_ttl=..., enabled_by=...) 注册，
+#   名称可以包含空格 (如 "#白名单 添加")，按最长前缀匹配
+# - 已启用的命令编译为一棵前缀树，注册 / 配置重载时整体重建；
+#   不以命令前缀开头的普通聊天只做一次首字符判断
+# - 权限按 QQ 群角色 (member < admin < owner)，QQ_COMMAND_SUPERUSERS 中的 QQ 号不受限制，
+#   QQ_COMMAND_PERMISSIONS 可按命令覆盖所需角色
+# - 只读命令设置 cache_ttl 后，回复按 (命令, 参数) 缓存；
+#   缓存过期时并发的相同请求只执行一次 (single-flight)，其余等待同一结果
+# ============================================================
+
+# --- 类型定义 ---
+# 命令处理函数：接收上下文 {"args", "user_id", "nickname", "role", "group_id"}，返回回复文本 (None 表示不回复)
+CommandHandlerType = Callable[[Dict[str, Any]], Awaitable[Optional[str]]]
+
+# 角色等级
+ROLE_MEMBER = "member"
+ROLE_ADMIN = "admin"
+ROLE_OWNER = "owner"
+_ROLE_LEVELS = {ROLE_MEMBER: 0, ROLE_ADMIN: 1, ROLE_OWNER: 2}
+
+# 前缀树节点中保存命令的键 (不会与单个字符冲突)
+_COMMAND_KEY = ""
+
+# 回复缓存条数上限 (参数各不相同的查询过多时不再缓存)
+_MAX_CACHED_REPLIES = 256
+
+# --- 全局状态管理 ---
+# 全部注册信息 {命令名: (处理函数, 所需角色, 缓存秒数, 开关名)}
+_registry: Dict[str, Tuple[CommandHandlerType, str, Optional[float], Optional[str]]] = {}
+
+# 生效中的前缀树 (嵌套 dict，整体替换)
+_trie: Dict[str, Any] = {}
+
+# 所有已启用命令的首字符 (快速判断是否可能是命令)
+_first_chars: Set[str] = set()
+
+# 回复缓存 {(命令名, 参数): (过期时间, 回复)}
+_reply_cache: Dict[Tuple[str, str], Tuple[float, Optional[str]]] = {}
+
+# 正在执行的只读命令 {(命令名, 参数): Future}
+_inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+# 统计
+_router_stats: Dict[str, int] = {"executed": 0, "cache_hits": 0, "shared": 0, "denied": 0, "failed": 0}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def qq_command(name: str, role: str = ROLE_MEMBER, cache_ttl: Optional[float] = None,
+               enabled_by: Optional[str] = None):
+    """
+    [接口] 装饰器：注册 QQ 群命令
+
+    :param name: 命令全名，如 "#在线"、"#白名单 添加"
+    :param role: 所需的最低群角色
+    :param cache_ttl: 只读命令的回复缓存秒数，None 表示不缓存
+    :param enabled_by: config 中的开关名，为 False 时该命令不生效 (消息按普通聊天转发)
+    """
+    if role not in _ROLE_LEVELS:
+        raise ValueError(f"Unknown role for command {name!r}: {role!r}")
+
+    def decorator(handler: CommandHandlerType) -> CommandHandlerType:
+        _registry[name] = (handler, role, cache_ttl, enabled_by)
+        rebuild_command_trie()
+        return handler
+
+    return decorator
+
+
+def rebuild_command_trie():
+    """
+    [接口] 根据当前配置重新生成命令前缀树并原子替换
+    """
+    global _trie, _first_chars
+
+    trie: Dict[str, Any] = {}
+    for name, (_, _, _, enabled_by) in _registry.items():
+        if not config.QQ_COMMAND_ENABLE:
+            break
+        if enabled_by is not None and not getattr(config, enabled_by):
+            continue
+        node = trie
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[_COMMAND_KEY] = name
+
+    _trie = trie
+    _first_chars = set(trie)
+    _reply_cache.clear()
+
+
+def match_command(text: str) -> Optional[Tuple[str, str]]:
+    """
+    [接口] 按最长前缀匹配命令 (命令名之后必须是空白或结尾)
+
+    :return: (命令名, 参数)；不是已启用的命令时返回 None
+    """
+    if not text or text[0] not in _first_chars:
+        return None
+
+    node = _trie
+    matched = None
+    for i, ch in enumerate(text):
+        node = node.get(ch)
+        if node is None:
+            break
+        if _COMMAND_KEY in node and (i + 1 == len(text) or text[i + 1].isspace()):
+            matched = (node[_COMMAND_KEY], i + 1)
+
+    if matched is None:
+        return None
+    name, end = matched
+    return name, text[end:].strip()
+
+
+async def route_qq_command(text: str, data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    """
+    [接口] 尝试将一条 QQ 群消息作为命令执行
+
+    :param text: 消息文本
+    :param data: OneBot 原始消息事件 (用于读取发送者与角色)
+    :return: (是否为命令, 回复文本)；不是命令时调用方应按普通聊天处理
+    """
+    matched = match_command(text.strip())
+    if matched is None:
+        return False, None
+    name, args = matched
+    handler, role, cache_ttl, _ = _registry[name]
+
+    sender = data.get("sender") or {}
+    user_id = data.get("user_id") or sender.get("user_id")
+    sender_role = sender.get("role") or ROLE_MEMBER
+    required = config.QQ_COMMAND_PERMISSIONS.get(name, role)
+    if user_id not in config.QQ_COMMAND_SUPERUSERS and \
+            _ROLE_LEVELS.get(sender_role, 0) < _ROLE_LEVELS.get(required, 0):
+        _router_stats["denied"] += 1
+        logger.info(f"[命令] {user_id} ({sender_role}) 无权执行 {name}")
+        return True, f"⛔ 权限不足: {name} 需要 {required} 权限"
+
+    context = {
+        "args": args,
+        "user_id": user_id,
+        "nickname": sender.get("card") or sender.get("nickname") or str(user_id),
+        "role": sender_role,
+        "group_id": data.get("group_id"),
+    }
+    logger.info(f"[命令] {context['nickname']} 执行: {name} {args}".rstrip())
+
+    if cache_ttl is None:
+        return True, await _execute(name, handler, context)
+    return True, await _execute_cached(name, args, handler, context, cache_ttl)
+
+
+def invalidate_command_cache(name: str):
+    """
+    [接口] 清除某个命令的全部缓存回复 (如修改白名单后清除白名单查询缓存)
+    """
+    for key in [key for key in _reply_cache if key[0] == name]:
+        del _reply_cache[key]
+
+
+def get_router_stats() -> Dict[str, int]:
+    """
+    [接口] 命令执行统计 (含当前缓存条数)
+    """
+    stats = dict(_router_stats)
+    stats["cached"] = len(_reply_cache)
+    return stats
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：回复缓存与执行中的命令
+    """
+    return {"reply_cache": memoryReport.usage(_reply_cache), "inflight": memoryReport.usage(_inflight)}
+
+
+def dump_snapshot() -> List[Tuple[float, list]]:
+    """
+    [接口] 状态快照：导出未过期的缓存回复，过期时间换算为墙上时间
+    """
+    now_mono, now_wall = time.monotonic(), time.time()
+    return [
+        (now_wall + expires - now_mono, [name, args, reply])
+        for (name, args), (expires, reply) in _reply_cache.items() if expires > now_mono
+    ]
+
+
+def restore_snapshot(entries: List[Tuple[float, list]]):
+    """
+    [接口] 状态快照：恢复缓存回复 (跳过已不存在的命令)
+    """
+    now_mono, now_wall = time.monotonic(), time.time()
+    for expires, (name, args, reply) in entries[:_MAX_CACHED_REPLIES]:
+        if name in _registry:
+            _reply_cache[(name, args)] = (now_mono + expires - now_wall, reply)
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：命令开关变化时重建前缀树
+    """
+    enable_settings = {enabled_by for _, _, _, enabled_by in _registry.values() if enabled_by}
+    if changed & (enable_settings | {"QQ_COMMAND_ENABLE"}):
+        rebuild_command_trie()
+        logger.info(f"[命令] 已按新配置重建命令表，共 {len(list(_iter_commands(_trie)))} 个命令")
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+async def _execute(name: str, handler: CommandHandlerType, context: Dict[str, Any]) -> Optional[str]:
+    """
+    [内部] 执行命令，异常转为错误回复
+    """
+    _router_stats["executed"] += 1
+    try:
+        return await handler(context)
+    except Exception as e:
+        _router_stats["failed"] += 1
+        logger.error(f"[命令] 执行 {name} 出错: {e}", exc_info=True)
+        return f"❌ {name} 执行失败: {e}"
+
+
+async def _execute_cached(name: str, args: str, handler: CommandHandlerType,
+                          context: Dict[str, Any], cache_ttl: float) -> Optional[str]:
+    """
+    [内部] 带 TTL 缓存与 single-flight 的执行
+    """
+    key = (name, args)
+    now = time.monotonic()
+
+    cached = _reply_cache.get(key)
+    if cached is not None and cached[0] > now:
+        _router_stats["cache_hits"] += 1
+        return cached[1]
+
+    future = _inflight.get(key)
+    if future is not None:
+        _router_stats["shared"] += 1
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        _router_stats["executed"] += 1
+        try:
+            reply = await handler(context)
+        except Exception as e:
+            # 失败结果不缓存，等待中的请求同样收到错误回复
+            _router_stats["failed"] += 1
+            logger.error(f"[命令] 执行 {name} 出错: {e}", exc_info=True)
+            reply = f"❌ {name} 执行失败: {e}"
+        else:
+            _store_reply(key, reply, cache_ttl)
+        future.set_result(reply)
+        return reply
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.cancel()
+
+
+def _store_reply(key: Tuple[str, str], reply: Optional[str], cache_ttl: float):
+    """
+    [内部] 写入回复缓存；条目过多时先清理已过期的条目
+    """
+    now = time.monotonic()
+    if len(_reply_cache) >= _MAX_CACHED_REPLIES:
+        for stale in [k for k, (expires, _) in _reply_cache.items() if expires <= now]:
+            del _reply_cache[stale]
+    if len(_reply_cache) < _MAX_CACHED_REPLIES:
+        _reply_cache[key] = (now + cache_ttl, reply)
+
+
+def _iter_commands(node: Dict[str, Any]):
+    """
+    [内部] 遍历前缀树中的全部命令名
+    """
+    for ch, child in node.items():
+        if ch == _COMMAND_KEY:
+            yield child
+        else:
+            yield from _iter_commands(child)
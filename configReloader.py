@@ -0,0 +1,238 @@
+# configReloader.py
+import asyncio
+import importlib.util
+import logging
+import os
+import signal
+import sys
+from types import ModuleType
+from typing import Callable, Optional, Dict, Any, List, Set, Tuple
+
+import config
+
+logger = logging.getLogger("ConfigReloader")
+
+# --- 类型定义 ---
+# 准备阶段：接收新配置模块，返回预处理结果；不合法时抛出异常
+PrepareHookType = Callable[[ModuleType], Any]
+# 生效阶段：接收准备阶段结果与变化的配置项名集合
+ApplyHookType = Callable[[Any, Set[str]], None]
+
+# --- 全局状态管理 ---
+# 已注册的重载回调 [(prepare, apply)]
+_reload_hooks: List[Tuple[Optional[PrepareHookType], ApplyHookType]] = []
+
+# 配置项校验表 {配置名: 期望类型}
+_REQUIRED_SETTINGS: Dict[str, Any] = {
+    "TARGET_QQ_GROUP_ID": int,
+    "ENABLE_MC_CHAT_FORWARD": bool,
+    "ENABLE_MC_COMMAND_FORWARD": bool,
+    "ENABLE_MC_JOIN_NOTICE": bool,
+    "ENABLE_MC_QUIT_NOTICE": bool,
+    "ENABLE_MC_DEATH_NOTICE": bool,
+    "ENABLE_MC_ACHIEVEMENT_NOTICE": bool,
+    "NAPCAT_WS_HOST": str,
+    "NAPCAT_WS_PORT": int,
+    "NAPCAT_WS_TOKEN": str,
+    "NAPCAT_ENABLE_ECHO": bool,
+    "McPlugin_SELF_NAME": str,
+    "McPlugin_WS_URI": str,
+    "McPlugin_WS_TOKEN": str,
+    "McPlugin_RECONNECT_INTERVAL": (int, float),
+    "MCPLUGIN_ENABLE_ECHO": bool,
+    "MCPLUGIN_PROTOCOL": dict,
+    "QQ_MESSAGE_TEMPLATES": dict,
+    "QQ_MESSAGE_TEMPLATE_OVERRIDES": dict,
+    "DEBUG_MODE": bool,
+}
+
+# 被监视文件的最后修改时间 {路径: mtime}
+_watched_mtimes: Dict[str, float] = {}
+
+# 额外监视的数据文件 [(路径获取函数, 变化回调)]，如敏感词表
+_file_watches: List[Tuple[Callable[[], str], Callable[[], None]]] = []
+# 额外监视文件的最后修改时间 {路径: mtime}
+_file_watch_mtimes: Dict[str, float] = {}
+
+# 旧配置中不存在某项时的占位值
+_MISSING = object()
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def register_reload_hook(apply: ApplyHookType, prepare: Optional[PrepareHookType] = None):
+    """
+    [接口] 注册配置重载回调
+
+    重载分两阶段进行：
+    1. 所有 prepare 依次执行 (校验 / 预编译)，任一失败则整体放弃，旧配置保持不变
+    2. 所有 prepare 成功后，在同一个事件循环步骤内替换配置并依次执行 apply
+    apply 必须是同步函数，从而保证切换对其他协程而言是原子的。
+    """
+    _reload_hooks.append((prepare, apply))
+
+
+def register_file_watch(path_getter: Callable[[], str], on_change: Callable[[], None]):
+    """
+    [接口] 注册额外监视的数据文件 (如词表)，文件变化时由监视任务调用 on_change
+    路径通过函数获取，以便配置重载后跟随新路径。
+    """
+    _file_watches.append((path_getter, on_change))
+    path = path_getter()
+    _file_watch_mtimes[path] = _mtime(path)
+
+
+def reload_config() -> bool:
+    """
+    [接口] 重新加载 config.py 与 messageProtocol.py
+
+    :return: 是否成功切换到新配置
+    """
+    logger.info("[配置重载] 正在加载新配置...")
+    try:
+        new_protocol, new_config = _load_candidate()
+        _validate(new_config)
+        prepared = [(prepare(new_config) if prepare else None, apply) for prepare, apply in _reload_hooks]
+    except Exception as e:
+        logger.error(f"[配置重载] 新配置校验失败，继续使用旧配置: {e}")
+        return False
+
+    # --- 原子切换 (期间没有 await) ---
+    new_values = _public_settings(new_config)
+    changed = {
+        name for name, value in new_values.items()
+        if getattr(config, name, _MISSING) != value
+    }
+    vars(config).update(new_values)
+    sys.modules["messageProtocol"] = new_protocol
+
+    for result, apply in prepared:
+        try:
+            apply(result, changed)
+        except Exception as e:
+            logger.error(f"[配置重载] 应用回调 {getattr(apply, '__qualname__', apply)} 出错: {e}", exc_info=True)
+
+    _remember_mtimes()
+    if changed:
+        logger.info(f"[配置重载] 已切换到新配置，变化项: {', '.join(sorted(changed))}")
+    else:
+        logger.info("[配置重载] 配置无变化。")
+    return True
+
+
+def install_reload_signal_handler(loop: asyncio.AbstractEventLoop):
+    """
+    [接口] 注册 SIGHUP 信号：收到后重新加载配置
+    """
+    if not hasattr(signal, "SIGHUP"):
+        logger.debug("[配置重载] 当前平台不支持 SIGHUP，跳过信号注册。")
+        return
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_config)
+        logger.info(f"[配置重载] 发送 SIGHUP (kill -HUP {os.getpid()}) 即可重新加载配置。")
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning(f"[配置重载] 注册信号处理失败: {e}")
+
+
+async def run_config_watch_task():
+    """
+    [接口] 配置文件监视任务：按间隔检查修改时间，变化时自动重载
+    同时检查通过 register_file_watch 注册的数据文件。
+    """
+    interval = config.CONFIG_WATCH_INTERVAL
+    _remember_mtimes()
+    logger.info(f"[配置重载] 正在监视配置文件变化 (间隔 {interval}s)")
+
+    while True:
+        await asyncio.sleep(interval)
+        if any(_mtime(path) != mtime for path, mtime in _watched_mtimes.items()):
+            # 先记录，避免编辑器分多次写入时反复触发失败的重载
+            _remember_mtimes()
+            reload_config()
+
+        for path_getter, on_change in _file_watches:
+            path = path_getter()
+            mtime = _mtime(path)
+            if _file_watch_mtimes.get(path) != mtime:
+                _file_watch_mtimes[path] = mtime
+                logger.info(f"[配置重载] 检测到数据文件变化: {path}")
+                try:
+                    on_change()
+                except Exception as e:
+                    logger.error(f"[配置重载] 处理文件变化 {path} 时出错: {e}", exc_info=True)
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _watched_files() -> List[str]:
+    return [config.__file__, sys.modules["messageProtocol"].__file__]
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def _remember_mtimes():
+    for path in _watched_files():
+        _watched_mtimes[path] = _mtime(path)
+
+
+def _load_module(name: str, path: str) -> ModuleType:
+    """
+    [内部] 从文件加载一个全新的模块对象 (不修改 sys.modules)
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_candidate() -> Tuple[ModuleType, ModuleType]:
+    """
+    [内部] 加载候选的 messageProtocol 与 config
+
+    config.py 内部通过 `from messageProtocol import ...` 读取协议，
+    因此执行 config 期间临时让它看到新的 messageProtocol，结束后立即还原。
+    """
+    old_protocol = sys.modules["messageProtocol"]
+    new_protocol = _load_module("messageProtocol", old_protocol.__file__)
+
+    sys.modules["messageProtocol"] = new_protocol
+    try:
+        new_config = _load_module("config", config.__file__)
+    finally:
+        sys.modules["messageProtocol"] = old_protocol
+
+    return new_protocol, new_config
+
+
+def _validate(new_config: ModuleType):
+    """
+    [内部] 校验新配置的必填项与类型
+    """
+    for name, expected in _REQUIRED_SETTINGS.items():
+        if not hasattr(new_config, name):
+            raise ValueError(f"Missing required setting '{name}'")
+        value = getattr(new_config, name)
+        # bool 是 int 的子类，需单独排除
+        if expected is int and isinstance(value, bool):
+            raise ValueError(f"Setting '{name}' must be int, got bool")
+        if not isinstance(value, expected):
+            raise ValueError(f"Setting '{name}' has invalid type {type(value).__name__}")
+
+
+def _public_settings(module: ModuleType) -> Dict[str, Any]:
+    """
+    [内部] 提取配置模块中的公开项 (非下划线开头、非模块对象)
+    """
+    return {
+        name: value for name, value in vars(module).items()
+        if not name.startswith("_") and not isinstance(value, ModuleType)
+    }
@@ -5,6 +5,61 @@
 # --- 转发配置 ---
 # QQ ↔ MC 互通目标群号
 TARGET_QQ_GROUP_ID = 00000000
+# --- QQ 消息转发配置 ---
+# 是否将 QQ 富文本 (图片 / @ / 表情 / 回复 / 链接) 转为 MC 文本组件
+# False = 沿用旧行为，含 CQ 码或以链接开头的消息直接拦截
+QQ_FORWARD_RICH_SEGMENTS = True
+# 群成员信息 (群名片 / 角色) 缓存时长 (秒)，群名片变更等通知会使缓存提前失效
+QQ_MEMBER_CACHE_TTL = 600
+# 群成员信息缓存条数上限 (超出时淘汰最久未使用的成员)
+QQ_MEMBER_CACHE_SIZE = 2000
+# 群信息 (群名等) 缓存时长 (秒)
+QQ_GROUP_CACHE_TTL = 3600
+# NapCat 连接建立时预热目标群的群信息与成员列表 (需要 NAPCAT_ENABLE_ECHO)
+QQ_META_WARMUP = True
+
+# --- QQ 图片预览 ---
+# 是否将 QQ 图片转为色块预览 (鼠标悬停 [图片] 时显示)，需要 pip install Pillow
+# 图片从 NapCat 本地路径读取，要求本程序与 NapCat 在同一台机器 (或共享目录)
+QQ_IMAGE_PREVIEW_ENABLE = False
+# 预览宽度 (字符数) / 最大行数 / 颜色数
+MEDIA_PREVIEW_WIDTH = 24
+MEDIA_PREVIEW_MAX_ROWS = 12
+MEDIA_PREVIEW_COLORS = 16
+# 图片转换进程数 / 同时进行的转换数上限 (实际并发不超过进程数，多出的转换在进程池外排队，不计入超时)
+MEDIA_PROCESS_WORKERS = 2
+MEDIA_MAX_CONCURRENCY = 4
+# 单张图片转换超时 (秒)，超时则只显示 [图片]
+MEDIA_TIMEOUT = 3.0
+# 超过该大小 (字节) 的图片不生成预览
+MEDIA_MAX_FILE_SIZE = 8 * 1024 * 1024
+# 预览结果缓存条数 (按图片内容哈希，重复的表情包直接命中)
+MEDIA_CACHE_SIZE = 256
+
+# --- 出站消息长度限制 ---
+# 单条消息最大字符数 {目的地: 字符数}，超出时优先在换行 / 空白处拆成多条
+MESSAGE_SPLIT_LIMITS = {"mc": 256, "qq": 1500}
+# 单条原始消息最多拆成几条，超出部分截断
+MESSAGE_SPLIT_MAX_PARTS = 3
+
+# --- 敏感词过滤 (QQ ↔ MC 双向) ---
+# 是否启用敏感词过滤
+WORD_FILTER_ENABLE = False
+# 词表文件，每行一个词，可写成 "词|block" 指定动作 (参考 banned_words_example.txt)
+# 文件修改后会被自动重新加载
+WORD_FILTER_FILE = "banned_words.txt"
+# 未指定动作时的默认动作：mask (打码) / block (拦截整条) / flag (仅记录日志)
+WORD_FILTER_DEFAULT_ACTION = "mask"
+# 打码使用的字符
+WORD_FILTER_MASK_CHAR = "*"
+
+# --- 转发规则 (按来源群 / 服务器 / 事件类型 / 发送者 / 内容正则 放行、丢弃、改写或改投其他群) ---
+# 是否启用转发规则；未命中任何规则的消息按上面的转发开关处理
+# 目标群以外的群的消息只有在规则中明确匹配该群 (match.group) 时才会转发
+FORWARD_RULES_ENABLE = False
+# 规则文件 (JSON，格式参考 forward_rules_example.json 与 forwardRules.py 顶部说明)
+# 文件修改后会被自动重新加载
+FORWARD_RULES_FILE = "forward_rules.json"
 # --- MC 事件转发开关 ---
 # 根据需求调整默认值
 ENABLE_MC_CHAT_FORWARD = True         # 玩家聊天
@@ -13,6 +68,13 @@ ENABLE_MC_JOIN_NOTICE = True          # 玩家加入游戏
 ENABLE_MC_QUIT_NOTICE = True          # 玩家离开游戏
 ENABLE_MC_DEATH_NOTICE = True         # 玩家死亡
 ENABLE_MC_ACHIEVEMENT_NOTICE = True   # 玩家获得成就
+# Minecraft 语言文件 (从客户端 assets/minecraft/lang/zh_cn.json 提取)
+# 用于将死亡原因与成就标题译为中文，留空则使用服务端提供的文本
+MC_LANG_FILE = "zh_cn.json"
+# 翻译结果 LRU 缓存条数
+MC_LANG_CACHE_SIZE = 1024
+# 聊天 JSON 文本组件展开结果的 LRU 缓存条数 (Mod 服的前缀、称号等)
+MC_COMPONENT_CACHE_SIZE = 256
 
 # --- NapCat 连接配置 (Python作为服务端等待连接) ---
 # 监听地址，0.0.0.0 表示允许所有 IP 连接
@@ -23,6 +85,36 @@ NAPCAT_WS_PORT = 6100
 NAPCAT_WS_TOKEN = "00000000"
 # Server 是否支持 echo-response API
 NAPCAT_ENABLE_ECHO = True
+# WebSocket 连接参数 (修改后热重载只影响新连接)
+# 是否启用 permessage-deflate 压缩 (本机部署可关闭以节省 CPU)
+NAPCAT_WS_COMPRESSION = True
+# 单条消息最大字节数 (硬上限，较高以容纳图片等大数据包)，超出时关闭连接
+NAPCAT_WS_MAX_SIZE = 2**24
+# 软上限 (字节)：超过的消息在解析前直接丢弃并按对端计数，连接保持；0 表示不限制
+# 注意 API 响应 (如大群的成员列表) 也受此限制：超出时对应的调用立即失败
+NAPCAT_WS_SOFT_MAX_SIZE = 2**22
+# 压缩比上限：解压后大小超过线上字节数的该倍数 (且超过 64KiB) 时停止解压并关闭连接；None 表示不检查
+NAPCAT_WS_MAX_COMPRESSION_RATIO = 100
+# 接收队列上限 (帧数)；单连接接收缓冲最多约 MAX_SIZE × MAX_QUEUE 字节
+NAPCAT_WS_MAX_QUEUE = 16
+# 写缓冲高/低水位 (字节)
+NAPCAT_WS_WRITE_LIMIT_HIGH = 32768
+NAPCAT_WS_WRITE_LIMIT_LOW = 8192
+# 心跳 ping 间隔 / 超时 (秒)，None 表示关闭
+NAPCAT_WS_PING_INTERVAL = 20
+NAPCAT_WS_PING_TIMEOUT = 20
+# 心跳存活巡检：连续错过多少次 NapCat 心跳即驱逐连接 (间隔取自心跳包)
+NAPCAT_HEARTBEAT_MAX_MISSED = 3
+# 存活巡检间隔 (秒)
+NAPCAT_HEARTBEAT_CHECK_INTERVAL = 5
+
+# --- 多进程模式 (仅 Linux / macOS) ---
+# NapCat 服务端进程数：> 1 时由监督进程启动多个子进程，共享 NapCat 监听端口 (SO_REUSEPORT)；
+# 0 号进程负责 McPlugin 连接，其余进程经 IPC 转交 MC 流量与群命令。修改后需重启
+# 注意：只有同时连接多个 NapCat 实例时才有意义；各进程分别写入历史记录数据库
+NAPCAT_WORKERS = 1
+# 进程间通信使用的 Unix 套接字路径
+CLUSTER_IPC_SOCKET = "/tmp/linkmc-cluster.sock"
 
 # --- McPlugin 连接配置 (Python作为客户端主动去连) ---
 # McPlugin 插件 WebSocket 服务的地址 (通常是本机)
@@ -37,8 +129,141 @@ McPlugin_RECONNECT_INTERVAL = 5
 # False = 仅作为事件流（推荐默认）
 # True  = 启用 call_mc_plugin_api
 MCPLUGIN_ENABLE_ECHO = False
+# WebSocket 连接参数 (含义同 NapCat 部分，修改后热重载会重建 MC 连接)
+McPlugin_WS_COMPRESSION = True
+McPlugin_WS_MAX_SIZE = 2**24
+McPlugin_WS_SOFT_MAX_SIZE = 2**20
+McPlugin_WS_MAX_COMPRESSION_RATIO = 100
+McPlugin_WS_MAX_QUEUE = 16
+McPlugin_WS_WRITE_LIMIT_HIGH = 32768
+McPlugin_WS_WRITE_LIMIT_LOW = 8192
+McPlugin_WS_PING_INTERVAL = 20
+McPlugin_WS_PING_TIMEOUT = 20
+
+# --- 运行时配置 ---
+# 是否在可用时使用 uvloop 事件循环 (需 pip install uvloop，Windows 不支持)
+USE_UVLOOP = True
+
+# --- 诊断配置 ---
+# 是否启用事件循环看门狗 (监控调度延迟，阻塞时打印堆栈)
+LOOP_MONITOR_ENABLE = True
+# 看门狗探测间隔 (秒)
+LOOP_MONITOR_INTERVAL = 0.5
+# 调度延迟超过该值 (秒) 即记录堆栈快照
+LOOP_LAG_THRESHOLD = 0.2
+# 采样分析默认时长 (秒)，通过 SIGUSR1 触发
+PROFILER_DURATION = 30
+# 采样间隔 (秒)
+PROFILER_SAMPLE_INTERVAL = 0.005
+# 采样结果 (collapsed-stack 格式) 输出目录
+PROFILER_OUTPUT_DIR = "profiles"
+# 内存报告：发送 SIGUSR2 或连接本地端口时，输出各子系统 (待确认表 / 队列 / 缓存 / 连接缓冲) 的内存估算，
+# 以及 tracemalloc 相对上次触发的增量 (按模块汇总)
+# 是否启动即开启 tracemalloc (有额外内存与 CPU 开销)；关闭时首次触发才开启，第二次触发起才有增量
+MEMORY_TRACE_ENABLE = False
+# tracemalloc 记录的调用栈层数
+MEMORY_TRACE_FRAMES = 1
+# 增量报告列出的模块数
+MEMORY_REPORT_TOP = 15
+# 本地查询端口 (仅监听 127.0.0.1，0 表示不开启)，nc 127.0.0.1 <端口> 即可获取 JSON 报告
+# 多进程模式下第 N 个进程 (primary 为 0) 使用 端口 + N
+MEMORY_REPORT_PORT = 0
+
+# --- 过载保护 (按排队时延丢弃低价值事件) ---
+# 开启后入站事件先进入队列再由独立任务处理；排队时间持续超标时，
+# 优先丢弃命令回显、进出服、群通知以及刷屏聊天，死亡 / 成就 / 群命令不会被丢弃
+LOAD_SHED_ENABLE = False
+# 目标排队时延 (秒)：超过该值的事件视为"已经迟到"
+LOAD_SHED_TARGET = 0.5
+# 排队时延持续超标多久 (秒) 后开始丢弃
+LOAD_SHED_INTERVAL = 2.0
+# 过载时每个发送者每 10 秒保留的聊天条数，超出部分可被丢弃
+LOAD_SHED_CHAT_RATE = 5
+# 每条链路入站队列的最大长度：已满时低价值事件 / 聊天直接丢弃，其余事件暂停接收等待空位
+LOAD_SHED_MAX_QUEUE = 5000
+
+# --- 投递确认 (至少一次) ---
+# 开启后，发往 NapCat / MC 的异步通知会等待对端回执 (需要对应链路的 ECHO 开关)，
+# 失败或超时按指数退避重发；重发可能导致对端收到重复消息
+DELIVERY_CONFIRM_ENABLE = False
+# 等待回执的超时时间 (秒)
+DELIVERY_ACK_TIMEOUT = 5
+# 最多重发次数
+DELIVERY_MAX_RETRIES = 3
+# 首次重发前的等待时间 (秒)，之后每次翻倍
+DELIVERY_RETRY_BASE_DELAY = 1.0
+# 未送达的通知在状态快照中保留多久 (秒)，重启后超过该时间的不再补发
+DELIVERY_REPLAY_TTL = 300
+
+# --- 热重载配置 ---
+# 配置文件 (config.py / messageProtocol.py) 变化检查间隔 (秒)，0 表示关闭文件监视
+# 无论是否开启，均可通过 SIGHUP 信号手动触发重载
+CONFIG_WATCH_INTERVAL = 3
+
+# --- QQ 群命令配置 ---
+# 是否启用群命令 (#在线 / #白名单 / #排行 等)，关闭后所有消息按普通聊天转发
+QQ_COMMAND_ENABLE = True
+# 不受角色限制的 QQ 号
+QQ_COMMAND_SUPERUSERS = []
+# 按命令覆盖所需角色 (member / admin / owner)，如 {"#统计": "admin"}
+QQ_COMMAND_PERMISSIONS = {}
+# 是否启用 #执行 (通过 RCON 执行任意服务器命令)：风险较高，默认关闭；
+# 开启后只有群主与 QQ_COMMAND_SUPERUSERS 中的 QQ 号可用 (不受 QQ_COMMAND_PERMISSIONS 影响)，每次执行都记录日志
+QQ_COMMAND_RCON_ENABLE = False
+
+# --- 历史记录配置 ---
+# 是否将互通的聊天与事件写入 SQLite (支持 QQ 群内 #搜索 / #最近死亡)
+HISTORY_ENABLE = False
+# 数据库文件路径
+HISTORY_DB_FILE = "history.db"
+# 单个事务最多写入的记录数
+HISTORY_BATCH_SIZE = 200
+# 攒批最长等待时间 (秒)
+HISTORY_FLUSH_INTERVAL = 0.5
+# 待写入队列上限，超出时丢弃新记录 (磁盘过慢时保护内存)
+HISTORY_QUEUE_MAX = 10000
+# QQ 查询命令单次返回的最多条数
+HISTORY_QUERY_LIMIT = 10
+
+# --- 玩家统计配置 ---
+# 是否统计玩家在线时长 / 死亡次数 / 发言数 (支持 QQ 群内 #排行)
+PLAYER_STATS_ENABLE = False
+# 统计快照文件路径
+PLAYER_STATS_FILE = "player_stats.json"
+# 快照保存间隔 (秒)，关闭时也会保存一次
+PLAYER_STATS_SNAPSHOT_INTERVAL = 300
+
+# --- 群实时状态 (在线人数) ---
+# 是否根据进出服事件在 QQ 群中维护在线状态 (需要 NAPCAT_ENABLE_ECHO)
+STATUS_BOARD_ENABLE = False
+# 发布方式：card = 修改机器人群名片 (需管理员权限，不打扰成员)；notice = 发布群公告 (完整名单)
+STATUS_BOARD_MODE = "card"
+# card 模式的名片格式，{online} 为在线人数
+STATUS_BOARD_CARD_FORMAT = "MC 在线 {online} 人"
+# 名单变化后等待多久 (秒) 再发布，期间的变化合并为一次
+STATUS_BOARD_DEBOUNCE = 10
+# 两次发布的最小间隔 (秒)，notice 模式建议调大以免频繁提醒群成员
+STATUS_BOARD_MIN_INTERVAL = 60
+
+# --- 状态快照 (重启后热启动) ---
+# 开启后，群信息缓存、命令回复缓存、图片预览缓存与未送达的通知会在关闭时和定期写入快照，
+# 启动时恢复 (已过期的条目跳过)，避免重启后集中调用 API 与丢失消息
+STATE_SNAPSHOT_ENABLE = False
+# 快照文件路径 (多进程模式下每个进程追加各自的后缀)
+STATE_SNAPSHOT_FILE = "state_snapshot.json.gz"
+# 定期保存间隔 (秒)
+STATE_SNAPSHOT_INTERVAL = 60
+# 快照保存后超过该时间 (秒) 才启动则整体忽略
+STATE_SNAPSHOT_MAX_AGE = 3600
+
+# --- 优雅关闭配置 ---
+# 收到 SIGTERM / SIGINT 后，等待在途消息与 API 请求完成的最长时间 (秒)
+SHUTDOWN_DRAIN_TIMEOUT = 10
+
 # === MC Plugin 协议定义 ===
 from messageProtocol import MCPLUGIN_PROTOCOL
+# === QQ 消息模板 (MC 事件 → QQ 文本，可按群覆盖) ===
+from messageProtocol import QQ_MESSAGE_TEMPLATES, QQ_MESSAGE_TEMPLATE_OVERRIDES
 from eventProtocol import build_event
 
 
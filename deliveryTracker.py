@@ -0,0 +1,198 @@
+# deliveryTracker.py
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import Callable, Awaitable, Optional, Dict, Any, List, Set, Tuple
+
+import config
+import memoryReport
+
+logger = logging.getLogger("Delivery")
+
+# ============================================================
+# 出站通知的至少一次投递 (基于 echo 回执)
+# ============================================================
+# 说明：
+# - 开启 DELIVERY_CONFIRM_ENABLE 且对应链路启用了 echo 时，每条异步通知携带
+#   "<链路>-<序号>" 形式的 echo (自增序号，不生成 uuid)
+# - 发送方只等待帧写入套接字，回执由接收循环异步匹配，不阻塞业务流程
+# - 回执失败 (NapCat retcode != 0 / 鹊桥 status != SUCCESS) 或超时未收到回执时，
+#   按指数退避 (带随机抖动) 重发，超过 DELIVERY_MAX_RETRIES 次后放弃并计数
+# - 超时后又收到旧回执会直接确认，减少重复；但重发仍可能导致对端收到重复消息
+# - 未确认与关闭时放弃的通知可导出到状态快照，重启后在链路重新连接时补发
+# ============================================================
+
+# --- 类型定义 ---
+# 发送函数：把已带 echo 的 payload 写入连接，失败时抛出异常
+SendFuncType = Callable[[Dict[str, Any]], Awaitable[None]]
+# 回执判定函数：接收响应 dict，返回是否投递成功
+AckCheckType = Callable[[Dict[str, Any]], bool]
+
+
+class DeliveryTracker:
+    """
+    [接口] 单条链路的投递跟踪器 (每条链路一个实例)
+    """
+
+    def __init__(self, link: str, send: SendFuncType, is_success: AckCheckType):
+        self.link = link
+        self._prefix = f"{link}-"
+        self._send = send
+        self._is_success = is_success
+        self._seq = itertools.count(1)
+        # 待确认的通知 {echo: {"payload", "attempt", "timer"}}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # 重发任务 (保持引用，防止被回收)
+        self._tasks: Set[asyncio.Task] = set()
+        # 关闭时放弃的通知 [(提交时间, payload)]，供状态快照导出
+        self._abandoned: List[Tuple[float, Dict[str, Any]]] = []
+        # 从快照恢复、等待链路连接后补发的通知 [(过期时间, payload)]
+        self._replay: List[Tuple[float, Dict[str, Any]]] = []
+        self._stats: Dict[str, int] = {
+            "submitted": 0, "acked": 0, "retried": 0, "failed": 0, "late_acks": 0, "replayed": 0,
+        }
+
+    async def send(self, payload: Dict[str, Any]) -> bool:
+        """
+        分配 echo 并发送；返回首次发送是否写入套接字 (失败时仍会按退避重发)
+        """
+        echo = f"{self._prefix}{next(self._seq)}"
+        payload["echo"] = echo
+        entry = {"payload": payload, "attempt": 0, "timer": None, "submitted_at": time.time()}
+        self._pending[echo] = entry
+        self._stats["submitted"] += 1
+        return await self._attempt(echo, entry)
+
+    def resolve(self, echo: str, response: Dict[str, Any]) -> bool:
+        """
+        处理一条回执；返回 True 表示该 echo 属于本跟踪器 (调用方不再继续处理)
+        """
+        entry = self._pending.get(echo)
+        if entry is None:
+            if echo.startswith(self._prefix):
+                # 已确认或已放弃的通知的迟到回执
+                self._stats["late_acks"] += 1
+                return True
+            return False
+
+        if self._is_success(response):
+            del self._pending[echo]
+            self._cancel_timer(entry)
+            self._stats["acked"] += 1
+            return True
+
+        self._on_failure(echo, f"对端返回失败: {response.get('message') or response.get('wording') or response}")
+        return True
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def abandon_all(self) -> int:
+        """
+        放弃全部待确认通知 (关闭流程)，返回放弃的数量
+        """
+        count = len(self._pending)
+        for entry in self._pending.values():
+            self._cancel_timer(entry)
+            self._abandoned.append((entry["submitted_at"], entry["payload"]))
+        self._pending.clear()
+        for task in self._tasks:
+            task.cancel()
+        self._stats["failed"] += count
+        return count
+
+    def dump_undelivered(self, ttl: float) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        导出未确认 / 关闭时放弃 / 尚未补发的通知 [(过期时间, payload)]，echo 会被去掉
+        """
+        entries = [(submitted_at + ttl, payload) for submitted_at, payload in self._abandoned]
+        entries += [(entry["submitted_at"] + ttl, entry["payload"]) for entry in self._pending.values()]
+        entries += self._replay
+        return [(expires, {k: v for k, v in payload.items() if k != "echo"}) for expires, payload in entries]
+
+    def restore_undelivered(self, entries: List[Tuple[float, Dict[str, Any]]]):
+        """
+        恢复待补发的通知 (链路连接后调用 replay 发送)
+        """
+        self._replay.extend((expires, payload) for expires, payload in entries)
+
+    async def replay(self):
+        """
+        补发从快照恢复且仍未过期的通知 (链路连接建立后调用)
+        """
+        now = time.time()
+        payloads = [payload for expires, payload in self._replay if expires > now]
+        self._replay.clear()
+        if not payloads:
+            return
+        logger.info(f"[投递] {self.link} 正在补发上次运行未送达的 {len(payloads)} 条通知")
+        for payload in payloads:
+            self._stats["replayed"] += 1
+            await self.send(payload)
+
+    def memory_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        内存估算：待确认表与待补发 / 已放弃的通知
+        """
+        return {
+            "delivery_pending": memoryReport.usage(self._pending),
+            "delivery_undelivered": memoryReport.usage(self._abandoned + self._replay),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["pending"] = len(self._pending)
+        finished = stats["acked"] + stats["failed"]
+        stats["success_rate"] = round(stats["acked"] / finished, 4) if finished else None
+        return stats
+
+    # ------------------------------------------
+    # 内部实现
+    # ------------------------------------------
+
+    async def _attempt(self, echo: str, entry: Dict[str, Any]) -> bool:
+        entry["attempt"] += 1
+        loop = asyncio.get_running_loop()
+        self._cancel_timer(entry)
+        entry["timer"] = loop.call_later(config.DELIVERY_ACK_TIMEOUT, self._on_failure, echo, "回执超时")
+        try:
+            await self._send(entry["payload"])
+            return True
+        except Exception as e:
+            self._on_failure(echo, f"发送失败: {e}")
+            return False
+
+    def _on_failure(self, echo: str, reason: str):
+        entry = self._pending.get(echo)
+        if entry is None:
+            return
+        self._cancel_timer(entry)
+
+        if entry["attempt"] > config.DELIVERY_MAX_RETRIES:
+            del self._pending[echo]
+            self._stats["failed"] += 1
+            logger.warning(f"[投递] {self.link} 通知 {echo} 重试 {entry['attempt'] - 1} 次后仍失败，放弃 ({reason})")
+            return
+
+        delay = config.DELIVERY_RETRY_BASE_DELAY * (2 ** (entry["attempt"] - 1)) * (0.5 + random.random())
+        self._stats["retried"] += 1
+        logger.debug(f"[投递] {self.link} 通知 {echo} 第 {entry['attempt']} 次失败 ({reason})，{delay:.1f}s 后重发")
+        entry["timer"] = asyncio.get_running_loop().call_later(delay, self._schedule_retry, echo)
+
+    def _schedule_retry(self, echo: str):
+        entry = self._pending.get(echo)
+        if entry is None:
+            return
+        entry["timer"] = None
+        task = asyncio.get_running_loop().create_task(self._attempt(echo, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _cancel_timer(entry: Dict[str, Any]):
+        timer: Optional[asyncio.TimerHandle] = entry.get("timer")
+        if timer is not None:
+            timer.cancel()
+            entry["timer"] = None
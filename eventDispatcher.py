@@ -0,0 +1,108 @@
+# eventDispatcher.py
+import asyncio
+import logging
+from typing import Callable, Awaitable, Optional, Dict, Any, List, Set, Tuple
+
+import config
+# 导入事件标准化工具
+from config import build_event
+
+logger = logging.getLogger("EventDispatcher")
+
+# ============================================================
+# MC 事件分发表
+# ============================================================
+# 说明：
+# - 业务处理函数通过 @on_mc_event(sub_type, enabled_by=...) 按 sub_type 注册
+# - enabled_by 指向 config 中的开关名，在注册 / 配置重载时解析一次，
+#   分发时不再逐条读取配置
+# - 没有任何已启用处理函数的事件，在 build_event 之前直接返回
+# - 同一事件的多个处理函数并发执行，统计 / 持久化等附加功能不增加转发延迟
+# ============================================================
+
+# --- 类型定义 ---
+# 事件处理函数：接收标准事件对象 (build_event 的结果)
+EventHandlerType = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# --- 全局状态管理 ---
+# 全部注册信息 {sub_type: [(处理函数, 开关名或 None)]}
+_registry: Dict[str, List[Tuple[EventHandlerType, Optional[str]]]] = {}
+
+# 生效中的分发表 {sub_type: (已启用的处理函数, ...)}，整体替换
+_dispatch_table: Dict[str, Tuple[EventHandlerType, ...]] = {}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def on_mc_event(sub_type: str, enabled_by: Optional[str] = None):
+    """
+    [接口] 装饰器：注册某个 sub_type 的事件处理函数
+
+    :param sub_type: 事件子类型，如 "player_chat"
+    :param enabled_by: config 中的开关名，为 False 时该处理函数不参与分发
+    """
+    def decorator(handler: EventHandlerType) -> EventHandlerType:
+        _registry.setdefault(sub_type, []).append((handler, enabled_by))
+        rebuild_dispatch_table()
+        return handler
+
+    return decorator
+
+
+def rebuild_dispatch_table():
+    """
+    [接口] 根据当前配置重新解析开关，生成新的分发表并原子替换
+    """
+    global _dispatch_table
+
+    table = {}
+    for sub_type, entries in _registry.items():
+        handlers = tuple(
+            handler for handler, enabled_by in entries
+            if enabled_by is None or getattr(config, enabled_by)
+        )
+        if handlers:
+            table[sub_type] = handlers
+    _dispatch_table = table
+
+
+def enable_settings() -> Set[str]:
+    """
+    [接口] 分发表依赖的全部开关名
+    """
+    return {enabled_by for entries in _registry.values() for _, enabled_by in entries if enabled_by}
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：开关变化时重建分发表
+    """
+    if changed & enable_settings():
+        rebuild_dispatch_table()
+        logger.info(f"[分发表] 已按新配置重建，启用事件: {', '.join(sorted(_dispatch_table)) or '无'}")
+
+
+async def dispatch_mc_event(raw: Dict[str, Any]):
+    """
+    [接口] 分发一条 MC 原始事件
+    """
+    handlers = _dispatch_table.get(raw.get("sub_type"))
+    if not handlers:
+        # 未知或全部关闭的事件：不做任何标准化工作
+        return
+
+    event = build_event(raw)
+
+    if len(handlers) == 1:
+        await handlers[0](event)
+        return
+
+    results = await asyncio.gather(*(handler(event) for handler in handlers), return_exceptions=True)
+    for handler, result in zip(handlers, results):
+        if isinstance(result, Exception):
+            logger.error(
+                f"[分发表] 处理函数 {handler.__qualname__} 处理 {raw.get('sub_type')} 时出错: {result}",
+                exc_info=result,
+            )
@@ -132,6 +132,7 @@ MC_EVENT_FIELD_MAP: Dict[str, Dict[str, tuple]] = {
         "server_name": ("server_name",),
 
         "player_nickname": ("player", "nickname"),
+        "player_uuid": ("player", "uuid"),
 
         "death_key": ("death", "key"),
         "death_args": ("death", "args"),
@@ -148,6 +149,7 @@ MC_EVENT_FIELD_MAP: Dict[str, Dict[str, tuple]] = {
         "server_name": ("server_name",),
 
         "player_nickname": ("player", "nickname"),
+        "player_uuid": ("player", "uuid"),
 
         "achievement_key": ("achievement", "key"),
         "achievement_text": ("achievement", "text"),
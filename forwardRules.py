@@ -0,0 +1,343 @@
+# forwardRules.py
+import itertools
+import json
+import logging
+import os
+import re
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+import config
+
+logger = logging.getLogger("ForwardRules")
+
+# ============================================================
+# 转发规则 (声明式规则文件 → 按判别字段建立的决策索引)
+# ============================================================
+# 说明：
+# - 规则文件为 JSON：{"rules": [规则, ...]}，按文件中的顺序决定优先级
+#   规则 = {
+#       "name": "规则名 (可选，用于命中统计)",
+#       "direction": "qq_to_mc" | "mc_to_qq",
+#       "match": {                        # 各条件同时满足才算命中，值可以是列表 (任一)
+#           "group": 群号,                 # 仅 qq_to_mc：消息来源群
+#           "server": "服务器名",          # 仅 mc_to_qq
+#           "sub_type": "player_chat",    # qq_to_mc 方向为 "group_message"
+#           "sender": "QQ 号 / 玩家名 / 玩家 UUID",
+#           "content": "正则 (re.search)"  # qq_to_mc 匹配原始消息，mc_to_qq 匹配渲染后的 QQ 文本
+#       },
+#       "action": "forward" | "drop" | "rewrite" | "redirect",
+#       "pattern": "正则", "replace": "替换文本",  # rewrite：pattern 缺省时使用 match.content
+#       "group": 群号                              # redirect：改投到该 QQ 群
+#   }
+# - forward / drop / redirect 命中即结束；rewrite 改写内容后继续匹配后续规则
+#   (后续规则看到的是改写后的内容)；都未命中时按原有逻辑处理
+# - 加载时按规则用到的等值字段组合 (形状) 分组，每种形状一张 {字段值元组: [规则序号]} 的哈希表；
+#   评估时每种形状只做一次查表，开销与形状数和候选规则数有关，与规则总数无关
+# - 同一张表中带 content 正则的候选规则先用合并后的正则整体筛一次，全部不匹配时不再逐条匹配
+# - 其他群的 QQ 消息只有在 qq_to_mc 规则明确匹配该群时才会处理 (不执行群命令、不写历史)
+# - ENABLE_MC_* 开关仍在规则之前生效：已关闭的事件类型不会进入规则评估
+# ============================================================
+
+DIRECTION_QQ_TO_MC = "qq_to_mc"
+DIRECTION_MC_TO_QQ = "mc_to_qq"
+
+ACTION_FORWARD = "forward"
+ACTION_DROP = "drop"
+ACTION_REWRITE = "rewrite"
+ACTION_REDIRECT = "redirect"
+
+# 各方向允许的等值字段 (顺序即索引键的字段顺序)
+_DIRECTION_FIELDS = {
+    DIRECTION_QQ_TO_MC: ("group", "sub_type", "sender"),
+    DIRECTION_MC_TO_QQ: ("server", "sub_type", "sender"),
+}
+_ACTIONS = {ACTION_FORWARD, ACTION_DROP, ACTION_REWRITE, ACTION_REDIRECT}
+
+# 改写操作 (已编译的正则, 替换文本)
+RewriteType = Tuple["re.Pattern[str]", str]
+# 评估结果 (动作, 改投群号或 None, 改写后的内容, 依次生效的改写操作)
+DecisionType = Tuple[str, Optional[int], str, List[RewriteType]]
+
+
+class _Rule:
+    """
+    [内部] 已编译的单条规则
+    """
+    __slots__ = ("index", "name", "content", "action", "rewrite", "group")
+
+    def __init__(self, index: int, name: str, content: Optional["re.Pattern[str]"], action: str,
+                 rewrite: Optional[RewriteType], group: Optional[int]):
+        self.index = index
+        self.name = name
+        self.content = content
+        self.action = action
+        self.rewrite = rewrite
+        self.group = group
+
+
+class _Bucket:
+    """
+    [内部] 同一形状、同一组字段值的候选规则 (按优先级排序)
+    """
+    __slots__ = ("rules", "prefilter", "has_rewrite")
+
+    def __init__(self, rules: List[_Rule]):
+        self.rules = rules
+        self.has_rewrite = any(rule.action == ACTION_REWRITE for rule in rules)
+        # 合并全部 content 正则的预筛选 (含捕获组的正则无法安全合并，此时为 None)
+        patterns = [rule.content for rule in rules if rule.content is not None]
+        self.prefilter = None
+        if patterns and all(p.groups == 0 for p in patterns):
+            try:
+                self.prefilter = re.compile("|".join(f"(?:{p.pattern})" for p in patterns))
+            except re.error:
+                # 如正则中间含有 (?i) 等全局标志
+                pass
+
+
+class _RuleIndex:
+    """
+    [内部] 已编译的规则索引 (构建后只读，重载时整体替换)
+    """
+    __slots__ = ("rules", "shapes", "qq_groups")
+
+    def __init__(self, rules: List[Tuple[str, Dict[str, tuple], _Rule]]):
+        self.rules = [rule for _, _, rule in rules]
+        # {方向: [(形状字段, {字段值元组: _Bucket})]}
+        self.shapes: Dict[str, List[Tuple[Tuple[str, ...], Dict[tuple, _Bucket]]]] = {}
+        # qq_to_mc 规则明确匹配的来源群 (目标群以外的群只处理这些)
+        self.qq_groups: Set[int] = set()
+
+        grouped: Dict[str, Dict[Tuple[str, ...], Dict[tuple, List[_Rule]]]] = {}
+        for direction, match, rule in rules:
+            shape = tuple(field for field in _DIRECTION_FIELDS[direction] if field in match)
+            table = grouped.setdefault(direction, {}).setdefault(shape, {})
+            # 值为列表的字段展开为多个键
+            for key in itertools.product(*(match[field] for field in shape)):
+                table.setdefault(key, []).append(rule)
+            if direction == DIRECTION_QQ_TO_MC and "group" in match and rule.action != ACTION_DROP:
+                self.qq_groups.update(match["group"])
+
+        for direction, shapes in grouped.items():
+            self.shapes[direction] = [
+                (shape, {key: _Bucket(bucket) for key, bucket in table.items()})
+                for shape, table in shapes.items()
+            ]
+
+    def candidates(self, direction: str, values: Dict[str, tuple]) -> List[_Bucket]:
+        """
+        每种形状查一次表，返回命中的候选桶
+        """
+        buckets = []
+        for shape, table in self.shapes.get(direction, ()):
+            for key in itertools.product(*(values.get(field, (None,)) for field in shape)):
+                bucket = table.get(key)
+                if bucket is not None:
+                    buckets.append(bucket)
+        return buckets
+
+
+# --- 全局状态管理 ---
+# 当前生效的规则索引 (未启用或规则为空时为 None)
+_index: Optional[_RuleIndex] = None
+
+# 每条规则的命中次数 (按规则序号，重载时清零)
+_rule_hits: List[int] = []
+
+# 统计
+_rule_stats: Dict[str, int] = {"evaluated": 0, "matched": 0}
+
+# 与规则相关的配置项 (变化时重新加载)
+_RULE_SETTINGS = {"FORWARD_RULES_ENABLE", "FORWARD_RULES_FILE"}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def load_rules() -> bool:
+    """
+    [接口] 从 FORWARD_RULES_FILE 编译规则并原子替换当前索引
+
+    :return: 是否加载成功 (失败时保留旧规则)
+    """
+    global _index, _rule_hits
+
+    if not config.FORWARD_RULES_ENABLE:
+        _index = None
+        return True
+
+    try:
+        rules = _read_rule_file(config.FORWARD_RULES_FILE)
+    except (OSError, ValueError, re.error) as e:
+        logger.error(f"[转发规则] 加载规则失败，继续使用旧规则: {e}")
+        return False
+
+    _index = _RuleIndex(rules) if rules else None
+    _rule_hits = [0] * len(rules)
+    logger.info(f"[转发规则] 规则已加载: {len(rules)} 条 ({config.FORWARD_RULES_FILE})")
+    return True
+
+
+def evaluate(direction: str, content: str, default: str = ACTION_FORWARD, **fields) -> DecisionType:
+    """
+    [接口] 按规则评估一条消息
+
+    :param direction: DIRECTION_QQ_TO_MC / DIRECTION_MC_TO_QQ
+    :param content: 用于 content 正则匹配与改写的文本
+    :param default: 没有 forward / drop / redirect 规则命中时的动作
+    :param fields: 等值字段 group / server / sub_type / sender，值可为元组 (任一匹配即可，如玩家名与 UUID)
+    :return: (动作, 改投群号, 改写后的内容, 改写操作列表)
+    """
+    index = _index
+    if index is None:
+        return default, None, content, []
+
+    values = {
+        field: tuple(_normalize(field, v) for v in (value if isinstance(value, tuple) else (value,)) if v is not None)
+        for field, value in fields.items()
+    }
+    _rule_stats["evaluated"] += 1
+    buckets = index.candidates(direction, values)
+    if not buckets:
+        return default, None, content, []
+
+    rewrites: List[RewriteType] = []
+    for rule in _ordered_candidates(buckets, content):
+        if rule.content is not None and rule.content.search(content) is None:
+            continue
+        _rule_hits[rule.index] += 1
+        _rule_stats["matched"] += 1
+        if rule.action == ACTION_REWRITE:
+            content = rule.rewrite[0].sub(rule.rewrite[1], content)
+            rewrites.append(rule.rewrite)
+            continue
+        return rule.action, rule.group, content, rewrites
+    return default, None, content, rewrites
+
+
+def apply_rewrites(text: str, rewrites: List[RewriteType]) -> str:
+    """
+    [接口] 将评估得到的改写操作应用到另一段文本 (如富文本中的各文本段)
+    """
+    for pattern, replace in rewrites:
+        text = pattern.sub(replace, text)
+    return text
+
+
+def covers_group(group_id: Any) -> bool:
+    """
+    [接口] 是否有 qq_to_mc 规则明确处理该群的消息 (用于目标群以外的群)
+    """
+    index = _index
+    return index is not None and group_id in index.qq_groups
+
+
+def get_rule_stats() -> Dict[str, Any]:
+    """
+    [接口] 规则统计 (评估次数、命中次数、每条规则的命中数)
+    """
+    stats: Dict[str, Any] = dict(_rule_stats)
+    index = _index
+    stats["rules"] = len(index.rules) if index else 0
+    stats["hits"] = {rule.name: _rule_hits[rule.index] for rule in index.rules} if index else {}
+    return stats
+
+
+def rules_file_path() -> str:
+    """
+    [接口] 当前规则文件路径 (供文件监视使用)
+    """
+    return config.FORWARD_RULES_FILE
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：规则相关配置变化时重新加载
+    """
+    if changed & _RULE_SETTINGS:
+        load_rules()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _normalize(field: str, value: Any) -> Any:
+    """
+    [内部] 统一字段值类型：群号为 int，其余为 str
+    """
+    if field == "group":
+        return int(value)
+    return str(value)
+
+
+def _ordered_candidates(buckets: List[_Bucket], content: str) -> List[_Rule]:
+    """
+    [内部] 合并候选桶并按优先级排序；预筛选不匹配的桶跳过其中的正则规则
+    (候选中有 rewrite 规则时内容可能被改写，不做预筛选)
+    """
+    prefilter = not any(bucket.has_rewrite for bucket in buckets)
+    rules = []
+    for bucket in buckets:
+        if prefilter and bucket.prefilter is not None and bucket.prefilter.search(content) is None:
+            rules.extend(rule for rule in bucket.rules if rule.content is None)
+        else:
+            rules.extend(bucket.rules)
+    if len(buckets) > 1:
+        rules.sort(key=lambda rule: rule.index)
+    return rules
+
+
+def _read_rule_file(path: str) -> List[Tuple[str, Dict[str, tuple], _Rule]]:
+    """
+    [内部] 读取并校验规则文件 [(方向, 等值条件, 规则)]
+    """
+    if not os.path.exists(path):
+        raise OSError(f"Forward rules file not found: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    if not isinstance(raw, dict) or not isinstance(raw.get("rules"), list):
+        raise ValueError(f"{path}: expected {{\"rules\": [...]}}")
+
+    rules = []
+    for i, item in enumerate(raw["rules"]):
+        where = f"{path}: rule #{i + 1}"
+        if not isinstance(item, dict):
+            raise ValueError(f"{where}: rule must be an object")
+        direction = item.get("direction")
+        if direction not in _DIRECTION_FIELDS:
+            raise ValueError(f"{where}: unknown direction {direction!r}")
+        action = item.get("action")
+        if action not in _ACTIONS:
+            raise ValueError(f"{where}: unknown action {action!r}")
+
+        match = dict(item.get("match") or {})
+        content = match.pop("content", None)
+        content = re.compile(content) if content is not None else None
+        unknown = set(match) - set(_DIRECTION_FIELDS[direction])
+        if unknown:
+            raise ValueError(f"{where}: field(s) {', '.join(sorted(unknown))} not allowed for {direction}")
+        conditions = {
+            field: tuple(_normalize(field, v) for v in (value if isinstance(value, list) else [value]))
+            for field, value in match.items()
+        }
+
+        rewrite = None
+        if action == ACTION_REWRITE:
+            pattern = item.get("pattern")
+            if pattern is None and content is None:
+                raise ValueError(f"{where}: rewrite needs 'pattern' or match.content")
+            if not isinstance(item.get("replace"), str):
+                raise ValueError(f"{where}: rewrite needs 'replace'")
+            rewrite = (re.compile(pattern) if pattern is not None else content, item["replace"])
+
+        group = None
+        if action == ACTION_REDIRECT:
+            if item.get("group") is None:
+                raise ValueError(f"{where}: redirect needs 'group'")
+            group = int(item["group"])
+
+        name = str(item.get("name") or f"#{i + 1}")
+        rules.append((direction, conditions, _Rule(i, name, content, action, rewrite, group)))
+    return rules
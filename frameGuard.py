@@ -0,0 +1,127 @@
+# frameGuard.py
+import asyncio
+import logging
+import re
+from typing import Dict, Any, Union
+
+from websockets.exceptions import ConnectionClosed
+from websockets.frames import CloseCode
+
+from runtimeProfile import link_setting
+
+logger = logging.getLogger("FrameGuard")
+
+# 未解析的原文中的 echo 字段 (响应的 data 中也可能出现同名字段，按等待中的请求 ID 逐个核对)
+_ECHO_PATTERN = re.compile(r'"echo"\s*:\s*"([^"\\]{1,128})"')
+
+# ============================================================
+# 入站消息大小限制与按对端的拒收统计
+# ============================================================
+# 说明：每条链路三道限制
+# - 硬上限 *_WS_MAX_SIZE：由 websockets 在接收时检查 (解压后的大小)，超出即以 1009 关闭连接；
+#   单连接接收缓冲最多约 MAX_SIZE × MAX_QUEUE 字节
+# - 软上限 *_WS_SOFT_MAX_SIZE：超过的消息在 json.loads 之前直接丢弃，连接保持；
+#   被丢弃的若是 API 响应 (原文中能找到等待中的 echo)，对应的调用立即失败，不必等到超时
+# - 压缩比上限 *_WS_MAX_COMPRESSION_RATIO：permessage-deflate 解压时检查 (见 runtimeProfile)，
+#   超出即停止解压并以 1009 关闭连接，少量线上流量无法放大成大量内存 (解压炸弹)
+# - 按对端地址统计：软上限丢弃数 / 字节数、非法 JSON 数、因超限被关闭的次数
+# ============================================================
+
+
+class FrameGuard:
+    """
+    [接口] 单条链路的入站消息检查与按对端的拒收统计 (每条链路一个实例)
+    """
+
+    def __init__(self, link: str):
+        self.link = link
+        # {对端地址: {oversized, oversized_bytes, invalid_json, closed_too_big, closed_ratio}}
+        self._peers: Dict[str, Dict[str, int]] = {}
+
+    def accept(self, websocket, message: Union[str, bytes]) -> bool:
+        """
+        软上限检查 (json.loads 之前调用)：超过时记录并返回 False
+        """
+        limit = link_setting(self.link, "SOFT_MAX_SIZE")
+        if not limit:
+            return True
+        size = len(message)
+        # 字符数不超过 limit / 4 时 UTF-8 编码后也不会超过 limit，无需编码计算字节数
+        if isinstance(message, str) and limit // 4 < size <= limit:
+            size = len(message.encode("utf-8"))
+        if size <= limit:
+            return True
+
+        counters = self._counters(websocket)
+        counters["oversized"] += 1
+        counters["oversized_bytes"] += size
+        logger.warning(f"[接收] {self.link} 对端 {_peer_name(websocket)} 的消息 {size} 字节超过软上限 {limit}，已丢弃")
+        return False
+
+    def fail_pending(self, message: Union[str, bytes], pending: Dict[str, asyncio.Future]) -> bool:
+        """
+        被软上限丢弃的消息若是等待中的 API 响应，让对应的调用立即失败 (RuntimeError)
+        """
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", "replace")
+        if '"echo"' not in message:
+            return False
+        for match in _ECHO_PATTERN.finditer(message):
+            future = pending.get(match.group(1))
+            if future is not None and not future.done():
+                future.set_exception(RuntimeError(
+                    f"{self.link} API response of {len(message)} chars exceeds the soft size limit"
+                ))
+                return True
+        return False
+
+    def record_invalid(self, websocket):
+        """
+        记录一条非法 JSON
+        """
+        self._counters(websocket)["invalid_json"] += 1
+
+    def record_close(self, websocket, exc: ConnectionClosed):
+        """
+        连接关闭时调用：由本端以 1009 (消息过大) 关闭的连接计入对端统计
+        """
+        if exc.sent is None or exc.sent.code != CloseCode.MESSAGE_TOO_BIG:
+            return
+        extensions = getattr(getattr(websocket, "protocol", None), "extensions", None) or []
+        if any(getattr(extension, "tripped", False) for extension in extensions):
+            self._counters(websocket)["closed_ratio"] += 1
+            logger.warning(f"[接收] {self.link} 对端 {_peer_name(websocket)} 的消息压缩比超过上限，连接已关闭")
+        else:
+            self._counters(websocket)["closed_too_big"] += 1
+            logger.warning(f"[接收] {self.link} 对端 {_peer_name(websocket)} 的消息超过硬上限，连接已关闭")
+
+    def stats(self) -> Dict[str, Any]:
+        max_size = link_setting(self.link, "MAX_SIZE")
+        max_queue = link_setting(self.link, "MAX_QUEUE")
+        return {
+            "soft_max_size": link_setting(self.link, "SOFT_MAX_SIZE"),
+            "max_size": max_size,
+            "max_compression_ratio": link_setting(self.link, "MAX_COMPRESSION_RATIO"),
+            # 单连接接收缓冲的上限 (字节)
+            "per_connection_bound": max_size * max_queue if max_size and max_queue else None,
+            "peers": {peer: dict(counters) for peer, counters in self._peers.items()},
+        }
+
+    def _counters(self, websocket) -> Dict[str, int]:
+        peer = _peer_name(websocket)
+        counters = self._peers.get(peer)
+        if counters is None:
+            counters = self._peers[peer] = {
+                "oversized": 0, "oversized_bytes": 0, "invalid_json": 0, "closed_too_big": 0, "closed_ratio": 0,
+            }
+        return counters
+
+
+def _peer_name(websocket) -> str:
+    """
+    [内部] 对端标识：只取主机地址 (重连后端口会变化)
+    """
+    address = getattr(websocket, "remote_address", None)
+    if isinstance(address, (tuple, list)) and address:
+        return str(address[0])
+    return str(address)
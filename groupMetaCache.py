@@ -0,0 +1,326 @@
+# groupMetaCache.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Awaitable, Optional, Dict, Any, Hashable, List, Set, Tuple
+
+import config
+import memoryReport
+from server4NapCat import call_napcat_api
+
+logger = logging.getLogger("GroupMetaCache")
+
+# ============================================================
+# QQ 群 / 群成员信息缓存 (基于 call_napcat_api)
+# ============================================================
+# 说明：
+# - 群信息与成员信息分别缓存，条目带过期时间，超出容量时淘汰最久未使用的条目
+# - 群消息事件自带的 sender (card / nickname / role) 直接写入缓存，
+#   常见的 @ 与角色查询不需要调用 API，稳定状态下一次查询只是一次 dict 访问
+# - NapCat 连接建立时预热目标群的群信息与成员列表
+# - 群名片变更 / 成员退群 / 管理员变动等 notice 事件使对应条目失效
+# - NapCat 事件处理路径只用 lookup_* 查缓存 (不等待)：未命中时在后台查询，本条消息先用兜底显示；
+#   事件处理期间不能等待 NapCat 的响应 (同一连接的接收循环正在等待处理结束)
+# - 同一个 key 并发未命中时只发起一次 API 请求；API 明确返回失败的结果短时间内不重试，
+#   超时 / 连接断开等暂时性失败不缓存
+# ============================================================
+
+# 查询失败时的负缓存时长 (秒)
+_NEGATIVE_TTL = 30
+
+
+class _TTLCache:
+    """
+    [内部] 带过期时间的 LRU 缓存 (值为 None 表示查询失败的负缓存)
+    """
+    __slots__ = ("name", "entries", "inflight", "maxsize", "ttl",
+                 "hits", "misses", "evictions", "invalidations")
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        # {key: (过期时间, 值)}，按最近使用排序
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # 正在查询的 key {key: Task}
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def peek(self, key: Hashable) -> tuple:
+        """
+        查询缓存：(是否命中, 值)
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.monotonic():
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if self.entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]):
+        """
+        查询缓存，未命中时调用 loader 并等待结果 (并发的相同 key 共享一次调用)
+        """
+        hit, value = self.peek(key)
+        if hit:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def lookup(self, key: Hashable, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]):
+        """
+        只查缓存 (不等待)：未命中时在后台调用 loader，本次返回 None
+        """
+        hit, value = self.peek(key)
+        if hit:
+            self.hits += 1
+            return value
+        self.misses += 1
+        self._start_load(key, loader)
+        return None
+
+    def _start_load(self, key: Hashable, loader) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.ensure_future(self._load(key, loader))
+        return task
+
+    async def _load(self, key: Hashable, loader) -> Optional[Dict[str, Any]]:
+        try:
+            value = await loader()
+        except Exception as e:
+            # 暂时性失败不写负缓存，下次查询重试
+            logger.debug(f"[群信息] 查询 {self.name} {key} 失败: {e}")
+            return None
+        finally:
+            self.inflight.pop(key, None)
+        self.put(key, value, None if value is not None else _NEGATIVE_TTL)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# --- 全局状态管理 ---
+# 群信息 {group_id: info}
+_groups = _TTLCache("group", 64, config.QQ_GROUP_CACHE_TTL)
+# 群成员信息 {(group_id, user_id): info}
+_members = _TTLCache("member", config.QQ_MEMBER_CACHE_SIZE, config.QQ_MEMBER_CACHE_TTL)
+
+# 会使成员信息失效的 notice 类型
+_MEMBER_NOTICES = {"group_card", "group_decrease", "group_increase", "group_admin", "group_ban"}
+
+# 与缓存相关的配置项
+_CACHE_SETTINGS = {"QQ_GROUP_CACHE_TTL", "QQ_MEMBER_CACHE_TTL", "QQ_MEMBER_CACHE_SIZE"}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+async def get_group_info(group_id: int) -> Optional[Dict[str, Any]]:
+    """
+    [接口] 获取群信息 (get_group_info)，失败或未启用 API 时返回 None
+    """
+    return await _groups.get(group_id, lambda: _call_api("get_group_info", {"group_id": group_id}))
+
+
+async def get_member_info(group_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    [接口] 获取群成员信息 (get_group_member_info)，失败或未启用 API 时返回 None
+    """
+    return await _members.get(
+        (group_id, user_id),
+        lambda: _call_api("get_group_member_info", {"group_id": group_id, "user_id": user_id}),
+    )
+
+
+async def get_group_name(group_id: int) -> Optional[str]:
+    """
+    [接口] 获取群名
+    """
+    info = await get_group_info(group_id)
+    return (info or {}).get("group_name") or None
+
+
+async def get_member_display_name(group_id: int, user_id: int) -> Optional[str]:
+    """
+    [接口] 获取群成员显示名 (群名片优先)
+    """
+    return _display_name(await get_member_info(group_id, user_id))
+
+
+def lookup_group_name(group_id: int) -> Optional[str]:
+    """
+    [接口] 只查缓存的群名 (NapCat 事件处理路径使用)：未命中时后台查询并返回 None
+    """
+    info = _groups.lookup(group_id, lambda: _call_api("get_group_info", {"group_id": group_id}))
+    return (info or {}).get("group_name") or None
+
+
+def lookup_member_display_name(group_id: int, user_id: int) -> Optional[str]:
+    """
+    [接口] 只查缓存的群成员显示名 (NapCat 事件处理路径使用)：未命中时后台查询并返回 None
+    """
+    return _display_name(_members.lookup(
+        (group_id, user_id),
+        lambda: _call_api("get_group_member_info", {"group_id": group_id, "user_id": user_id}),
+    ))
+
+
+def observe_message(data: Dict[str, Any]):
+    """
+    [接口] 用群消息事件自带的发送者信息刷新成员缓存 (不调用 API)
+    """
+    group_id = data.get("group_id")
+    sender = data.get("sender")
+    user_id = data.get("user_id") or (sender or {}).get("user_id")
+    if group_id is None or user_id is None or not isinstance(sender, dict):
+        return
+    _members.put((group_id, user_id), {
+        "group_id": group_id,
+        "user_id": user_id,
+        "nickname": sender.get("nickname"),
+        "card": sender.get("card"),
+        "role": sender.get("role"),
+    })
+
+
+def handle_notice(data: Dict[str, Any]):
+    """
+    [接口] 处理 NapCat notice 事件：使受影响的缓存条目失效
+    """
+    notice_type = data.get("notice_type")
+    group_id = data.get("group_id")
+    if group_id is None:
+        return
+
+    if notice_type in _MEMBER_NOTICES and data.get("user_id") is not None:
+        _members.invalidate((group_id, data["user_id"]))
+    if notice_type in ("group_increase", "group_decrease") or \
+            (notice_type == "notify" and data.get("sub_type") == "group_name"):
+        # 成员数 / 群名变化
+        _groups.invalidate(group_id)
+
+
+async def warm_up():
+    """
+    [接口] 预热目标群的群信息与成员列表 (NapCat 连接建立时调用)
+    """
+    if not config.NAPCAT_ENABLE_ECHO or not config.QQ_META_WARMUP:
+        return
+    group_id = config.TARGET_QQ_GROUP_ID
+
+    await get_group_info(group_id)
+    try:
+        members = await _call_api("get_group_member_list", {"group_id": group_id})
+    except Exception as e:
+        logger.warning(f"[群信息] 预热群 {group_id} 成员列表失败: {e}")
+        return
+    if not isinstance(members, list):
+        return
+    for info in members[:config.QQ_MEMBER_CACHE_SIZE]:
+        if isinstance(info, dict) and info.get("user_id") is not None:
+            _members.put((group_id, info["user_id"]), info)
+    logger.info(f"[群信息] 已预热群 {group_id}: {len(members)} 名成员")
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 缓存统计 {缓存名: {size, hits, misses, evictions, invalidations}}
+    """
+    return {"group": _groups.stats(), "member": _members.stats()}
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：群 / 成员缓存
+    """
+    return {"group": memoryReport.usage(_groups.entries), "member": memoryReport.usage(_members.entries)}
+
+
+def dump_snapshot() -> List[Tuple[float, list]]:
+    """
+    [接口] 状态快照：导出群 / 成员缓存 (不含负缓存)，过期时间换算为墙上时间
+    """
+    now_mono, now_wall = time.monotonic(), time.time()
+    entries = []
+    for cache in (_groups, _members):
+        for key, (expires, value) in cache.entries.items():
+            if value is not None and expires > now_mono:
+                entries.append((now_wall + expires - now_mono, [cache.name, key, value]))
+    return entries
+
+
+def restore_snapshot(entries: List[Tuple[float, list]]):
+    """
+    [接口] 状态快照：恢复群 / 成员缓存 (保持剩余有效期与最近使用顺序)
+    """
+    caches = {cache.name: cache for cache in (_groups, _members)}
+    now_wall = time.time()
+    for expires, (name, key, value) in entries:
+        cache = caches.get(name)
+        if cache is not None:
+            # 成员缓存的 key 为 (group_id, user_id)，JSON 中是列表
+            cache.put(tuple(key) if isinstance(key, list) else key, value, expires - now_wall)
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：调整容量与过期时间 (已缓存条目保持原过期时间)
+    """
+    if changed & _CACHE_SETTINGS:
+        _groups.ttl = config.QQ_GROUP_CACHE_TTL
+        _members.ttl = config.QQ_MEMBER_CACHE_TTL
+        _members.maxsize = config.QQ_MEMBER_CACHE_SIZE
+        while len(_members.entries) > _members.maxsize:
+            _members.entries.popitem(last=False)
+            _members.evictions += 1
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _display_name(info: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not info:
+        return None
+    return info.get("card") or info.get("nickname") or None
+
+
+async def _call_api(action: str, params: Dict[str, Any]) -> Any:
+    """
+    [内部] 调用 NapCat API 并返回 data 字段：API 返回失败时为 None，
+    超时 / 连接错误直接抛出 (调用方不写负缓存)
+    """
+    if not config.NAPCAT_ENABLE_ECHO:
+        return None
+    resp = await call_napcat_api(action, params, timeout=3.0)
+    if resp.get("retcode", 0) != 0:
+        logger.debug(f"[群信息] {action} 返回错误: {resp.get('retcode')} {resp.get('message') or resp.get('wording')}")
+        return None
+    return resp.get("data")
@@ -0,0 +1,195 @@
+# loadShedder.py
+import asyncio
+import collections
+import logging
+import time
+from typing import Callable, Optional, Dict, Any, Hashable, Tuple
+
+import config
+import memoryReport
+from commandRouter import match_command
+
+logger = logging.getLogger("LoadShedder")
+
+# ============================================================
+# 入站事件队列与按排队时延的自适应丢弃 (CoDel 思路)
+# ============================================================
+# 说明：
+# - 开启 LOAD_SHED_ENABLE 后，接收循环只把事件放入本队列即返回，由独立的消费任务处理，
+#   积压发生在这里而不是 websockets 的接收缓冲区，因而可以测量每条事件的排队时间
+# - 出队时的排队时间 (sojourn) 持续 LOAD_SHED_INTERVAL 秒都高于 LOAD_SHED_TARGET 时进入丢弃状态；
+#   一旦有事件的排队时间回落到目标以下即退出，无需人工干预
+# - 丢弃状态下只丢弃低价值事件：
+#     low  : 命令回显、进出服、群通知等，排队超时即丢弃
+#     chat : 聊天，只丢弃发送者在当前窗口内超过 LOAD_SHED_CHAT_RATE 条的部分
+#     keep : 死亡 / 成就 / 群命令等，从不丢弃
+# - 队列长度上限 LOAD_SHED_MAX_QUEUE：已满时 low / chat 事件在入队时直接丢弃，
+#   keep 事件等待空位 (接收循环随之暂停，恢复 websockets / TCP 的背压)
+# - 按事件类型统计丢弃数量
+# ============================================================
+
+SHED_LOW = "low"
+SHED_CHAT = "chat"
+SHED_KEEP = "keep"
+
+# --- 类型定义 ---
+# 分类函数：接收原始事件，返回 (事件类型名, 丢弃等级, 发送者标识或 None)
+ClassifierType = Callable[[Dict[str, Any]], Tuple[str, str, Optional[Hashable]]]
+
+# 聊天限速的统计窗口 (秒)
+_RATE_WINDOW = 10.0
+
+
+class SheddingQueue:
+    """
+    [接口] 单条链路的入站事件队列 (每条链路一个实例)
+    """
+
+    def __init__(self, link: str, classify: ClassifierType):
+        self.link = link
+        self._classify = classify
+        # 待处理事件 (入队时间, 事件类型名, 丢弃等级, 是否超出聊天限速, 事件)
+        self._items: "collections.deque[tuple]" = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        # CoDel 状态：排队时间首次超标后的判定截止时间 (0 表示未超标)，以及是否处于丢弃状态
+        self._first_above = 0.0
+        self._dropping = False
+        # 聊天限速 {发送者: 当前窗口内的条数}
+        self._rate_counts: Dict[Hashable, int] = {}
+        self._rate_window_start = 0.0
+        self._stats: Dict[str, Any] = {"enqueued": 0, "processed": 0, "max_sojourn_ms": 0, "shed": {}}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, data: Dict[str, Any]):
+        """
+        入队：队列已满时丢弃低价值事件，其余事件等待空位
+        """
+        now = time.monotonic()
+        event_type, shed_class, sender = self._classify(data)
+
+        over_rate = False
+        if shed_class == SHED_CHAT and sender is not None:
+            if now - self._rate_window_start > _RATE_WINDOW:
+                self._rate_window_start = now
+                self._rate_counts.clear()
+            count = self._rate_counts.get(sender, 0) + 1
+            self._rate_counts[sender] = count
+            over_rate = count > config.LOAD_SHED_CHAT_RATE
+
+        if len(self._items) >= config.LOAD_SHED_MAX_QUEUE:
+            if shed_class != SHED_KEEP:
+                self._count_shed(event_type)
+                return
+            while len(self._items) >= config.LOAD_SHED_MAX_QUEUE:
+                self._not_full.clear()
+                await self._not_full.wait()
+            now = time.monotonic()
+
+        self._items.append((now, event_type, shed_class, over_rate, data))
+        self._stats["enqueued"] += 1
+        self._not_empty.set()
+
+    async def get(self) -> Dict[str, Any]:
+        """
+        出队：跳过 (并统计) 丢弃状态下的低价值事件
+        """
+        while True:
+            while not self._items:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            enqueued_at, event_type, shed_class, over_rate, data = self._items.popleft()
+            self._not_full.set()
+            now = time.monotonic()
+            sojourn = now - enqueued_at
+            self._update_state(sojourn, now)
+
+            if self._dropping and sojourn > config.LOAD_SHED_TARGET and (
+                    shed_class == SHED_LOW or (shed_class == SHED_CHAT and over_rate)):
+                self._count_shed(event_type)
+                continue
+
+            self._stats["processed"] += 1
+            return data
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["shed"] = dict(self._stats["shed"])
+        stats["queued"] = len(self._items)
+        stats["dropping"] = self._dropping
+        return stats
+
+    def memory_usage(self) -> Dict[str, int]:
+        return memoryReport.usage(self._items)
+
+    def shed_total(self) -> int:
+        return sum(self._stats["shed"].values())
+
+    def _count_shed(self, event_type: str):
+        shed = self._stats["shed"]
+        shed[event_type] = shed.get(event_type, 0) + 1
+
+    def _update_state(self, sojourn: float, now: float):
+        """
+        [内部] 按出队事件的排队时间更新丢弃状态
+        """
+        sojourn_ms = int(sojourn * 1000)
+        if sojourn_ms > self._stats["max_sojourn_ms"]:
+            self._stats["max_sojourn_ms"] = sojourn_ms
+
+        if sojourn < config.LOAD_SHED_TARGET:
+            self._first_above = 0.0
+            if self._dropping:
+                self._dropping = False
+                logger.info(f"[过载保护] {self.link} 排队时延已恢复，停止丢弃")
+            return
+
+        if self._first_above == 0.0:
+            self._first_above = now + config.LOAD_SHED_INTERVAL
+        elif not self._dropping and now >= self._first_above:
+            self._dropping = True
+            logger.warning(
+                f"[过载保护] {self.link} 排队时延持续超过 {config.LOAD_SHED_TARGET}s "
+                f"(当前 {sojourn:.2f}s，积压 {len(self._items)} 条)，开始丢弃低价值事件"
+            )
+
+
+# ==========================================
+# 各链路的事件分类
+# ==========================================
+
+# MC 事件 sub_type → 丢弃等级
+_MC_SHED_CLASSES = {
+    "player_command": SHED_LOW,
+    "player_join": SHED_LOW,
+    "player_quit": SHED_LOW,
+    "player_chat": SHED_CHAT,
+}
+
+
+def classify_mc_event(data: Dict[str, Any]) -> Tuple[str, str, Optional[Hashable]]:
+    """
+    [接口] MC 插件事件分类
+    """
+    sub_type = data.get("sub_type") or "unknown"
+    player = data.get("player") if isinstance(data.get("player"), dict) else {}
+    sender = player.get("uuid") or player.get("nickname")
+    return sub_type, _MC_SHED_CLASSES.get(sub_type, SHED_KEEP), sender
+
+
+def classify_napcat_event(data: Dict[str, Any]) -> Tuple[str, str, Optional[Hashable]]:
+    """
+    [接口] NapCat 事件分类 (已启用的群命令不丢弃，按命令表匹配)
+    """
+    post_type = data.get("post_type")
+    if post_type == "message":
+        raw = data.get("raw_message") or ""
+        if match_command(raw.strip()) is not None:
+            return "group_command", SHED_KEEP, None
+        return f"{data.get('message_type') or 'unknown'}_message", SHED_CHAT, data.get("user_id")
+    if post_type == "notice":
+        return f"notice_{data.get('notice_type') or 'unknown'}", SHED_LOW, None
+    return post_type or "unknown", SHED_KEEP, None
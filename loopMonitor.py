@@ -0,0 +1,204 @@
+# loopMonitor.py
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Optional, Dict, Any
+
+import config
+
+logger = logging.getLogger("LoopMonitor")
+
+# --- 全局状态管理 ---
+# 被监控事件循环所在线程的 ID (由 run_loop_monitor_task 记录)
+_loop_thread_id: Optional[int] = None
+
+# 延迟统计 (仅在事件循环线程中写入)
+_lag_stats: Dict[str, Any] = {
+    "samples": 0,       # 探测次数
+    "max_lag": 0.0,     # 历史最大调度延迟 (秒)
+    "last_lag": 0.0,    # 最近一次调度延迟 (秒)
+    "stalls": 0,        # 超过阈值的次数
+}
+
+# 采样分析器运行标记，防止重复触发
+_profiler_running = threading.Event()
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+async def run_loop_monitor_task():
+    """
+    [接口] 事件循环看门狗任务 (由 main.py 创建)
+
+    - 协程侧：按固定间隔 sleep，用实际唤醒时间与预期时间之差衡量调度延迟
+    - 线程侧：哨兵线程向循环投递探针，若超过阈值仍未执行，
+      说明循环正被同步代码阻塞，此时直接抓取循环线程的当前堆栈
+    空闲时开销仅为每个间隔一次 call_soon_threadsafe。
+    """
+    global _loop_thread_id
+
+    loop = asyncio.get_running_loop()
+    _loop_thread_id = threading.get_ident()
+
+    interval = config.LOOP_MONITOR_INTERVAL
+    threshold = config.LOOP_LAG_THRESHOLD
+
+    stop_event = threading.Event()
+    sentinel = threading.Thread(
+        target=_sentinel_worker,
+        args=(loop, stop_event, interval, threshold),
+        name="LoopSentinel",
+        daemon=True,
+    )
+    sentinel.start()
+    logger.info(f"[看门狗] 事件循环监控已启动 (间隔 {interval}s, 阈值 {threshold}s)")
+
+    try:
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+
+            _lag_stats["samples"] += 1
+            _lag_stats["last_lag"] = lag
+            if lag > _lag_stats["max_lag"]:
+                _lag_stats["max_lag"] = lag
+            if lag > threshold:
+                _lag_stats["stalls"] += 1
+    finally:
+        stop_event.set()
+
+
+def get_loop_lag_stats() -> Dict[str, Any]:
+    """
+    [接口] 获取事件循环调度延迟统计 (只读副本)
+    """
+    return dict(_lag_stats)
+
+
+def start_sampling_profiler(duration: Optional[float] = None) -> bool:
+    """
+    [接口] 启动一次采样分析 (在后台线程中运行 duration 秒)
+
+    采样结果以 collapsed-stack 格式写入 PROFILER_OUTPUT_DIR，
+    可直接交给 flamegraph.pl / speedscope 生成火焰图。
+    :return: 是否成功启动 (已有分析在运行时返回 False)
+    """
+    if _loop_thread_id is None:
+        logger.warning("[采样分析] 看门狗未启动，无法定位事件循环线程。")
+        return False
+    if _profiler_running.is_set():
+        logger.warning("[采样分析] 已有一次采样正在进行，忽略本次触发。")
+        return False
+
+    _profiler_running.set()
+    threading.Thread(
+        target=_profiler_worker,
+        args=(duration or config.PROFILER_DURATION, config.PROFILER_SAMPLE_INTERVAL),
+        name="SamplingProfiler",
+        daemon=True,
+    ).start()
+    return True
+
+
+def install_profiler_signal_handler(loop: asyncio.AbstractEventLoop):
+    """
+    [接口] 注册 SIGUSR1 信号：收到后触发一次采样分析
+    Windows 下无 SIGUSR1，直接跳过。
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        logger.debug("[采样分析] 当前平台不支持 SIGUSR1，跳过信号注册。")
+        return
+    try:
+        loop.add_signal_handler(signal.SIGUSR1, start_sampling_profiler)
+        logger.info(f"[采样分析] 发送 SIGUSR1 (kill -USR1 {os.getpid()}) 即可触发采样。")
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning(f"[采样分析] 注册信号处理失败: {e}")
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _format_loop_stack() -> str:
+    """
+    [内部] 抓取事件循环线程当前的调用栈 (从其他线程调用)
+    """
+    frame = sys._current_frames().get(_loop_thread_id)
+    if frame is None:
+        return "<无法获取事件循环线程堆栈>"
+    return "".join(traceback.format_stack(frame))
+
+
+def _sentinel_worker(loop: asyncio.AbstractEventLoop, stop_event: threading.Event,
+                     interval: float, threshold: float):
+    """
+    [内部] 哨兵线程：探测事件循环是否被阻塞，阻塞时记录堆栈快照
+    """
+    while not stop_event.wait(interval):
+        probe = threading.Event()
+        sent_at = time.perf_counter()
+        try:
+            loop.call_soon_threadsafe(probe.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            return
+
+        if probe.wait(threshold):
+            continue
+
+        # 超过阈值仍未执行：此刻循环线程正在执行的就是“元凶”
+        stack = _format_loop_stack()
+        logger.warning(
+            f"[看门狗] 事件循环阻塞超过 {threshold}s，当前堆栈快照:\n{stack}"
+        )
+        # 等待循环恢复，记录总阻塞时长
+        while not probe.wait(interval):
+            if stop_event.is_set():
+                return
+        blocked = time.perf_counter() - sent_at
+        logger.warning(f"[看门狗] 事件循环已恢复，本次阻塞约 {blocked:.3f}s")
+
+
+def _profiler_worker(duration: float, sample_interval: float):
+    """
+    [内部] 采样线程：周期性抓取事件循环线程堆栈并折叠计数
+    """
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + duration
+    logger.info(f"[采样分析] 开始采样 {duration}s (间隔 {sample_interval * 1000:.1f}ms)...")
+
+    try:
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(_loop_thread_id)
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if parts:
+                stacks[";".join(reversed(parts))] += 1
+            time.sleep(sample_interval)
+
+        os.makedirs(config.PROFILER_OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(
+            config.PROFILER_OUTPUT_DIR,
+            time.strftime("profile-%Y%m%d-%H%M%S.collapsed"),
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        logger.info(f"[采样分析] 完成，共 {sum(stacks.values())} 个样本，已写入: {path}")
+    except Exception as e:
+        logger.error(f"[采样分析] 采样失败: {e}", exc_info=True)
+    finally:
+        _profiler_running.clear()
@@ -6,10 +6,33 @@ import config
 import server4NapCat
 import client4McPlugin
 import messageMapper
+import loopMonitor
+import configReloader
+import shutdownCoordinator
+import runtimeProfile
+import wordFilter
+import eventDispatcher
+import qqTemplate
+import mcTranslator
+import textComponent
+import chatHistory
+import playerStats
+import commandRouter
+import groupMetaCache
+import mediaPipeline
+import workerCluster
+import stateSnapshot
+import statusBoard
+import memoryReport
+import forwardRules
+
+# 多进程模式下在日志中标明进程角色与序号
+_ROLE = workerCluster.current_role()
+_LOG_TAG = "" if _ROLE == workerCluster.ROLE_SINGLE else f"<{_ROLE}-{workerCluster.worker_index()}> "
 
 logging.basicConfig(
     level=logging.DEBUG if config.DEBUG_MODE else logging.INFO,
-    format='%(asctime)s [%(name)s] %(levelname)s: %(message)s',
+    format=_LOG_TAG + '%(asctime)s [%(name)s] %(levelname)s: %(message)s',
     datefmt='%H:%M:%S'
 )
 logger = logging.getLogger("MainBridge")
@@ -27,11 +50,14 @@ async def main():
     # --- 注册业务逻辑回调 ---
     logger.info("-> 正在注册业务逻辑处理函数 (连接 messageMapper)...")
 
-    # QQ -> MC
+    # QQ -> MC (多进程模式的 worker 把群命令转交 primary)
     server4NapCat.register_napcat_message_handler(
-        messageMapper.map_qq_to_mc
+        workerCluster.wrap_napcat_handler(messageMapper.map_qq_to_mc)
     )
 
+    # NapCat 连接建立时预热群信息缓存
+    server4NapCat.register_napcat_connect_handler(groupMetaCache.warm_up)
+
     # MC -> QQ
     client4McPlugin.register_mcplugin_message_handler(
         messageMapper.map_mc_to_qq
@@ -39,20 +65,185 @@ async def main():
 
     logger.info("-> 业务回调注册完毕，中枢神经已连接。")
 
+    # 多进程模式：worker 的 MC 流量经 IPC 交给 primary (单进程模式下不做任何事)
+    owns_mc_link = _ROLE != workerCluster.ROLE_WORKER
+    workerCluster.install_forwarders()
+
+    # --- 注册配置热重载回调 ---
+    configReloader.register_reload_hook(
+        client4McPlugin.apply_config_reload,
+        prepare=client4McPlugin.prepare_config_reload,
+    )
+    configReloader.register_reload_hook(server4NapCat.apply_config_reload)
+    configReloader.register_reload_hook(wordFilter.apply_config_reload)
+    configReloader.register_reload_hook(forwardRules.apply_config_reload)
+    configReloader.register_reload_hook(eventDispatcher.apply_config_reload)
+    configReloader.register_reload_hook(
+        qqTemplate.apply_config_reload,
+        prepare=qqTemplate.prepare_config_reload,
+    )
+
+    configReloader.register_reload_hook(mcTranslator.apply_config_reload)
+    configReloader.register_reload_hook(textComponent.apply_config_reload)
+    configReloader.register_reload_hook(commandRouter.apply_config_reload)
+    configReloader.register_reload_hook(groupMetaCache.apply_config_reload)
+
+    # --- 加载 MC 语言文件 (死亡 / 成就中文化) ---
+    mcTranslator.load_language_file()
+    textComponent.rebuild_cache()
+
+    # --- 编译 QQ 消息模板 (不合法时启动即报错) ---
+    qqTemplate.load_templates()
+
+    # --- 加载敏感词表 (文件变化时自动重新编译) ---
+    wordFilter.load_word_list()
+    configReloader.register_file_watch(wordFilter.word_file_path, wordFilter.load_word_list)
+
+    # --- 编译转发规则 (文件变化时自动重新编译) ---
+    forwardRules.load_rules()
+    configReloader.register_file_watch(forwardRules.rules_file_path, forwardRules.load_rules)
+    configReloader.install_reload_signal_handler(asyncio.get_running_loop())
+
+    # --- 恢复状态快照 (缓存与未送达的通知) ---
+    stateSnapshot.register_snapshot_section("group_meta", groupMetaCache.dump_snapshot, groupMetaCache.restore_snapshot)
+    stateSnapshot.register_snapshot_section("command_replies", commandRouter.dump_snapshot, commandRouter.restore_snapshot)
+    stateSnapshot.register_snapshot_section("media_previews", mediaPipeline.dump_snapshot, mediaPipeline.restore_snapshot)
+    stateSnapshot.register_snapshot_section(
+        "napcat_undelivered", server4NapCat.dump_undelivered, server4NapCat.restore_undelivered)
+    if owns_mc_link:
+        stateSnapshot.register_snapshot_section(
+            "mcplugin_undelivered", client4McPlugin.dump_undelivered, client4McPlugin.restore_undelivered)
+        stateSnapshot.register_snapshot_section("status_board", statusBoard.dump_snapshot, statusBoard.restore_snapshot)
+    if _ROLE != workerCluster.ROLE_SINGLE:
+        stateSnapshot.set_instance_name(f"{_ROLE}-{workerCluster.worker_index()}")
+    stateSnapshot.load_snapshot()
+
+    # --- 启动历史记录写线程 (HISTORY_ENABLE 关闭时跳过) ---
+    chatHistory.start_history_writer()
+
+    # --- 恢复玩家统计快照 ---
+    if config.PLAYER_STATS_ENABLE and owns_mc_link:
+        playerStats.load_snapshot()
+
+    # --- 注册优雅关闭流程 (按注册顺序执行) ---
+    shutdownCoordinator.register_shutdown_participant(
+        "NapCat",
+        stop_accepting=server4NapCat.stop_accepting,
+        drain=server4NapCat.drain,
+        close=server4NapCat.close_connections,
+    )
+    if owns_mc_link:
+        shutdownCoordinator.register_shutdown_participant(
+            "McPlugin",
+            stop_accepting=client4McPlugin.stop_accepting,
+            drain=client4McPlugin.drain,
+            close=client4McPlugin.close_connection,
+        )
+    shutdownCoordinator.register_shutdown_participant(
+        "History",
+        stop_accepting=chatHistory.stop_accepting,
+        drain=chatHistory.drain,
+    )
+    if owns_mc_link:
+        shutdownCoordinator.register_shutdown_participant(
+            "PlayerStats",
+            close=playerStats.close,
+        )
+    shutdownCoordinator.register_shutdown_participant(
+        "MediaPipeline",
+        close=mediaPipeline.close,
+    )
+    # 快照需在链路排空之后保存，以包含关闭时仍未送达的通知
+    shutdownCoordinator.register_shutdown_participant(
+        "StateSnapshot",
+        close=stateSnapshot.close,
+    )
+    shutdownCoordinator.register_shutdown_participant(
+        "WorkerCluster",
+        close=workerCluster.close,
+    )
+    shutdownCoordinator.install_shutdown_signal_handlers(asyncio.get_running_loop())
+
     tasks = []
 
+    if config.LOOP_MONITOR_ENABLE:
+        logger.info("-> 正在创建事件循环看门狗任务...")
+        tasks.append(asyncio.create_task(loopMonitor.run_loop_monitor_task()))
+        loopMonitor.install_profiler_signal_handler(asyncio.get_running_loop())
+
+    # --- 内存报告 (SIGUSR2 / 本地端口触发) ---
+    memoryReport.register_memory_probe("napcat", server4NapCat.get_memory_usage)
+    if owns_mc_link:
+        memoryReport.register_memory_probe("mcplugin", client4McPlugin.get_memory_usage)
+    memoryReport.register_memory_probe("group_meta", groupMetaCache.get_memory_usage)
+    memoryReport.register_memory_probe("commands", commandRouter.get_memory_usage)
+    memoryReport.register_memory_probe("media", mediaPipeline.get_memory_usage)
+    memoryReport.register_memory_probe("history", chatHistory.get_memory_usage)
+    if config.MEMORY_TRACE_ENABLE:
+        memoryReport.start_tracing()
+    memoryReport.install_memory_signal_handler(asyncio.get_running_loop())
+    if config.MEMORY_REPORT_PORT:
+        # 多进程模式下按进程序号错开端口
+        port = config.MEMORY_REPORT_PORT + workerCluster.worker_index()
+        tasks.append(asyncio.create_task(memoryReport.run_memory_endpoint_task(port)))
+
+    if config.CONFIG_WATCH_INTERVAL > 0:
+        logger.info("-> 正在创建配置文件监视任务...")
+        tasks.append(asyncio.create_task(configReloader.run_config_watch_task()))
+
+    if config.PLAYER_STATS_ENABLE and owns_mc_link:
+        logger.info("-> 正在创建玩家统计快照任务...")
+        tasks.append(asyncio.create_task(playerStats.run_stats_snapshot_task()))
+
+    if config.STATUS_BOARD_ENABLE and owns_mc_link:
+        logger.info("-> 正在创建群状态发布任务...")
+        client4McPlugin.register_mcplugin_disconnect_handler(statusBoard.reset_online)
+        tasks.append(asyncio.create_task(statusBoard.run_status_board_task()))
+
+    if config.STATE_SNAPSHOT_ENABLE:
+        logger.info("-> 正在创建状态快照任务...")
+        tasks.append(asyncio.create_task(stateSnapshot.run_snapshot_task()))
+
     logger.info("-> 正在创建 NapCat 服务端任务 (WebSocket Server)...")
     tasks.append(asyncio.create_task(server4NapCat.start_server()))
+    tasks.append(asyncio.create_task(server4NapCat.run_liveness_reaper_task()))
+
+    if owns_mc_link:
+        logger.info("-> 正在创建 McPlugin 客户端任务 (WebSocket Client)...")
+        tasks.append(asyncio.create_task(client4McPlugin.run_client_task()))
 
-    logger.info("-> 正在创建 McPlugin 客户端任务 (WebSocket Client)...")
-    tasks.append(asyncio.create_task(client4McPlugin.run_client_task()))
+    if _ROLE != workerCluster.ROLE_SINGLE:
+        logger.info("-> 正在创建多进程 IPC 任务...")
+        tasks.append(asyncio.create_task(workerCluster.run_ipc_task()))
+
+    # 入站队列消费任务 (LOAD_SHED_ENABLE 关闭时空闲等待)
+    tasks.append(asyncio.create_task(server4NapCat.run_inbound_worker_task()))
+    if owns_mc_link:
+        tasks.append(asyncio.create_task(client4McPlugin.run_inbound_worker_task()))
 
     logger.info("✅ 所有底层子模块启动完毕，双向转发中枢开始运行。")
 
-    await asyncio.gather(*tasks, return_exceptions=True)
+    runner = asyncio.gather(*tasks, return_exceptions=True)
+    stop_waiter = asyncio.create_task(shutdownCoordinator.wait_for_shutdown_request())
+    await asyncio.wait({runner, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+
+    # --- 优雅关闭：停止接收 -> 排空在途工作 -> 关闭连接 ---
+    await shutdownCoordinator.run_graceful_shutdown(config.SHUTDOWN_DRAIN_TIMEOUT)
+
+    stop_waiter.cancel()
+    for task in tasks:
+        task.cancel()
+    await runner
+    logger.info("🔻 中枢核心已安全关闭。")
 
 
 if __name__ == "__main__":
+    if workerCluster.should_supervise():
+        # 多进程模式：本进程只负责启动 / 重启子进程
+        workerCluster.run_supervisor()
+        raise SystemExit(0)
+
+    runtimeProfile.install_event_loop()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -0,0 +1,223 @@
+# mcTranslator.py
+import json
+import logging
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Optional, Dict, Any, Set
+
+import config
+
+logger = logging.getLogger("MCTranslator")
+
+# ============================================================
+# Minecraft 语言文件翻译 (death_key / 成就 key → 中文)
+# ============================================================
+# 说明：
+# - 启动时加载一次 MC_LANG_FILE (如从客户端 assets 中提取的 zh_cn.json)
+# - 只保留死亡、成就、聊天组件及其参数可能引用的命名空间，并驻留字符串，
+#   完整语言文件约 6 千条，过滤后通常只剩三分之一左右
+# - 渲染结果按 (key, 参数) 做 LRU 缓存，重复的死亡原因不再重复格式化
+# ============================================================
+
+# 需要保留的翻译 key 前缀
+_INDEXED_PREFIXES = (
+    "death.", "advancements.", "entity.", "item.", "block.",
+    "effect.", "enchantment.", "biome.", "gameMode.", "chat.",
+)
+
+# Minecraft 格式占位符：%s / %d / %1$s / %%
+_MC_FORMAT = re.compile(r"%(?:(\d+)\$)?([sd%])")
+
+# --- 全局状态管理 ---
+# 翻译索引 {key: 文本}
+_lang_index: Dict[str, str] = {}
+
+# 带 LRU 缓存的渲染函数 (加载语言文件时按 MC_LANG_CACHE_SIZE 重建)
+_render_cached = None
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def load_language_file() -> bool:
+    """
+    [接口] 加载 MC_LANG_FILE 并重建索引与缓存 (失败时保留旧索引)
+    """
+    global _lang_index, _render_cached
+
+    path = config.MC_LANG_FILE
+    if not path:
+        _lang_index = {}
+        _render_cached = lru_cache(maxsize=config.MC_LANG_CACHE_SIZE)(_render)
+        return True
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"[翻译] 未找到语言文件 {path}，死亡 / 成就信息将使用服务端原文。")
+        return False
+    except (OSError, ValueError) as e:
+        logger.error(f"[翻译] 加载语言文件失败 ({path}): {e}")
+        return False
+
+    _lang_index = {
+        sys.intern(key): sys.intern(value)
+        for key, value in raw.items()
+        if key.startswith(_INDEXED_PREFIXES) and isinstance(value, str)
+    }
+    _render_cached = lru_cache(maxsize=config.MC_LANG_CACHE_SIZE)(_render)
+    logger.info(f"[翻译] 语言文件已加载: {os.path.basename(path)}，索引 {len(_lang_index)}/{len(raw)} 条")
+    return True
+
+
+def translate(key: str, args: Optional[list] = None) -> Optional[str]:
+    """
+    [接口] 按 key 渲染翻译文本，参数可以是字符串或嵌套的可翻译组件
+
+    :return: 翻译结果；key 不在语言文件中时返回 None
+    """
+    if not key or key not in _lang_index:
+        return None
+    if _render_cached is None:
+        return _render(key, _freeze_args(args))
+    return _render_cached(key, _freeze_args(args))
+
+
+def translate_death(event: Dict[str, Any]) -> Optional[str]:
+    """
+    [接口] 将死亡事件的 death_key + death_args 渲染为中文
+    """
+    return translate(event.get("death_key"), event.get("death_args"))
+
+
+def translate_advancement(event: Dict[str, Any]) -> Optional[str]:
+    """
+    [接口] 获取成就的中文标题
+
+    依次尝试 achievement_display_title (通常即为翻译 key) 与
+    由 achievement_key 推导的 key，如 "minecraft:story/mine_stone"
+    → "advancements.story.mine_stone.title"
+    """
+    title_key = event.get("achievement_display_title")
+    if isinstance(title_key, str):
+        text = translate(title_key)
+        if text:
+            return text
+
+    adv_key = event.get("achievement_key")
+    if isinstance(adv_key, str) and adv_key:
+        path = adv_key.split(":", 1)[-1].replace("/", ".")
+        return translate(f"advancements.{path}.title")
+    return None
+
+
+def get_translator_stats() -> Dict[str, Any]:
+    """
+    [接口] 翻译索引与缓存统计
+    """
+    info = _render_cached.cache_info() if _render_cached else None
+    return {
+        "indexed_keys": len(_lang_index),
+        "cache_hits": info.hits if info else 0,
+        "cache_misses": info.misses if info else 0,
+        "cache_size": info.currsize if info else 0,
+    }
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：语言文件或缓存大小变化时重新加载
+    """
+    if changed & {"MC_LANG_FILE", "MC_LANG_CACHE_SIZE"}:
+        load_language_file()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _freeze_args(args: Any) -> tuple:
+    """
+    [内部] 将参数列表转换为可哈希的形式 (作为 LRU 缓存 key)
+    """
+    if not args:
+        return ()
+    if not isinstance(args, list):
+        args = [args]
+    return tuple(
+        arg if isinstance(arg, str) else json.dumps(arg, ensure_ascii=False, sort_keys=True)
+        for arg in args
+    )
+
+
+def _render_arg(arg: Any) -> str:
+    """
+    [内部] 渲染单个参数：可翻译组件递归渲染，字符串若本身是 key 也尝试翻译
+    """
+    if isinstance(arg, str):
+        stripped = arg.strip()
+        if stripped.startswith("{"):
+            try:
+                return _render_arg(json.loads(stripped))
+            except ValueError:
+                return arg
+        return _lang_index.get(arg, arg)
+
+    if isinstance(arg, dict):
+        if "translate" in arg:
+            nested_args = arg.get("with") or []
+            text = _render(arg["translate"], _freeze_args(nested_args))
+            if text is None:
+                text = arg.get("fallback") or arg["translate"]
+        else:
+            text = str(arg.get("text", ""))
+        for extra in arg.get("extra") or []:
+            text += _render_arg(extra)
+        return text
+
+    if isinstance(arg, list):
+        return "".join(_render_arg(x) for x in arg)
+
+    return str(arg)
+
+
+def _render(key: str, frozen_args: tuple) -> Optional[str]:
+    """
+    [内部] 按 Minecraft 规则格式化翻译文本 (%s 顺序参数 / %1$s 位置参数)
+    """
+    template = _lang_index.get(key)
+    if template is None:
+        return None
+
+    rendered = [_render_arg(_thaw_arg(arg)) for arg in frozen_args]
+    position = 0
+
+    def substitute(match: re.Match) -> str:
+        nonlocal position
+        index, kind = match.groups()
+        if kind == "%":
+            return "%"
+        if index is not None:
+            i = int(index) - 1
+        else:
+            i = position
+            position += 1
+        return rendered[i] if 0 <= i < len(rendered) else ""
+
+    return _MC_FORMAT.sub(substitute, template)
+
+
+def _thaw_arg(arg: str) -> Any:
+    """
+    [内部] _freeze_args 的逆操作：被序列化的组件还原为 dict/list
+    """
+    if arg[:1] in ("{", "["):
+        try:
+            return json.loads(arg)
+        except ValueError:
+            pass
+    return arg
@@ -0,0 +1,276 @@
+# mediaPipeline.py
+import asyncio
+import collections
+import hashlib
+import importlib.util
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+
+import config
+import memoryReport
+from server4NapCat import call_napcat_api
+
+logger = logging.getLogger("MediaPipeline")
+
+# ============================================================
+# QQ 图片 → MC 色块预览 (进程池)
+# ============================================================
+# 说明：
+# - 图片从 NapCat 本地文件路径读取 (消息段自带 path，或通过 get_image 获取)
+# - 解码 / 缩放 / 减色在 ProcessPoolExecutor 中执行，事件循环只负责读文件与组装组件；
+#   同时进行的转换数由信号量限制，超过 MEDIA_TIMEOUT 秒的转换放弃 (仍显示为 [图片])，
+#   并结束整个进程池重建 (卡住的子进程不会自行退出，否则会逐渐占满所有工作进程)
+# - 读文件与计算哈希在线程中进行，不占用事件循环
+# - 结果按文件内容的哈希做 LRU 缓存，重复发送的表情包不再转换
+# - 需要 Pillow (pip install Pillow)；未安装时该功能自动关闭
+# ============================================================
+
+# 预览使用的方块字符
+_BLOCK = "█"
+
+# 预览行的组成 [(颜色 "#rrggbb" 或 None 表示透明, 连续字符数)]
+PreviewRowType = List[Tuple[Optional[str], int]]
+
+# --- 全局状态管理 ---
+# Pillow 是否可用 (首次使用时检测)
+_pillow_available: Optional[bool] = None
+# 进程池与并发限制 (首次使用时创建)
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# 预览缓存 {内容哈希: 预览行}，按最近使用排序
+_preview_cache: "collections.OrderedDict[str, List[PreviewRowType]]" = collections.OrderedDict()
+
+# 统计
+_media_stats: Dict[str, int] = {
+    "rendered": 0, "cache_hits": 0, "timeouts": 0, "errors": 0, "unavailable": 0, "pool_recycled": 0,
+}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+async def build_image_preview(seg_data: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    [接口] 为图片消息段生成色块预览 (用于 hoverEvent 的 contents)
+
+    :return: 文本组件列表；未开启 / 无法读取 / 转换失败时返回 None
+    """
+    if not config.QQ_IMAGE_PREVIEW_ENABLE or not _ensure_pillow():
+        return None
+
+    path = await _resolve_local_path(seg_data)
+    if not path:
+        _media_stats["unavailable"] += 1
+        return None
+
+    try:
+        content, digest = await asyncio.to_thread(_read_file, path)
+    except OSError as e:
+        logger.debug(f"[图片预览] 读取 {path} 失败: {e}")
+        _media_stats["unavailable"] += 1
+        return None
+
+    rows = _preview_cache.get(digest)
+    if rows is not None:
+        _preview_cache.move_to_end(digest)
+        _media_stats["cache_hits"] += 1
+        return _rows_to_components(rows)
+
+    rows = await _render_in_pool(content)
+    if rows is None:
+        return None
+
+    _preview_cache[digest] = rows
+    while len(_preview_cache) > config.MEDIA_CACHE_SIZE:
+        _preview_cache.popitem(last=False)
+    _media_stats["rendered"] += 1
+    return _rows_to_components(rows)
+
+
+def get_media_stats() -> Dict[str, int]:
+    """
+    [接口] 图片预览统计 (含当前缓存条数)
+    """
+    stats = dict(_media_stats)
+    stats["cached"] = len(_preview_cache)
+    return stats
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：预览缓存
+    """
+    return {"preview_cache": memoryReport.usage(_preview_cache)}
+
+
+def dump_snapshot() -> List[Tuple[None, list]]:
+    """
+    [接口] 状态快照：导出预览缓存 (按最近使用顺序，不过期)
+    """
+    return [(None, [digest, rows]) for digest, rows in _preview_cache.items()]
+
+
+def restore_snapshot(entries: List[Tuple[None, list]]):
+    """
+    [接口] 状态快照：恢复预览缓存
+    """
+    for _, (digest, rows) in entries[-config.MEDIA_CACHE_SIZE:]:
+        _preview_cache[digest] = rows
+
+
+async def close():
+    """
+    [接口] 关闭流程：关闭进程池 (不等待未完成的转换)
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _ensure_pillow() -> bool:
+    """
+    [内部] 检测 Pillow 是否安装 (只检测一次)
+    """
+    global _pillow_available
+    if _pillow_available is None:
+        _pillow_available = importlib.util.find_spec("PIL") is not None
+        if not _pillow_available:
+            logger.warning("[图片预览] 未安装 Pillow，图片预览已关闭 (pip install Pillow)")
+    return _pillow_available
+
+
+async def _resolve_local_path(seg_data: Dict[str, Any]) -> Optional[str]:
+    """
+    [内部] 获取图片在 NapCat 所在机器上的本地路径
+    """
+    if seg_data.get("path"):
+        return seg_data["path"]
+    if not config.NAPCAT_ENABLE_ECHO or not seg_data.get("file"):
+        return None
+    try:
+        resp = await call_napcat_api("get_image", {"file": seg_data["file"]}, timeout=3.0)
+    except Exception as e:
+        logger.debug(f"[图片预览] get_image 调用失败: {e}")
+        return None
+    return (resp.get("data") or {}).get("file")
+
+
+def _read_file(path: str) -> Tuple[bytes, str]:
+    """
+    [内部] 在线程中执行：读取图片并计算内容哈希 (预览缓存的 key)
+    """
+    with open(path, "rb") as f:
+        content = f.read(config.MEDIA_MAX_FILE_SIZE + 1)
+    if len(content) > config.MEDIA_MAX_FILE_SIZE:
+        raise OSError(f"image larger than {config.MEDIA_MAX_FILE_SIZE} bytes")
+    return content, hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+async def _render_in_pool(content: bytes) -> Optional[List[PreviewRowType]]:
+    """
+    [内部] 在进程池中转换，限制并发并设置超时
+    """
+    global _executor, _semaphore
+    if _semaphore is None:
+        # 并发不超过进程数：提交的转换都能立即开始执行，超时只计算转换本身，不含在进程池中排队的时间
+        # (否则排队超时会触发重建进程池，误杀其他正常的转换)
+        _semaphore = asyncio.Semaphore(min(config.MEDIA_MAX_CONCURRENCY, config.MEDIA_PROCESS_WORKERS))
+
+    loop = asyncio.get_running_loop()
+    async with _semaphore:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=config.MEDIA_PROCESS_WORKERS)
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    _executor, render_preview_rows, content,
+                    config.MEDIA_PREVIEW_WIDTH, config.MEDIA_PREVIEW_MAX_ROWS, config.MEDIA_PREVIEW_COLORS,
+                ),
+                config.MEDIA_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            _media_stats["timeouts"] += 1
+            logger.warning(f"[图片预览] 转换超时 ({config.MEDIA_TIMEOUT}s)，已放弃并重建进程池")
+            _recycle_executor()
+        except Exception as e:
+            _media_stats["errors"] += 1
+            logger.debug(f"[图片预览] 转换失败: {e}")
+    return None
+
+
+def _recycle_executor():
+    """
+    [内部] 结束当前进程池 (wait_for 超时只放弃等待，子进程仍在转换)，下次转换时重新创建
+    同一进程池中其他进行中的转换随之失败，按转换失败处理
+    """
+    global _executor
+    executor, _executor = _executor, None
+    if executor is None:
+        return
+    # ProcessPoolExecutor 没有公开的结束子进程接口
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    _media_stats["pool_recycled"] += 1
+
+
+def _rows_to_components(rows: List[PreviewRowType]) -> List[Dict[str, Any]]:
+    """
+    [内部] 预览行 → 文本组件 (相邻同色字符已合并)
+    """
+    components = []
+    for index, row in enumerate(rows):
+        for color, count in row:
+            if color is None:
+                components.append({"text": " " * count})
+            else:
+                components.append({"text": _BLOCK * count, "color": color})
+        if index + 1 < len(rows):
+            components.append({"text": "\n"})
+    return components
+
+
+def render_preview_rows(content: bytes, width: int, max_rows: int, colors: int) -> List[PreviewRowType]:
+    """
+    在子进程中执行：解码图片 (动图取第一帧)、缩放、减色，返回按行合并的色块
+    """
+    import io
+    from PIL import Image
+
+    with Image.open(io.BytesIO(content)) as image:
+        image.seek(0)
+        image = image.convert("RGBA")
+
+    # MC 字符约为 0.6 的宽高比，按此压缩行数
+    src_width, src_height = image.size
+    rows = max(1, min(max_rows, round(width * src_height / src_width * 0.6)))
+    image = image.resize((width, rows))
+
+    alpha = image.getchannel("A")
+    quantized = image.convert("RGB").quantize(colors=colors)
+    palette = quantized.getpalette()
+
+    result = []
+    for y in range(rows):
+        row: PreviewRowType = []
+        for x in range(width):
+            if alpha.getpixel((x, y)) < 128:
+                color = None
+            else:
+                i = quantized.getpixel((x, y)) * 3
+                color = "#{:02x}{:02x}{:02x}".format(*palette[i:i + 3])
+            if row and row[-1][0] == color:
+                row[-1] = (color, row[-1][1] + 1)
+            else:
+                row.append((color, 1))
+        result.append(row)
+    return result
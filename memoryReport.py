@@ -0,0 +1,279 @@
+# memoryReport.py
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Optional, Dict, Any, List
+
+import config
+
+logger = logging.getLogger("MemoryReport")
+
+# ============================================================
+# 内存诊断 (按子系统估算 + tracemalloc 按模块分组的增量)
+# ============================================================
+# 说明：
+# - 各模块注册一个探针，返回 {部件名: {"items": 条数, "bytes": 估算字节数}}
+#   (待确认表、入站队列、缓存、连接收发缓冲等)
+# - 字节数由 sys.getsizeof 递归估算：只展开 dict / list / tuple / set / deque，
+#   大容器只抽样前 _SAMPLE 个元素再按条数外推，因此是近似值，用于看趋势而非精确计量
+# - 通过 SIGUSR2 或本地端口 (MEMORY_REPORT_PORT) 触发，无需重启：
+#     1. 输出各子系统的估算
+#     2. tracemalloc 快照与上一次触发时的快照比较，按模块汇总增量
+#   MEMORY_TRACE_ENABLE 关闭时首次触发才开启 tracemalloc 并记录基线，第二次触发起才有增量
+#   (由 PYTHONTRACEMALLOC 等外部方式开启时同样先记录基线)
+# - 同一时间只生成一份报告：信号触发在生成中时忽略，查询端口的请求排队等待
+# ============================================================
+
+# 估算时每个容器最多展开的元素数 / 最大递归深度
+_SAMPLE = 64
+_MAX_DEPTH = 6
+
+# --- 类型定义 ---
+# 探针：返回 {部件名: {"items": int, "bytes": int}}
+MemoryProbeType = Callable[[], Dict[str, Dict[str, int]]]
+
+# --- 全局状态管理 ---
+# 已注册的探针 {子系统名: 探针}
+_probes: Dict[str, MemoryProbeType] = {}
+
+# 上一次触发时的 tracemalloc 快照 (增量基线)
+_last_trace: Optional[tracemalloc.Snapshot] = None
+
+# 生成报告的互斥锁 (快照比较与基线更新不能交错)
+_report_lock = asyncio.Lock()
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def register_memory_probe(name: str, probe: MemoryProbeType):
+    """
+    [接口] 注册子系统内存探针
+    """
+    _probes[name] = probe
+
+
+def approx_size(obj: Any) -> int:
+    """
+    [接口] 估算对象及其包含的元素占用的字节数 (近似值)
+    """
+    return _approx_size(obj, _MAX_DEPTH, set())
+
+
+def usage(container: Any) -> Dict[str, int]:
+    """
+    [接口] 探针辅助：容器的 {"items", "bytes"}
+    """
+    return {"items": len(container), "bytes": approx_size(container)}
+
+
+def connection_buffers(connections) -> Dict[str, int]:
+    """
+    [接口] 探针辅助：websockets 连接的发送缓冲 (transport) 与已接收未消费的帧
+    """
+    sent = received = 0
+    for ws in connections:
+        transport = getattr(ws, "transport", None)
+        if transport is not None and not transport.is_closing():
+            sent += transport.get_write_buffer_size()
+        frames = getattr(getattr(getattr(ws, "recv_messages", None), "frames", None), "queue", ())
+        received += sum(len(frame.data) for frame in list(frames))
+    return {"items": len(connections), "bytes": sent + received, "write_buffer": sent, "read_buffer": received}
+
+
+def start_tracing():
+    """
+    [接口] 开启 tracemalloc 并记录增量基线 (MEMORY_TRACE_ENABLE 时启动即调用)
+    """
+    global _last_trace
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(config.MEMORY_TRACE_FRAMES)
+    if _last_trace is None:
+        _last_trace = _take_snapshot()
+
+
+def collect_memory_usage() -> Dict[str, Dict[str, Dict[str, int]]]:
+    """
+    [接口] 调用全部探针 {子系统名: {部件名: {"items", "bytes"}}}
+    """
+    report = {}
+    for name, probe in _probes.items():
+        try:
+            report[name] = probe()
+        except Exception as e:
+            logger.warning(f"[内存] 探针 {name} 执行失败: {e}")
+    return report
+
+
+async def build_memory_report() -> Dict[str, Any]:
+    """
+    [接口] 生成一次完整报告：子系统估算 + tracemalloc 增量 (快照与比较在线程中进行)
+    """
+    global _last_trace
+
+    async with _report_lock:
+        started = time.perf_counter()
+        report: Dict[str, Any] = {
+            "pid": os.getpid(),
+            "subsystems": collect_memory_usage(),
+            "tracemalloc": None,
+        }
+
+        if _last_trace is None:
+            start_tracing()
+            logger.info(f"[内存] 已开启 tracemalloc 并记录基线 ({tracemalloc.get_traceback_limit()} 层调用栈)，"
+                        "下次触发时输出增量")
+        else:
+            snapshot = await asyncio.to_thread(_take_snapshot)
+            current, peak = tracemalloc.get_traced_memory()
+            report["tracemalloc"] = {
+                "traced": current,
+                "peak": peak,
+                "top": await asyncio.to_thread(_diff_by_module, snapshot, _last_trace, config.MEMORY_REPORT_TOP),
+            }
+            _last_trace = snapshot
+
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return report
+
+
+async def log_memory_report():
+    """
+    [接口] 生成报告并写入日志 (SIGUSR2 触发)
+    """
+    if _report_lock.locked():
+        logger.warning("[内存] 上一次报告仍在生成，忽略本次触发。")
+        return
+    report = await build_memory_report()
+
+    lines = [f"[内存] 子系统估算 (耗时 {report['elapsed_ms']}ms):"]
+    for name, parts in report["subsystems"].items():
+        for part, value in parts.items():
+            lines.append(f"  {name}.{part}: {value['items']} 条, ~{_format_bytes(value['bytes'])}")
+
+    trace = report["tracemalloc"]
+    if trace is not None:
+        lines.append(f"[内存] tracemalloc 当前 {_format_bytes(trace['traced'])}，峰值 {_format_bytes(trace['peak'])}，"
+                     "相对上次触发的增量 (按模块):")
+        for item in trace["top"]:
+            lines.append(f"  {item['module']}: {_format_bytes(item['size'])} "
+                         f"({item['size_diff']:+,d} B, {item['count_diff']:+d} 块)")
+    logger.info("\n".join(lines))
+
+
+def install_memory_signal_handler(loop: asyncio.AbstractEventLoop):
+    """
+    [接口] 注册 SIGUSR2 信号：收到后输出一次内存报告
+    Windows 下无 SIGUSR2，直接跳过。
+    """
+    if not hasattr(signal, "SIGUSR2"):
+        logger.debug("[内存] 当前平台不支持 SIGUSR2，跳过信号注册。")
+        return
+    try:
+        loop.add_signal_handler(signal.SIGUSR2, lambda: asyncio.ensure_future(log_memory_report()))
+        logger.info(f"[内存] 发送 SIGUSR2 (kill -USR2 {os.getpid()}) 即可输出内存报告。")
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning(f"[内存] 注册信号处理失败: {e}")
+
+
+async def run_memory_endpoint_task(port: int):
+    """
+    [接口] 本地查询端口：每个连接返回一份 JSON 报告后关闭 (仅监听 127.0.0.1)
+    用法：nc 127.0.0.1 <端口>
+    """
+    server = await asyncio.start_server(_handle_endpoint, "127.0.0.1", port)
+    logger.info(f"[内存] 本地查询端口已开启: 127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _approx_size(obj: Any, depth: int, seen: set) -> int:
+    """
+    [内部] 递归估算；共享对象只计一次，大容器抽样外推
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if depth <= 0:
+        return size
+
+    if isinstance(obj, dict):
+        children, count = itertools.chain.from_iterable(obj.items()), 2 * len(obj)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        children, count = obj, len(obj)
+    else:
+        return size
+
+    sampled = 0
+    child_total = 0
+    for child in itertools.islice(children, _SAMPLE):
+        child_total += _approx_size(child, depth - 1, seen)
+        sampled += 1
+    if sampled:
+        size += child_total * count // sampled
+    return size
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def _module_name(filename: str) -> str:
+    """
+    [内部] 文件路径 → 顶层模块名 (本项目的模块、标准库模块或第三方包名)
+    """
+    for path in sorted((p for p in sys.path if p), key=len, reverse=True):
+        if filename.startswith(path + os.sep):
+            top = filename[len(path) + 1:].split(os.sep, 1)[0]
+            return top[:-3] if top.endswith(".py") else top
+    return filename
+
+
+def _diff_by_module(snapshot: tracemalloc.Snapshot, previous: tracemalloc.Snapshot,
+                    top: int) -> List[Dict[str, Any]]:
+    """
+    [内部] 与上次快照比较，按模块汇总增量 (按增量绝对值排序)
+    """
+    modules: Dict[str, Dict[str, Any]] = {}
+    for stat in snapshot.compare_to(previous, "filename"):
+        module = _module_name(stat.traceback[0].filename)
+        item = modules.setdefault(module, {"module": module, "size": 0, "size_diff": 0, "count_diff": 0})
+        item["size"] += stat.size
+        item["size_diff"] += stat.size_diff
+        item["count_diff"] += stat.count_diff
+    return sorted(modules.values(), key=lambda item: abs(item["size_diff"]), reverse=True)[:top]
+
+
+async def _handle_endpoint(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        report = await build_memory_report()
+        writer.write(json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8") + b"\n")
+        await writer.drain()
+    except Exception as e:
+        logger.warning(f"[内存] 生成报告失败: {e}")
+    finally:
+        writer.close()
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
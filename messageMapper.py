@@ -1,37 +1,121 @@
 # messageMapper.py
 import logging
+import time
+from typing import Optional
+
 import config
 
 # 仅导入【公共发送接口】，不触碰任何私有实现
 from server4NapCat import send_to_napcat_async_notification
-from client4McPlugin import send_to_mc_async_notification
-# 导入事件标准化工具
-from config import build_event
+from client4McPlugin import send_to_mc_async_notification, call_mc_plugin_api
+# MC 事件分发表
+from eventDispatcher import on_mc_event, dispatch_mc_event
+# QQ 群命令路由
+from commandRouter import qq_command, route_qq_command, invalidate_command_cache, ROLE_ADMIN, ROLE_OWNER
+# QQ 文本模板
+from qqTemplate import render_qq_message
+# 群 / 群成员信息缓存
+from groupMetaCache import observe_message, handle_notice, lookup_group_name
+# 出站消息长度拆分
+from messageSplitter import split_message, truncate_components, DEST_MC, DEST_QQ
+# QQ 富文本消息段解析
+from qqMessageParser import parse_segments, is_plain_text, plain_text, segments_to_components
+# 敏感词过滤
+from wordFilter import filter_text, ACTION_BLOCK
+# 转发规则
+from forwardRules import (
+    evaluate as evaluate_rules, apply_rewrites, covers_group,
+    DIRECTION_QQ_TO_MC, DIRECTION_MC_TO_QQ, ACTION_FORWARD, ACTION_DROP, ACTION_REDIRECT,
+)
+# MC JSON 文本组件展开
+from textComponent import flatten_text
+# 死亡 / 成就中文化
+from mcTranslator import translate_death, translate_advancement
+# 历史记录
+from chatHistory import record_event, search_history, recent_events, SOURCE_QQ, SOURCE_MC
+# 玩家统计
+import playerStats
+# 群实时状态
+import statusBoard
 
 logger = logging.getLogger("MessageMapper")
 
 # ============================================================
 # 工具函数 (Helper)
 # ============================================================
-async def _send_qq_text_msg(message: str):
+async def _send_qq_text_msg(message: str, group_id: Optional[int] = None):
     """
-    [助手] 发送纯文本消息到目标 QQ 群
+    [助手] 发送纯文本消息到 QQ 群 (默认为目标群；超长时按 QQ 长度限制拆成多条)
     """
     if not message:
         return
 
-    # 构建 OneBot 标准的消息发送 Payload
-    onebot_payload = {
-        "action": "send_group_msg",
-        "params": {
-            "group_id": config.TARGET_QQ_GROUP_ID,
-            "message": message,
-        },
-    }
-    # 调用底层接口发送
-    success = await send_to_napcat_async_notification(onebot_payload)
-    if not success:
-        logger.warning(f"[发送失败] 尝试发送到QQ群失败: {message[:30]}...")
+    for part in split_message(message, DEST_QQ):
+        # 构建 OneBot 标准的消息发送 Payload
+        onebot_payload = {
+            "action": "send_group_msg",
+            "params": {
+                "group_id": group_id or config.TARGET_QQ_GROUP_ID,
+                "message": part,
+            },
+        }
+        # 调用底层接口发送
+        success = await send_to_napcat_async_notification(onebot_payload)
+        if not success:
+            logger.warning(f"[发送失败] 尝试发送到QQ群失败: {part[:30]}...")
+            return
+
+
+def _filter_words(text: str, log_prefix: str) -> Optional[str]:
+    """
+    [助手] 敏感词过滤：返回处理后的文本，命中 block 时返回 None
+    """
+    action, filtered = filter_text(text)
+    if action == ACTION_BLOCK:
+        logger.info(f"{log_prefix} 消息命中拦截词，已丢弃")
+        return None
+    return filtered
+
+
+def _chat_text(event: dict) -> str:
+    """
+    [助手] 玩家聊天内容：message 是玩家输入的原文，不做 JSON 解析 (插件已解析为组件时才展开)；
+    Mod 服可能只提供 JSON 文本组件形式的 raw_message，此时才按组件展开
+    """
+    message = event.get("message")
+    if message:
+        return flatten_text(message, parse_json=False)
+    return flatten_text(event.get("raw_message"))
+
+
+def _format_history_rows(title: str, rows: list) -> str:
+    """
+    [助手] 将历史查询结果格式化为 QQ 文本 (按时间正序显示)
+    """
+    if not rows:
+        return f"{title}: 没有找到记录"
+    lines = [f"{title}:"]
+    for row in reversed(rows):
+        when = time.strftime("%m-%d %H:%M", time.localtime(row["ts"]))
+        lines.append(f"[{when}] {row['sender'] or '?'}: {row['content'] or ''}")
+    return "\n".join(lines)
+
+
+def _format_leaderboard(metric: str, entries: list) -> str:
+    """
+    [助手] 将排行榜格式化为 QQ 文本
+    """
+    title = f"🏆 {playerStats.METRICS[metric]}排行"
+    if not entries:
+        return f"{title}: 暂无数据"
+    lines = [f"{title}:"]
+    for rank, (nickname, value) in enumerate(entries, 1):
+        if metric == "playtime":
+            value = f"{value / 3600:.1f} 小时"
+        else:
+            value = f"{int(value)} 次"
+        lines.append(f"{rank}. {nickname} - {value}")
+    return "\n".join(lines)
 
 
 # ============================================================
@@ -43,17 +127,29 @@ async def map_qq_to_mc(data: dict):
     # --------------------------------------------------------
     # 1. 语义提取（只关心我们需要的事件）
     # --------------------------------------------------------
+    if data.get("post_type") == "notice":
+        # 群名片变更 / 退群等：刷新群信息缓存
+        handle_notice(data)
+        return
     if data.get("post_type") != "message":
         return
     if data.get("message_type") != "group":
         return
 
     group_id = data.get("group_id")
-    if data.get("group_id") != config.TARGET_QQ_GROUP_ID:
+    # 目标群以外的群：只处理转发规则明确匹配的群 (不执行群命令、不写历史)
+    from_target = group_id == config.TARGET_QQ_GROUP_ID
+    if not from_target and not covers_group(group_id):
         return
 
-    # 读取群名（NapCat 已提供）
+    # 发送者信息写入群成员缓存 (供 @ 解析等使用)
+    if from_target:
+        observe_message(data)
+
+    # 读取群名（NapCat 已提供；缺失时查询群信息缓存，不等待 API）
     group_name = (data.get("group_name") or "").strip()
+    if not group_name:
+        group_name = lookup_group_name(group_id) or ""
 
     # 兜底：极端情况下没有群名
     if not group_name:
@@ -71,22 +167,79 @@ async def map_qq_to_mc(data: dict):
         f"[QQ -> MC] 群消息: [{group_name}] [{nickname}] {raw_message}"
     )
 
+    # 1.1 群命令 (命令不转发到 MC) 与历史记录
+    if from_target:
+        is_command, reply = await route_qq_command(raw_message, data)
+        if is_command:
+            await _send_qq_text_msg(reply)
+            return
+        if config.HISTORY_ENABLE:
+            record_event(SOURCE_QQ, "group_message", nickname, raw_message, channel=group_name, ts=data.get("time"))
+
+    # 1.2 转发规则 (放行 / 丢弃 / 改写 / 改投其他群)
+    action, redirect_group, raw_message, rewrites = evaluate_rules(
+        DIRECTION_QQ_TO_MC, raw_message,
+        default=ACTION_FORWARD if from_target else ACTION_DROP,
+        group=group_id, sub_type="group_message", sender=data.get("user_id"),
+    )
+    if action == ACTION_DROP:
+        logger.debug("[QQ -> MC] 消息被转发规则丢弃")
+        return
+    if action == ACTION_REDIRECT:
+        redirected = _filter_words(f"[{group_name}] {nickname}: {raw_message}", "[QQ -> QQ]")
+        if redirected:
+            await _send_qq_text_msg(redirected, redirect_group)
+        return
+
     # --------------------------------------------------------
     # 2. 业务加工（文本处理、过滤、替换等）
     #    ⚠️ 这是“唯一允许随意加逻辑”的地方
     # --------------------------------------------------------
 
-    processed_message = raw_message
-    # 2.1 过滤 QQ 富文本（默认拒绝）
-    # CQ 码（表情 / 图片 / 语音 / 链接等）一律拦截
-    if "[CQ:" in processed_message:
-        logger.debug("[QQ -> MC] 检测到 CQ 富文本，已拦截")
-        return
-    # 2.2 过滤链接
-    if processed_message.startswith("http://") or processed_message.startswith("https://"):
-        logger.debug("[QQ -> MC] 检测到链接，已拦截")
-        return
-    # 2.3 只允许“纯文本”
+    # 2.1 富文本：按消息段解析，转为 MC 文本组件
+    if config.QQ_FORWARD_RICH_SEGMENTS:
+        segments = parse_segments(data)
+        # 文本段逐段过滤敏感词 (不修改原始事件)
+        filtered_segments = []
+        for seg in segments:
+            if seg.get("type") == "text":
+                text = apply_rewrites((seg.get("data") or {}).get("text", ""), rewrites)
+                text = _filter_words(text, "[QQ -> MC]")
+                if text is None:
+                    return
+                seg = {"type": "text", "data": {"text": text}}
+            filtered_segments.append(seg)
+        segments = filtered_segments
+
+        if not is_plain_text(segments):
+            components = await segments_to_components(segments, group_id)
+            if not components:
+                return
+            components = truncate_components(components, DEST_MC)
+            success = await send_to_mc_async_notification(
+                kind="mc.broadcast_rich",
+                group=group_name,
+                sender=nickname,
+                components=components,
+            )
+            if not success:
+                logger.warning("[QQ -> MC] 富文本转发失败：底层发送返回 False（可能连接断开）")
+            return
+        processed_message = plain_text(segments)
+    else:
+        processed_message = raw_message
+        # 未开启富文本转发时，CQ 码（表情 / 图片 / 语音 / 链接等）一律拦截
+        if "[CQ:" in processed_message:
+            logger.debug("[QQ -> MC] 检测到 CQ 富文本，已拦截")
+            return
+        # 过滤链接
+        if processed_message.startswith("http://") or processed_message.startswith("https://"):
+            logger.debug("[QQ -> MC] 检测到链接，已拦截")
+            return
+        processed_message = _filter_words(processed_message, "[QQ -> MC]")
+        if processed_message is None:
+            return
+    # 2.2 纯文本
     processed_message = processed_message.strip()
     if not processed_message:
         return
@@ -97,124 +250,296 @@ async def map_qq_to_mc(data: dict):
     # 3. 协议映射（核心）
     #    不关心 JSON 结构，只声明“我要干什么”
     # --------------------------------------------------------
-    success = await send_to_mc_async_notification(
-        kind="mc.broadcast",     # ← 与 MCPLUGIN_PROTOCOL 中定义的 key 对齐
-        group=group_name,
-        sender=nickname,
-        content=processed_message,
-    )
-
-    if not success:
-        logger.warning(
-            "[QQ -> MC] 转发失败：底层发送返回 False（可能连接断开）"
+    # 超长消息按 MC 聊天长度限制拆成多条
+    for part in split_message(processed_message, DEST_MC):
+        success = await send_to_mc_async_notification(
+            kind="mc.broadcast",     # ← 与 MCPLUGIN_PROTOCOL 中定义的 key 对齐
+            group=group_name,
+            sender=nickname,
+            content=part,
         )
 
+        if not success:
+            logger.warning(
+                "[QQ -> MC] 转发失败：底层发送返回 False（可能连接断开）"
+            )
+            return
+
 
 # ============================================================
 # MC -> QQ 方向：MC 事件 → QQ 消息
 # ============================================================
+# 每种事件一个处理函数，通过 @on_mc_event 注册到分发表；
+# enabled_by 对应 config 中的转发开关，由分发表统一解析；
+# 发送文本由 messageProtocol.QQ_MESSAGE_TEMPLATES 定义
+# ============================================================
 
 async def map_mc_to_qq(raw: dict):
     """
     【业务层】
-    处理来自 MC 插件的原始事件，标准化后分发处理。
+    处理来自 MC 插件的原始事件：交给分发表，按 sub_type 调用已注册的处理函数。
     """
+    await dispatch_mc_event(raw)
 
-    # --------------------------------------------------------
-    # 0. 构建标准事件对象（防腐层接入）
-    # --------------------------------------------------------
-    # 使用 eventProtocol.py 将原始 JSON 转换为标准化的全字段字典
-    event = build_event(raw)
-    # 获取事件标识名，如 "PlayerChatEvent"
-    event_name = event.get("event_name")
 
-    # 提取通用基础信息
-    server_name = event.get("server_name") or "MC"
-    # 大部分事件都与特定玩家有关，尝试提取昵称
-    player_nickname = event.get("player_nickname") or "未知玩家"
+async def _forward_to_qq(sub_type: str, event: dict):
+    """
+    [助手] 按模板渲染、过滤敏感词后发送到 QQ 群
+    """
+    final_message = render_qq_message(sub_type, event, config.TARGET_QQ_GROUP_ID)
+    if not final_message:
+        return
 
-    # 用于存储最终要发送的文本消息，为空则不发送
-    final_message = ""
-    # 日志前缀，方便排查问题
-    log_prefix = f"[MC -> QQ] [{server_name}]"
+    # 转发规则 (放行 / 丢弃 / 改写 / 改投其他群)
+    action, group_id, final_message, rewrites = evaluate_rules(
+        DIRECTION_MC_TO_QQ, final_message,
+        server=event.get("server_name"), sub_type=sub_type,
+        sender=(event.get("player_nickname"), event.get("player_uuid")),
+    )
+    if action == ACTION_DROP:
+        return
+    if action == ACTION_REDIRECT:
+        # 改投的群可能有自己的模板覆盖
+        final_message = apply_rewrites(render_qq_message(sub_type, event, group_id) or "", rewrites)
+        if not final_message:
+            return
+    else:
+        group_id = None
 
-    # --------------------------------------------------------
-    # 1. 事件分发与处理 (Dispatcher)
-    # --------------------------------------------------------
+    log_prefix = f"[MC -> QQ] [{event.get('server_name') or 'MC'}]"
+    final_message = _filter_words(final_message, log_prefix)
+    if final_message is None:
+        return
+    # 调用辅助函数发送到 QQ 群
+    await _send_qq_text_msg(final_message, group_id)
 
-    # --- 玩家聊天 (PlayerChatEvent) ---
-    if event_name == "PlayerChatEvent":
-        # 检查配置开关
-        if not config.ENABLE_MC_CHAT_FORWARD:
-            return
 
-        # 从标准字段中获取消息内容
-        chat_message = event.get("message")
-        if chat_message:
-            logger.info(f"{log_prefix} <{player_nickname}> 聊天: {chat_message}")
-            # 格式化显示文本
-            final_message = f"[{server_name}] <{player_nickname}> {chat_message}"
+# --- 玩家聊天 (PlayerChatEvent) ---
+@on_mc_event("player_chat", enabled_by="ENABLE_MC_CHAT_FORWARD")
+async def _forward_chat(event: dict):
+    chat_message = _chat_text(event).strip()
+    if not chat_message:
+        return
 
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] <{event.get('player_nickname')}> 聊天: {chat_message}")
+    # 不修改原事件，同一事件的其他处理函数仍可读取原始内容
+    await _forward_to_qq("player_chat", {**event, "message": chat_message})
 
-    # --- 玩家加入 (PlayerJoinEvent) ---
-    elif event_name == "PlayerJoinEvent":
-        if not config.ENABLE_MC_JOIN_NOTICE:
-            return
 
-        logger.info(f"{log_prefix} 玩家加入: {player_nickname}")
-        final_message = f"[{server_name}] 🟢 欢迎 {player_nickname} 加入游戏!"
+# --- 玩家加入 (PlayerJoinEvent) ---
+@on_mc_event("player_join", enabled_by="ENABLE_MC_JOIN_NOTICE")
+async def _forward_join(event: dict):
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] 玩家加入: {event.get('player_nickname')}")
+    await _forward_to_qq("player_join", event)
 
 
-    # --- 玩家退出 (PlayerQuitEvent) ---
-    elif event_name == "PlayerQuitEvent":
-        if not config.ENABLE_MC_QUIT_NOTICE:
-            return
+# --- 玩家退出 (PlayerQuitEvent) ---
+@on_mc_event("player_quit", enabled_by="ENABLE_MC_QUIT_NOTICE")
+async def _forward_quit(event: dict):
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] 玩家退出: {event.get('player_nickname')}")
+    await _forward_to_qq("player_quit", event)
 
-        logger.info(f"{log_prefix} 玩家退出: {player_nickname}")
-        final_message = f"[{server_name}] 🔴 {player_nickname} 离开了游戏。"
 
+# --- 玩家死亡 (PlayerDeathEvent) ---
+@on_mc_event("player_death", enabled_by="ENABLE_MC_DEATH_NOTICE")
+async def _forward_death(event: dict):
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] 玩家死亡: {event.get('death_text') or event.get('player_nickname')}")
+    await _forward_to_qq("player_death", event)
 
-    # --- 玩家死亡 (PlayerDeathEvent) ---
-    elif event_name == "PlayerDeathEvent":
-        if not config.ENABLE_MC_DEATH_NOTICE:
-            return
 
-        # death_text 通常是由服务端翻译好的完整句子，如 "Player was slain by Zombie"
-        death_msg = event.get("death_text") or f"{player_nickname} 不幸去世了"
+# --- 玩家获得成就 (PlayerAchievementEvent) ---
+@on_mc_event("player_achievement", enabled_by="ENABLE_MC_ACHIEVEMENT_NOTICE")
+async def _forward_achievement(event: dict):
+    # 既没有成就文本也没有成就 key 时不发送
+    ach_text = event.get("achievement_text") or event.get("achievement_key")
+    if not ach_text:
+        return
 
-        logger.info(f"{log_prefix} 玩家死亡: {death_msg}")
-        final_message = f"[{server_name}] ☠️ {death_msg}"
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] 玩家成就: {event.get('player_nickname')} -> [{ach_text}]")
+    await _forward_to_qq("player_achievement", event)
+
+
+# --- 玩家执行命令 (PlayerCommandEvent) ---
+@on_mc_event("player_command", enabled_by="ENABLE_MC_COMMAND_FORWARD")
+async def _forward_command(event: dict):
+    # 为了防止刷屏，建议只在 info 记录简要信息
+    logger.info(f"[MC -> QQ] [{event.get('server_name')}] 玩家命令: {event.get('player_nickname')} -> /{event.get('command')}")
+    # 注意：转发命令可能会泄露敏感信息，请谨慎开启
+    await _forward_to_qq("player_command", event)
+
+
+# --- 历史记录 (与转发处理函数并发执行) ---
+@on_mc_event("player_chat", enabled_by="HISTORY_ENABLE")
+@on_mc_event("player_command", enabled_by="HISTORY_ENABLE")
+@on_mc_event("player_join", enabled_by="HISTORY_ENABLE")
+@on_mc_event("player_quit", enabled_by="HISTORY_ENABLE")
+@on_mc_event("player_death", enabled_by="HISTORY_ENABLE")
+@on_mc_event("player_achievement", enabled_by="HISTORY_ENABLE")
+async def _record_mc_history(event: dict):
+    sub_type = event.get("sub_type")
+    if sub_type == "player_chat":
+        content = _chat_text(event)
+    elif sub_type == "player_command":
+        content = event.get("command")
+    elif sub_type == "player_death":
+        content = translate_death(event) or event.get("death_text")
+    elif sub_type == "player_achievement":
+        content = translate_advancement(event) or event.get("achievement_text")
+    else:
+        content = None
+
+    record_event(
+        SOURCE_MC, sub_type, event.get("player_nickname"), content,
+        channel=event.get("server_name"), player_uuid=event.get("player_uuid"),
+    )
 
 
-    # --- 玩家获得成就 (PlayerAchievementEvent) ---
-    elif event_name == "PlayerAchievementEvent":
-        if not config.ENABLE_MC_ACHIEVEMENT_NOTICE:
-            return
+# --- 玩家统计 ---
+@on_mc_event("player_join", enabled_by="PLAYER_STATS_ENABLE")
+@on_mc_event("player_quit", enabled_by="PLAYER_STATS_ENABLE")
+@on_mc_event("player_death", enabled_by="PLAYER_STATS_ENABLE")
+@on_mc_event("player_chat", enabled_by="PLAYER_STATS_ENABLE")
+async def _record_player_stats(event: dict):
+    playerStats.record_event(event)
 
-        # 获取成就文本
-        ach_text = event.get("achievement_text")
-        # 也可以获取更详细的显示标题
-        # ach_title = event.get("achievement_display_title")
 
-        if ach_text:
-            logger.info(f"{log_prefix} 玩家成就: {player_nickname} -> [{ach_text}]")
-            final_message = f"[{server_name}] 🎉 恭喜 {player_nickname} 达成了成就 [{ach_text}]!"
+# --- 群实时状态 (在线名单) ---
+@on_mc_event("player_join", enabled_by="STATUS_BOARD_ENABLE")
+@on_mc_event("player_quit", enabled_by="STATUS_BOARD_ENABLE")
+async def _update_status_board(event: dict):
+    statusBoard.record_event(event)
 
 
-    # --- 玩家执行命令 (PlayerCommandEvent) ---
-    elif event_name == "PlayerCommandEvent":
-        if not config.ENABLE_MC_COMMAND_FORWARD:
-            return
+# ============================================================
+# QQ 群命令
+# ============================================================
+# 通过 @qq_command 注册到命令路由；只读查询设置 cache_ttl，
+# 同一时间多人查询只会调用一次 MC 插件 API
+# ============================================================
 
-        command_str = event.get("command")
-        # 为了防止刷屏，建议只在 info 记录简要信息
-        logger.info(f"{log_prefix} 玩家命令: {player_nickname} -> /{command_str}")
-        # 注意：转发命令可能会泄露敏感信息，请谨慎开启
-        final_message = f"[{server_name}] ℹ️ {player_nickname} 执行了命令: /{command_str}"
+async def _call_rcon(command: str) -> str:
+    """
+    [助手] 通过 MC 插件执行 RCON 命令，返回去除格式代码后的输出
+    """
+    response = await call_mc_plugin_api("mc.rcon", {"command": command})
+    if response.get("status") not in (None, "SUCCESS"):
+        raise RuntimeError(response.get("message") or response.get("status"))
+    output = flatten_text(response.get("data")).strip()
+    return output or (response.get("message") or "")
+
+
+# --- 历史查询 ---
+@qq_command("#搜索", enabled_by="HISTORY_ENABLE")
+async def _command_search(ctx: dict) -> str:
+    if not ctx["args"]:
+        return "用法: #搜索 <关键词>"
+    rows = await search_history(ctx["args"], config.HISTORY_QUERY_LIMIT)
+    return _format_history_rows(f"🔍 包含「{ctx['args']}」的消息", rows)
+
+
+@qq_command("#最近死亡", enabled_by="HISTORY_ENABLE")
+async def _command_recent_deaths(ctx: dict) -> str:
+    limit = min(int(ctx["args"]), 50) if ctx["args"].isdigit() else config.HISTORY_QUERY_LIMIT
+    rows = await recent_events("player_death", limit)
+    return _format_history_rows("💀 最近死亡记录", rows)
+
+
+# --- 玩家统计 ---
+@qq_command("#排行", enabled_by="PLAYER_STATS_ENABLE")
+async def _command_leaderboard(ctx: dict) -> str:
+    metric = next((m for m, name in playerStats.METRICS.items() if name == ctx["args"]), None)
+    if ctx["args"] and metric is None:
+        return f"用法: #排行 [{'|'.join(playerStats.METRICS.values())}]"
+    metric = metric or "playtime"
+    return _format_leaderboard(metric, playerStats.top_players(metric, 10))
+
+
+@qq_command("#统计", enabled_by="PLAYER_STATS_ENABLE")
+async def _command_player_stats(ctx: dict) -> str:
+    if not ctx["args"]:
+        return "用法: #统计 <玩家名>"
+    stats = playerStats.get_player_stats(ctx["args"])
+    if stats is None:
+        return f"没有玩家 {ctx['args']} 的统计"
+    return (
+        f"📊 {stats['nickname']}{' (在线)' if stats['online'] else ''}\n"
+        f"在线时长: {stats['playtime'] / 3600:.1f} 小时\n"
+        f"死亡次数: {stats['deaths']}\n"
+        f"发言数: {stats['messages']}"
+    )
 
-    # --------------------------------------------------------
-    # 2. 统一发送
-    # --------------------------------------------------------
-    if final_message:
-        # 调用辅助函数发送到 QQ 群
-        await _send_qq_text_msg(final_message)
+
+# --- 服务器查询 (只读，带缓存；需要 MCPLUGIN_ENABLE_ECHO) ---
+@qq_command("#在线", cache_ttl=10, enabled_by="MCPLUGIN_ENABLE_ECHO")
+async def _command_list(ctx: dict) -> str:
+    return await _call_rcon("list")
+
+
+@qq_command("#tps", cache_ttl=10, enabled_by="MCPLUGIN_ENABLE_ECHO")
+async def _command_tps(ctx: dict) -> str:
+    return await _call_rcon("tps")
+
+
+@qq_command("#白名单", cache_ttl=60, enabled_by="MCPLUGIN_ENABLE_ECHO")
+async def _command_whitelist(ctx: dict) -> str:
+    return await _call_rcon("whitelist list")
+
+
+# --- 管理命令 ---
+@qq_command("#白名单 添加", role=ROLE_ADMIN, enabled_by="MCPLUGIN_ENABLE_ECHO")
+async def _command_whitelist_add(ctx: dict) -> str:
+    if not ctx["args"]:
+        return "用法: #白名单 添加 <玩家名>"
+    output = await _call_rcon(f"whitelist add {ctx['args'].split()[0]}")
+    invalidate_command_cache("#白名单")
+    return output
+
+
+@qq_command("#白名单 移除", role=ROLE_ADMIN, enabled_by="MCPLUGIN_ENABLE_ECHO")
+async def _command_whitelist_remove(ctx: dict) -> str:
+    if not ctx["args"]:
+        return "用法: #白名单 移除 <玩家名>"
+    output = await _call_rcon(f"whitelist remove {ctx['args'].split()[0]}")
+    invalidate_command_cache("#白名单")
+    return output
+
+
+@qq_command("#执行", role=ROLE_OWNER, enabled_by="QQ_COMMAND_RCON_ENABLE")
+async def _command_rcon(ctx: dict) -> str:
+    # 任意服务器命令：只允许群主与超级用户，按命令覆盖的角色不放宽此限制
+    if ctx["role"] != ROLE_OWNER and ctx["user_id"] not in config.QQ_COMMAND_SUPERUSERS:
+        logger.warning(f"[命令] 拒绝 {ctx['nickname']} ({ctx['user_id']}) 执行服务器命令: {ctx['args']}")
+        return "⛔ 权限不足: #执行 仅限群主与超级用户"
+    if not ctx["args"]:
+        return "用法: #执行 <服务器命令>"
+    command = ctx["args"].lstrip("/")
+    logger.warning(f"[命令] {ctx['nickname']} ({ctx['user_id']}) 执行服务器命令: {command}")
+    return await _call_rcon(command) or "✅ 已执行"
+
+
+@qq_command("#标题", role=ROLE_ADMIN)
+async def _command_title(ctx: dict) -> str:
+    if not ctx["args"]:
+        return "用法: #标题 <内容>"
+    title = _filter_words(ctx["args"], "[QQ -> MC]")
+    if title is None:
+        return "⛔ 标题包含拦截词，未发送"
+    success = await send_to_mc_async_notification(
+        "mc.title", title=title, subtitle=f"—— {ctx['nickname']}", fade_in=10, stay=70, fade_out=20,
+    )
+    return "✅ 已发送标题" if success else "❌ 发送失败：MC 未连接"
+
+
+@qq_command("#私聊")
+async def _command_private_message(ctx: dict) -> Optional[str]:
+    player, _, content = ctx["args"].partition(" ")
+    content = content.strip()
+    if not player or not content:
+        return "用法: #私聊 <玩家名> <内容>"
+    content = _filter_words(content, "[QQ -> MC]")
+    if content is None:
+        return "⛔ 消息包含拦截词，未发送"
+    success = await send_to_mc_async_notification(
+        "mc.private_message", uuid="", nickname=player, sender=ctx["nickname"], content=content,
+    )
+    return None if success else "❌ 发送失败：MC 未连接"
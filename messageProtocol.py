@@ -7,6 +7,7 @@
 # - api        ：QueQiao 实际 API 名称
 # - data       ：发送给 QueQiao 的 JSON data 模板
 # - 所有字符串都会通过 str.format(**kwargs) 填充
+# - 仅由单个占位符组成的字符串 (如 "{components}") 在参数为 list/dict 时原样嵌入
 # ============================================================
 
 MCPLUGIN_PROTOCOL = {
@@ -32,6 +33,29 @@ MCPLUGIN_PROTOCOL = {
     #     content="聊天内容"
     # )
 
+    # --------------------------------------------------------
+    # 富文本广播（broadcast，QQ 图片 / @ / 表情等转为文本组件）
+    # --------------------------------------------------------
+    "mc.broadcast_rich": {
+        "api": "broadcast",
+        "data": {
+            "message": [
+                { "text": "[{group}]", "color": "aqua" },
+                { "text": " {sender}", "color": "green" },
+                { "text": " :", "color": "white" },
+                # 单独的 "{components}" 会原样嵌入文本组件列表
+                { "text": " ", "color": "white", "extra": "{components}" }
+            ]
+        }
+    },
+    # 业务层调用示例（异步通知）:
+    # await send_to_mc_async_notification(
+    #     "mc.broadcast_rich",
+    #     group="群名1",
+    #     sender="QQ用户",
+    #     components=[{"text": "[图片]", "color": "green"}]
+    # )
+
     # --------------------------------------------------------
     # 私聊消息接口（send_private_msg）
     # --------------------------------------------------------
@@ -123,6 +147,37 @@ MCPLUGIN_PROTOCOL = {
 }
 
 
+# ============================================================
+# QQ 消息模板 (MC 事件 → QQ 群文本)
+# ============================================================
+
+# 说明：
+# - key        ：MC 事件 sub_type (见 eventProtocol.MC_EVENT_FIELD_MAP)
+# - value      ：str.format 模板，占位符只能使用已声明字段：
+#                eventProtocol.MC_EVENT_FIELDS 中的全部字段，
+#                以及派生字段 death_message (死亡信息，优先按语言文件译为中文)、
+#                achievement_title (成就标题，优先按语言文件译为中文)
+# - 模板为空字符串表示该事件不发送
+# - 加载 / 热重载时统一校验并预编译，渲染时只解析模板用到的字段
+# ============================================================
+
+QQ_MESSAGE_TEMPLATES = {
+    "player_chat": "[{server_name}] <{player_nickname}> {message}",
+    "player_join": "[{server_name}] 🟢 欢迎 {player_nickname} 加入游戏!",
+    "player_quit": "[{server_name}] 🔴 {player_nickname} 离开了游戏。",
+    "player_death": "[{server_name}] ☠️ {death_message}",
+    "player_achievement": "[{server_name}] 🎉 恭喜 {player_nickname} 达成了成就 [{achievement_title}]!",
+    "player_command": "[{server_name}] ℹ️ {player_nickname} 执行了命令: /{command}",
+}
+
+# 按群覆盖模板 {群号: {sub_type: 模板}}，未覆盖的事件使用上面的默认模板
+QQ_MESSAGE_TEMPLATE_OVERRIDES = {
+    # 123456789: {
+    #     "player_join": "{player_nickname} 上线了",
+    # },
+}
+
+
 # ============================================================
 # MC Plugin (QueQiao) 原始接口文档
 # ============================================================
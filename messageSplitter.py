@@ -0,0 +1,183 @@
+# messageSplitter.py
+import logging
+import unicodedata
+from typing import Dict, Any, List
+
+import config
+
+logger = logging.getLogger("MessageSplitter")
+
+# ============================================================
+# 出站消息按目的地长度限制拆分 / 截断
+# ============================================================
+# 说明：
+# - 每个目的地 (mc / qq) 有单条长度上限与最多条数 (MESSAGE_SPLIT_LIMITS / MESSAGE_SPLIT_MAX_PARTS)
+# - 切分点优先级：换行 > 空白 > 字素簇边界；不会把 emoji (ZWJ 序列、肤色修饰、国旗)
+#   或组合字符从中间切开
+# - 每段只在原文上用 rfind 向前查找切分点，整体为线性复杂度，只有输出片段会被切片
+# - 超过最多条数的部分被截断，并计入截断统计
+# ============================================================
+
+DEST_MC = "mc"
+DEST_QQ = "qq"
+
+# 截断后附加的提示
+TRUNCATION_MARK = "…(消息过长，已截断)"
+
+# 零宽连接符
+_ZWJ = "\u200d"
+
+# 统计 {目的地: {指标: 数量}}
+_split_stats: Dict[str, Dict[str, int]] = {
+    dest: {"messages": 0, "split": 0, "parts": 0, "truncated": 0, "truncated_chars": 0}
+    for dest in (DEST_MC, DEST_QQ)
+}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def split_message(text: str, destination: str) -> List[str]:
+    """
+    [接口] 按目的地的长度限制拆分文本
+
+    :return: 片段列表 (最多 MESSAGE_SPLIT_MAX_PARTS 条；超出部分被截断，最后一条带截断提示)
+    """
+    limit = config.MESSAGE_SPLIT_LIMITS[destination]
+    stats = _split_stats[destination]
+    stats["messages"] += 1
+
+    if len(text) <= limit:
+        stats["parts"] += 1
+        return [text]
+
+    max_parts = max(1, config.MESSAGE_SPLIT_MAX_PARTS)
+    parts = []
+    start = 0
+    length = len(text)
+    while start < length:
+        if len(parts) == max_parts - 1 and length - start > limit:
+            # 最后一条：留出截断提示的位置
+            end = _find_split(text, start, max(1, limit - len(TRUNCATION_MARK)))
+            parts.append(text[start:end].rstrip() + TRUNCATION_MARK)
+            stats["truncated"] += 1
+            stats["truncated_chars"] += length - end
+            logger.info(f"[拆分] 发往 {destination} 的消息过长 ({length} 字)，已截断 {length - end} 字")
+            break
+
+        end = _find_split(text, start, limit) if length - start > limit else length
+        part = text[start:end].strip("\n")
+        if part:
+            parts.append(part)
+        start = end
+
+    stats["split"] += 1
+    stats["parts"] += len(parts)
+    return parts
+
+
+def truncate_components(components: List[Dict[str, Any]], destination: str) -> List[Dict[str, Any]]:
+    """
+    [接口] 按目的地总长度上限 (单条上限 × 最多条数) 截断文本组件列表
+
+    富文本组件无法拆成多条发送，只截断超出的部分
+    """
+    budget = config.MESSAGE_SPLIT_LIMITS[destination] * max(1, config.MESSAGE_SPLIT_MAX_PARTS)
+    stats = _split_stats[destination]
+    stats["messages"] += 1
+    stats["parts"] += 1
+
+    used = 0
+    for index, component in enumerate(components):
+        text = component.get("text") or ""
+        if used + len(text) <= budget:
+            used += len(text)
+            continue
+
+        keep = budget - used
+        end = _find_split(text, 0, keep) if keep > 0 else 0
+        dropped = len(text) - end + sum(len(c.get("text") or "") for c in components[index + 1:])
+        stats["truncated"] += 1
+        stats["truncated_chars"] += dropped
+        logger.info(f"[拆分] 发往 {destination} 的富文本过长，已截断 {dropped} 字")
+
+        result = components[:index]
+        if end:
+            result.append({**component, "text": text[:end]})
+        result.append({"text": TRUNCATION_MARK, "color": "gray"})
+        return result
+    return components
+
+
+def get_split_stats() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 拆分 / 截断统计
+    """
+    return {dest: dict(stats) for dest, stats in _split_stats.items()}
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _find_split(text: str, start: int, limit: int) -> int:
+    """
+    [内部] 在 text[start:start+limit] 内寻找切分位置 (返回切分处的下标)
+    """
+    end = start + limit
+    if end >= len(text):
+        return len(text)
+
+    # 1. 换行 (只接受位于后半段的，避免切出过短的片段)
+    floor = start + limit // 2
+    pos = text.rfind("\n", floor, end)
+    if pos > start:
+        return pos + 1
+
+    # 2. 空白
+    for sep in (" ", "\t", "\u3000"):
+        pos = text.rfind(sep, floor, end)
+        if pos > start:
+            return pos + 1
+
+    # 3. 字素簇边界 (最多回退一小段，超长的组合序列只能硬切)
+    pos = end
+    while pos > start and pos > end - 32 and not _is_grapheme_boundary(text, pos):
+        pos -= 1
+    return pos if pos > start and _is_grapheme_boundary(text, pos) else end
+
+
+def _is_grapheme_boundary(text: str, i: int) -> bool:
+    """
+    [内部] 判断 text[i-1] 与 text[i] 之间是否可以切分 (字素簇规则的常用子集)
+    """
+    if i <= 0 or i >= len(text):
+        return True
+    prev, cur = text[i - 1], text[i]
+    cp = ord(cur)
+
+    # CR LF
+    if prev == "\r" and cur == "\n":
+        return False
+    # 延伸字符：组合附加符号、ZWJ、变体选择符、肤色修饰、标签字符
+    if (unicodedata.combining(cur) or cur == _ZWJ or 0xFE00 <= cp <= 0xFE0F
+            or 0x1F3FB <= cp <= 0x1F3FF or 0xE0020 <= cp <= 0xE007F
+            or unicodedata.category(cur) == "Mc"):
+        return False
+    # ZWJ 之后连接的字符
+    if prev == _ZWJ:
+        return False
+    # 区域指示符 (国旗) 两两成对
+    if _is_regional_indicator(prev) and _is_regional_indicator(cur):
+        run = 0
+        j = i - 1
+        while j >= 0 and _is_regional_indicator(text[j]):
+            run += 1
+            j -= 1
+        return run % 2 == 0
+    return True
+
+
+def _is_regional_indicator(ch: str) -> bool:
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
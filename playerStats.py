@@ -0,0 +1,262 @@
+# playerStats.py
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+import config
+
+logger = logging.getLogger("PlayerStats")
+
+# ============================================================
+# 玩家统计 (在线时长 / 死亡次数 / 发言数)
+# ============================================================
+# 说明：
+# - 由 join / quit / death / chat 事件增量更新，不回扫历史
+# - 每个指标维护一个有序列表 [(-值, uuid)]，更新时二分删除旧位置再插入，
+#   排行榜查询直接取前 N 项
+# - 在线玩家的本次会话时长在快照 / 查询排行前计入总时长 (结算点)
+# - 定期将全部记录写入 PLAYER_STATS_FILE (先写临时文件再替换)，启动时加载
+# ============================================================
+
+# 可排行的指标 {指标名: 中文名}
+METRICS = {
+    "playtime": "在线时长",
+    "deaths": "死亡次数",
+    "messages": "发言数",
+}
+
+
+class _PlayerRecord:
+    """
+    [内部] 单个玩家的统计记录
+    """
+    __slots__ = ("nickname", "playtime", "deaths", "messages", "last_seen", "session_mark")
+
+    def __init__(self, nickname: str, playtime: float = 0.0, deaths: int = 0,
+                 messages: int = 0, last_seen: float = 0.0):
+        self.nickname = nickname
+        self.playtime = playtime
+        self.deaths = deaths
+        self.messages = messages
+        self.last_seen = last_seen
+        # 在线时为上次结算时间，离线为 None
+        self.session_mark: Optional[float] = None
+
+    def to_list(self) -> list:
+        return [self.nickname, round(self.playtime, 1), self.deaths, self.messages, round(self.last_seen)]
+
+
+# --- 全局状态管理 ---
+# 全部玩家记录 {uuid: 记录}
+_players: Dict[str, _PlayerRecord] = {}
+
+# 玩家名 → uuid (事件缺少 uuid 时按名字找回同一条记录)
+_name_index: Dict[str, str] = {}
+
+# 各指标的有序排行 {指标名: [(-值, uuid)]}
+_rankings: Dict[str, List[Tuple[float, str]]] = {metric: [] for metric in METRICS}
+
+# 自上次快照以来是否有变化
+_dirty = False
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def load_snapshot() -> bool:
+    """
+    [接口] 从 PLAYER_STATS_FILE 恢复统计 (文件不存在时从零开始)
+    """
+    global _players, _rankings
+
+    path = config.PLAYER_STATS_FILE
+    if not os.path.exists(path):
+        return True
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        players = {uuid: _PlayerRecord(*fields) for uuid, fields in raw.get("players", {}).items()}
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"[统计] 加载快照失败，从零开始统计: {e}")
+        return False
+
+    _players = players
+    _name_index.clear()
+    _name_index.update({record.nickname: uuid for uuid, record in players.items()})
+    _rankings = {
+        metric: sorted((-getattr(record, metric), uuid) for uuid, record in players.items())
+        for metric in METRICS
+    }
+    logger.info(f"[统计] 已加载 {len(players)} 名玩家的统计")
+    return True
+
+
+def record_event(event: Dict[str, Any]):
+    """
+    [接口] 按事件增量更新统计 (join / quit / death / chat)
+    """
+    global _dirty
+
+    key = _player_key(event)
+    if key is None:
+        return
+
+    now = time.time()
+    record = _players.get(key)
+    if record is None:
+        record = _players[key] = _PlayerRecord(event.get("player_nickname") or key)
+        for metric in METRICS:
+            bisect.insort(_rankings[metric], (0, key))
+    if event.get("player_nickname"):
+        record.nickname = event["player_nickname"]
+        _name_index[record.nickname] = key
+    record.last_seen = now
+
+    sub_type = event.get("sub_type")
+    if sub_type == "player_join":
+        # 重复的 join (如未收到 quit 的重连) 先结算上一段会话
+        _settle_session(key, record, now)
+        record.session_mark = now
+    elif sub_type == "player_quit":
+        _settle_session(key, record, now)
+        record.session_mark = None
+    elif sub_type == "player_death":
+        _update_metric(key, record, "deaths", record.deaths + 1)
+    elif sub_type == "player_chat":
+        _update_metric(key, record, "messages", record.messages + 1)
+    _dirty = True
+
+
+def top_players(metric: str, limit: int = 10) -> List[Tuple[str, float]]:
+    """
+    [接口] 某指标的排行榜 [(玩家名, 值)]
+
+    :raises KeyError: 未知指标
+    """
+    ranking = _rankings[metric]
+    if metric == "playtime":
+        settle_online_sessions()
+    return [(_players[uuid].nickname, -value) for value, uuid in ranking[:limit] if value < 0]
+
+
+def get_player_stats(nickname: str) -> Optional[Dict[str, Any]]:
+    """
+    [接口] 按玩家名查询单个玩家的统计
+    """
+    record = _players.get(_name_index.get(nickname, ""))
+    if record is None:
+        return None
+    return {
+        "nickname": record.nickname,
+        "playtime": record.playtime,
+        "deaths": record.deaths,
+        "messages": record.messages,
+        "online": record.session_mark is not None,
+    }
+
+
+def settle_online_sessions():
+    """
+    [接口] 将在线玩家至今的会话时长计入总时长
+    """
+    now = time.time()
+    for key, record in _players.items():
+        if record.session_mark is not None:
+            _settle_session(key, record, now)
+            record.session_mark = now
+
+
+async def save_snapshot() -> bool:
+    """
+    [接口] 将统计写入 PLAYER_STATS_FILE (序列化在事件循环中完成，磁盘写入在线程中完成)
+    """
+    global _dirty
+
+    if not _dirty:
+        return True
+    settle_online_sessions()
+    payload = json.dumps(
+        {"saved_at": round(time.time()), "players": {uuid: r.to_list() for uuid, r in _players.items()}},
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    _dirty = False
+    try:
+        await asyncio.to_thread(_write_file, config.PLAYER_STATS_FILE, payload)
+    except OSError as e:
+        _dirty = True
+        logger.error(f"[统计] 保存快照失败: {e}")
+        return False
+    return True
+
+
+async def run_stats_snapshot_task():
+    """
+    [接口] 后台任务：每 PLAYER_STATS_SNAPSHOT_INTERVAL 秒保存一次快照
+    """
+    while True:
+        await asyncio.sleep(config.PLAYER_STATS_SNAPSHOT_INTERVAL)
+        await save_snapshot()
+
+
+async def close():
+    """
+    [接口] 关闭流程：保存最终快照
+    """
+    if config.PLAYER_STATS_ENABLE:
+        await save_snapshot()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _player_key(event: Dict[str, Any]) -> Optional[str]:
+    """
+    [内部] 玩家标识：优先 uuid；缺少 uuid 时按玩家名找回已有记录，仍没有则以玩家名为标识
+    """
+    uuid = event.get("player_uuid")
+    if uuid:
+        return str(uuid)
+    nickname = event.get("player_nickname")
+    if not nickname:
+        return None
+    return _name_index.get(nickname) or f"name:{nickname}"
+
+
+def _update_metric(key: str, record: _PlayerRecord, metric: str, value: float):
+    """
+    [内部] 更新指标值并调整其在有序排行中的位置
+    """
+    ranking = _rankings[metric]
+    old = (-getattr(record, metric), key)
+    index = bisect.bisect_left(ranking, old)
+    if index < len(ranking) and ranking[index] == old:
+        del ranking[index]
+    setattr(record, metric, value)
+    bisect.insort(ranking, (-value, key))
+
+
+def _settle_session(key: str, record: _PlayerRecord, now: float):
+    """
+    [内部] 结算在线会话：上次结算点至今的时长计入 playtime
+    """
+    if record.session_mark is None:
+        return
+    elapsed = now - record.session_mark
+    if elapsed > 0:
+        _update_metric(key, record, "playtime", record.playtime + elapsed)
+
+
+def _write_file(path: str, payload: str):
+    """
+    [内部] 原子写入：先写临时文件再替换，避免中途崩溃留下半个文件
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
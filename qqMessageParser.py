@@ -0,0 +1,223 @@
+# qqMessageParser.py
+import logging
+from typing import Dict, Any, List
+
+from groupMetaCache import lookup_member_display_name
+from mediaPipeline import build_image_preview
+
+logger = logging.getLogger("QQMessageParser")
+
+# ============================================================
+# QQ 消息段 → Minecraft 文本组件
+# ============================================================
+# 说明：
+# - 优先使用 NapCat 的数组消息格式 (data["message"] 为 list)
+# - 若为字符串格式，则对 raw_message 做一次线性扫描拆分 CQ 码
+# - 每个消息段统一为 {"type": str, "data": dict}
+# ============================================================
+
+# 常用 QQ 系统表情 ID → 名称 (启动时即加载的静态表)
+QQ_FACE_NAMES: Dict[int, str] = {
+    0: "惊讶", 1: "撇嘴", 2: "色", 3: "发呆", 4: "得意", 5: "流泪", 6: "害羞", 7: "闭嘴",
+    8: "睡", 9: "大哭", 10: "尴尬", 11: "发怒", 12: "调皮", 13: "呲牙", 14: "微笑", 15: "难过",
+    16: "酷", 18: "抓狂", 19: "吐", 20: "偷笑", 21: "可爱", 22: "白眼", 23: "傲慢", 24: "饥饿",
+    25: "困", 26: "惊恐", 27: "流汗", 28: "憨笑", 29: "悠闲", 30: "奋斗", 31: "咒骂", 32: "疑问",
+    33: "嘘", 34: "晕", 35: "折磨", 36: "衰", 37: "骷髅", 38: "敲打", 39: "再见", 41: "发抖",
+    42: "爱情", 43: "跳跳", 49: "拥抱", 53: "蛋糕", 60: "咖啡", 63: "玫瑰", 64: "凋谢", 66: "爱心",
+    74: "太阳", 75: "月亮", 76: "赞", 77: "踩", 78: "握手", 79: "胜利", 96: "冷汗", 97: "擦汗",
+    98: "抠鼻", 99: "鼓掌", 100: "糗大了", 101: "坏笑", 102: "左哼哼", 103: "右哼哼", 104: "哈欠",
+    105: "鄙视", 106: "委屈", 107: "快哭了", 108: "阴险", 109: "亲亲", 110: "吓", 111: "可怜",
+    112: "菜刀", 116: "示爱", 118: "抱拳", 119: "勾引", 120: "拳头", 121: "差劲", 122: "爱你",
+    123: "NO", 124: "OK", 144: "喝彩", 171: "茶", 175: "卖萌", 176: "小纠结", 177: "喷血",
+    178: "斜眼笑", 179: "doge", 180: "惊喜", 181: "骚扰", 182: "笑哭", 183: "我最美",
+    212: "托腮", 264: "捂脸", 265: "辣眼睛", 266: "哦哟", 267: "头秃", 268: "问号脸",
+    269: "暗中观察", 270: "emm", 271: "吃瓜", 272: "呵呵哒", 277: "汪汪", 307: "喵喵",
+}
+
+# 无需额外信息即可渲染的消息段占位文本
+_PLACEHOLDER_TEXT = {
+    "record": "[语音]",
+    "video": "[视频]",
+    "file": "[文件]",
+    "json": "[卡片消息]",
+    "xml": "[卡片消息]",
+    "forward": "[合并转发]",
+    "poke": "[戳一戳]",
+    "dice": "[骰子]",
+    "rps": "[猜拳]",
+    "markdown": "[Markdown]",
+}
+
+# CQ 码转义表 (按替换顺序)
+_CQ_UNESCAPE = (("&#91;", "["), ("&#93;", "]"), ("&#44;", ","), ("&amp;", "&"))
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def parse_segments(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    [接口] 提取 OneBot 消息事件的消息段列表
+    """
+    message = data.get("message")
+    if isinstance(message, list):
+        return message
+    if isinstance(message, str):
+        return tokenize_cq(message)
+    return tokenize_cq(data.get("raw_message") or "")
+
+
+def tokenize_cq(raw: str) -> List[Dict[str, Any]]:
+    """
+    [接口] 单次线性扫描，将含 CQ 码的字符串拆分为消息段
+    例: "hi[CQ:face,id=14]" -> [{"type": "text", ...}, {"type": "face", "data": {"id": "14"}}]
+    """
+    segments = []
+    pos = 0
+    length = len(raw)
+
+    while pos < length:
+        start = raw.find("[CQ:", pos)
+        if start < 0:
+            segments.append(_text_segment(raw[pos:]))
+            break
+        end = raw.find("]", start)
+        if end < 0:
+            # 不完整的 CQ 码：余下部分按普通文本处理
+            segments.append(_text_segment(raw[pos:]))
+            break
+        if start > pos:
+            segments.append(_text_segment(raw[pos:start]))
+
+        head, _, params = raw[start + 4:end].partition(",")
+        seg_data = {}
+        if params:
+            for pair in params.split(","):
+                key, _, value = pair.partition("=")
+                seg_data[key] = _unescape(value)
+        segments.append({"type": head, "data": seg_data})
+        pos = end + 1
+
+    return segments
+
+
+def is_plain_text(segments: List[Dict[str, Any]]) -> bool:
+    """
+    [接口] 判断消息是否只包含普通文本 (且不是链接)
+    """
+    for seg in segments:
+        if seg.get("type") != "text":
+            return False
+        if _is_link((seg.get("data") or {}).get("text", "")):
+            return False
+    return True
+
+
+def plain_text(segments: List[Dict[str, Any]]) -> str:
+    """
+    [接口] 拼接所有文本段
+    """
+    return "".join((seg.get("data") or {}).get("text", "") for seg in segments if seg.get("type") == "text")
+
+
+async def segments_to_components(segments: List[Dict[str, Any]], group_id: int) -> List[Dict[str, Any]]:
+    """
+    [接口] 将消息段转换为 Minecraft 文本组件列表
+    """
+    components = []
+    for seg in segments:
+        seg_type = seg.get("type")
+        seg_data = seg.get("data") or {}
+
+        if seg_type == "text":
+            text = seg_data.get("text", "")
+            if not text:
+                continue
+            if _is_link(text):
+                url = text.strip()
+                components.append({
+                    "text": "[链接]", "color": "blue", "underlined": True,
+                    "hoverEvent": {"action": "show_text", "contents": url},
+                    "clickEvent": {"action": "open_url", "value": url},
+                })
+            else:
+                components.append({"text": text, "color": "white"})
+
+        elif seg_type == "at":
+            name = _resolve_mention(group_id, seg_data)
+            components.append({"text": f"@{name} ", "color": "yellow"})
+
+        elif seg_type == "face":
+            name = _face_name(seg_data.get("id"))
+            components.append({"text": f"[{name}]", "color": "gold"})
+
+        elif seg_type == "mface":
+            components.append({"text": seg_data.get("summary") or "[动画表情]", "color": "gold"})
+
+        elif seg_type == "image":
+            # NapCat: sub_type == 1 表示表情包
+            label = "[动画表情]" if str(seg_data.get("sub_type")) == "1" else "[图片]"
+            hover = seg_data.get("summary") or seg_data.get("file") or "图片"
+            preview = await build_image_preview(seg_data)
+            if preview:
+                hover = [{"text": f"{hover}\n"}] + preview
+            components.append({
+                "text": label, "color": "green",
+                "hoverEvent": {"action": "show_text", "contents": hover},
+            })
+
+        elif seg_type == "reply":
+            components.append({
+                "text": "[回复] ", "color": "gray",
+                "hoverEvent": {"action": "show_text", "contents": f"消息 ID: {seg_data.get('id')}"},
+            })
+
+        else:
+            components.append({"text": _PLACEHOLDER_TEXT.get(seg_type, f"[{seg_type}]"), "color": "gray"})
+
+    return components
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _unescape(text: str) -> str:
+    if "&" not in text:
+        return text
+    for src, dst in _CQ_UNESCAPE:
+        text = text.replace(src, dst)
+    return text
+
+
+def _text_segment(text: str) -> Dict[str, Any]:
+    return {"type": "text", "data": {"text": _unescape(text)}}
+
+
+def _is_link(text: str) -> bool:
+    text = text.strip()
+    return (text.startswith("http://") or text.startswith("https://")) and not any(c.isspace() for c in text)
+
+
+def _face_name(face_id: Any) -> str:
+    try:
+        return QQ_FACE_NAMES.get(int(face_id), "表情")
+    except (TypeError, ValueError):
+        return "表情"
+
+
+def _resolve_mention(group_id: int, seg_data: Dict[str, Any]) -> str:
+    """
+    [内部] 获取被 @ 成员的显示名 (群名片优先)，只查群信息缓存；未缓存时先显示 QQ 号
+    """
+    qq = str(seg_data.get("qq", ""))
+    if qq == "all":
+        return "全体成员"
+    if seg_data.get("name"):
+        return seg_data["name"]
+    if not qq.isdigit():
+        return qq or "未知"
+
+    name = lookup_member_display_name(group_id, int(qq))
+    return name or qq
@@ -0,0 +1,165 @@
+# qqTemplate.py
+import logging
+import string
+from typing import Callable, Optional, Dict, Any, Set, Tuple
+
+import config
+from eventProtocol import MC_EVENT_FIELDS, MC_EVENT_FIELD_MAP
+from mcTranslator import translate_death, translate_advancement
+
+logger = logging.getLogger("QQTemplate")
+
+# ============================================================
+# MC 事件 → QQ 文本模板
+# ============================================================
+# 说明：
+# - 模板定义在 messageProtocol.QQ_MESSAGE_TEMPLATES (可按群覆盖)
+# - 加载 / 重载时编译一次：校验占位符、记录每个模板实际用到的字段
+# - 渲染时只解析模板用到的字段，其余事件字段不会被读取或计算
+# ============================================================
+
+# --- 类型定义 ---
+# 字段解析函数：接收标准事件对象，返回字段值
+FieldResolverType = Callable[[Dict[str, Any]], Any]
+
+
+def _event_field(name: str) -> FieldResolverType:
+    return lambda event: event.get(name)
+
+
+# 模板可用字段 {字段名: 解析函数}
+# 标准事件字段原样读取；以下派生字段带兜底值或需要额外计算
+TEMPLATE_FIELDS: Dict[str, FieldResolverType] = {name: _event_field(name) for name in MC_EVENT_FIELDS}
+TEMPLATE_FIELDS.update({
+    "server_name": lambda event: event.get("server_name") or "MC",
+    "player_nickname": lambda event: event.get("player_nickname") or "未知玩家",
+    # 优先用语言文件将 death_key 渲染为中文；
+    # 否则使用服务端给出的 death_text (多为英文)，都缺失时给出兜底文本
+    "death_message": lambda event: (
+        translate_death(event)
+        or event.get("death_text")
+        or f"{event.get('player_nickname') or '未知玩家'} 不幸去世了"
+    ),
+    # 成就中文标题；无语言文件时退回显示标题、成就文本或成就 key
+    "achievement_title": lambda event: (
+        translate_advancement(event)
+        or event.get("achievement_display_title")
+        or event.get("achievement_text")
+        or event.get("achievement_key")
+        or "未知成就"
+    ),
+})
+
+# 模板占位符解析器
+_FORMATTER = string.Formatter()
+
+# 当前生效的编译结果 (默认模板表, 按群覆盖表)，整体替换
+_compiled: Tuple[Dict[str, Tuple], Dict[int, Dict[str, Tuple]]] = ({}, {})
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def compile_templates(templates: Dict[str, str],
+                      overrides: Dict[int, Dict[str, str]]) -> Tuple[Dict[str, Tuple], Dict[int, Dict[str, Tuple]]]:
+    """
+    [接口] 校验并编译 QQ 文本模板
+
+    :return: (默认模板表, 按群覆盖表)，值为 (format 函数, 字段解析列表)
+    :raises ValueError: 模板不合法 (未知事件类型 / 未声明的字段 / 语法错误)
+    """
+    defaults = {sub_type: _compile_one(sub_type, tmpl) for sub_type, tmpl in templates.items()}
+
+    compiled_overrides = {}
+    for group_id, group_templates in overrides.items():
+        if not isinstance(group_id, int) or isinstance(group_id, bool):
+            raise ValueError(f"Template override group id must be int, got {group_id!r}")
+        compiled_overrides[group_id] = {
+            sub_type: _compile_one(sub_type, tmpl) for sub_type, tmpl in group_templates.items()
+        }
+    return defaults, compiled_overrides
+
+
+def install_templates(compiled: Tuple[Dict[str, Tuple], Dict[int, Dict[str, Tuple]]]):
+    """
+    [接口] 替换当前生效的模板表
+    """
+    global _compiled
+    _compiled = compiled
+
+
+def load_templates():
+    """
+    [接口] 从当前配置编译并安装模板 (启动时调用)
+    """
+    install_templates(compile_templates(config.QQ_MESSAGE_TEMPLATES, config.QQ_MESSAGE_TEMPLATE_OVERRIDES))
+
+
+def render_qq_message(sub_type: str, event: Dict[str, Any], group_id: Optional[int] = None) -> Optional[str]:
+    """
+    [接口] 按事件类型 (及目标群的覆盖模板) 渲染 QQ 文本
+
+    :return: 渲染结果；该事件没有模板或模板为空字符串时返回 None
+    """
+    defaults, overrides = _compiled
+    entry = overrides.get(group_id, {}).get(sub_type) if group_id is not None else None
+    if entry is None:
+        entry = defaults.get(sub_type)
+    if entry is None:
+        return None
+
+    fmt, resolvers = entry
+    if fmt is None:
+        return None
+    return fmt(**{name: resolve(event) for name, resolve in resolvers})
+
+
+def prepare_config_reload(new_config):
+    """
+    [接口] 配置热重载 (准备阶段)：编译新模板，不合法时抛出 ValueError
+    """
+    return compile_templates(new_config.QQ_MESSAGE_TEMPLATES, new_config.QQ_MESSAGE_TEMPLATE_OVERRIDES)
+
+
+def apply_config_reload(compiled, _changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：切换模板表
+    """
+    install_templates(compiled)
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _compile_one(sub_type: str, template: str) -> Tuple:
+    """
+    [内部] 编译单个模板：(绑定的 str.format, ((字段名, 解析函数), ...))
+    空字符串表示该事件不发送。
+    """
+    if sub_type not in MC_EVENT_FIELD_MAP:
+        raise ValueError(f"Unknown event sub_type in QQ template: {sub_type!r}")
+    if not isinstance(template, str):
+        raise ValueError(f"QQ template for '{sub_type}' must be str")
+    if not template:
+        return None, ()
+
+    try:
+        parsed = list(_FORMATTER.parse(template))
+    except ValueError as e:
+        raise ValueError(f"Invalid QQ template for '{sub_type}': {e}") from e
+
+    fields = []
+    for _, name, _, _ in parsed:
+        if name is None:
+            continue
+        if name not in TEMPLATE_FIELDS:
+            raise ValueError(
+                f"QQ template for '{sub_type}' uses undeclared field '{name}', "
+                f"available: {', '.join(sorted(TEMPLATE_FIELDS))}"
+            )
+        if name not in fields:
+            fields.append(name)
+
+    return template.format, tuple((name, TEMPLATE_FIELDS[name]) for name in fields)
@@ -0,0 +1,190 @@
+# runtimeProfile.py
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+from websockets.exceptions import PayloadTooBig
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import (
+    ClientPerMessageDeflateFactory,
+    ServerPerMessageDeflateFactory,
+)
+from websockets.frames import CTRL_OPCODES, Frame
+
+import config
+
+logger = logging.getLogger("RuntimeProfile")
+
+# 各链路的配置项前缀
+_LINK_PREFIX = {
+    "napcat": "NAPCAT_WS_",
+    "mcplugin": "McPlugin_WS_",
+}
+
+# 影响 WebSocket 连接参数的配置项后缀 (热重载时用于判断是否需要重建连接)
+WS_OPTION_SUFFIXES = (
+    "COMPRESSION",
+    "MAX_SIZE",
+    "MAX_QUEUE",
+    "WRITE_LIMIT_HIGH",
+    "WRITE_LIMIT_LOW",
+    "PING_INTERVAL",
+    "PING_TIMEOUT",
+    "MAX_COMPRESSION_RATIO",
+)
+
+# ==========================================
+# permessage-deflate 压缩比检查 (防解压炸弹)
+# ==========================================
+# 解压后的大小超过 max(_RATIO_MIN_SIZE, 本条消息线上字节数 × *_WS_MAX_COMPRESSION_RATIO) 时
+# 立即停止解压 (不会先解压出完整数据)，按消息过大以 1009 关闭连接
+
+# 解压后小于该值的消息不检查压缩比 (小而重复的 JSON 压缩比很高)
+_RATIO_MIN_SIZE = 64 * 1024
+
+
+class _RatioGuardedDeflate(Extension):
+    """
+    [内部] 包装 permessage-deflate 扩展：按已接收的线上字节数限制本条消息可解压出的大小
+    """
+
+    def __init__(self, inner: Extension, max_ratio: float):
+        self.name = inner.name
+        self._inner = inner
+        self._max_ratio = max_ratio
+        # 当前消息已接收的线上字节数 / 已解压字节数
+        self._wire = 0
+        self._decoded = 0
+        # 是否因压缩比超限而中止 (供关闭后归类)
+        self.tripped = False
+
+    def encode(self, frame: Frame) -> Frame:
+        return self._inner.encode(frame)
+
+    def decode(self, frame: Frame, *, max_size: Optional[int] = None) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return self._inner.decode(frame, max_size=max_size)
+
+        self._wire += len(frame.data)
+        allowed = max(1, int(max(_RATIO_MIN_SIZE, self._wire * self._max_ratio)) - self._decoded)
+        limit = allowed if max_size is None else min(max_size, allowed)
+        try:
+            decoded = self._inner.decode(frame, max_size=limit)
+        except PayloadTooBig:
+            if max_size is None or allowed < max_size:
+                self.tripped = True
+            raise
+
+        self._decoded += len(decoded.data)
+        if decoded.fin:
+            self._wire = self._decoded = 0
+        return decoded
+
+    def __repr__(self) -> str:
+        return f"RatioGuarded({self._inner!r}, max_ratio={self._max_ratio})"
+
+
+class _ServerDeflateFactory(ServerPerMessageDeflateFactory):
+    """
+    [内部] 服务端 permessage-deflate (参数同 websockets 默认值)，协商出的扩展带压缩比检查
+    """
+
+    def __init__(self, max_ratio: float):
+        super().__init__(server_max_window_bits=12, client_max_window_bits=12, compress_settings={"memLevel": 5})
+        self.max_ratio = max_ratio
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, _RatioGuardedDeflate(extension, self.max_ratio)
+
+
+class _ClientDeflateFactory(ClientPerMessageDeflateFactory):
+    """
+    [内部] 客户端 permessage-deflate (参数同 websockets 默认值)，协商出的扩展带压缩比检查
+    """
+
+    def __init__(self, max_ratio: float):
+        super().__init__(compress_settings={"memLevel": 5})
+        self.max_ratio = max_ratio
+
+    def process_response_params(self, params, accepted_extensions):
+        extension = super().process_response_params(params, accepted_extensions)
+        return _RatioGuardedDeflate(extension, self.max_ratio)
+
+
+def _deflate_extensions(link: str, max_ratio: float) -> list:
+    """
+    [内部] 生成带压缩比检查的 permessage-deflate 扩展 (代替 compression="deflate")
+
+    :param link: "napcat" (服务端) 或 "mcplugin" (客户端)
+    """
+    if link == "napcat":
+        return [_ServerDeflateFactory(max_ratio)]
+    return [_ClientDeflateFactory(max_ratio)]
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def install_event_loop():
+    """
+    [接口] 安装事件循环实现 (需在 asyncio.run 之前调用)
+
+    USE_UVLOOP 开启且已安装 uvloop 时使用 uvloop，否则回退到默认循环。
+    """
+    if not config.USE_UVLOOP:
+        logger.info("[启动配置] 使用默认 asyncio 事件循环。")
+        return
+
+    try:
+        import uvloop
+    except ImportError:
+        logger.info("[启动配置] 未安装 uvloop (pip install uvloop)，使用默认 asyncio 事件循环。")
+        return
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info(f"[启动配置] 已启用 uvloop {uvloop.__version__} 事件循环。")
+
+
+def ws_option_names(link: str) -> set:
+    """
+    [接口] 获取某条链路的全部 WebSocket 参数配置项名
+    """
+    prefix = _LINK_PREFIX[link]
+    return {prefix + suffix for suffix in WS_OPTION_SUFFIXES}
+
+
+def link_setting(link: str, suffix: str) -> Any:
+    """
+    [接口] 读取某条链路的连接配置项，如 link_setting("napcat", "MAX_SIZE")
+    """
+    return getattr(config, _LINK_PREFIX[link] + suffix)
+
+
+def ws_options(link: str) -> Dict[str, Any]:
+    """
+    [接口] 根据配置生成 serve()/connect() 的连接参数
+
+    :param link: "napcat" 或 "mcplugin"
+    """
+    def setting(suffix: str):
+        return link_setting(link, suffix)
+
+    options = {
+        # permessage-deflate 压缩：省带宽，但每帧多一次压缩/解压
+        "compression": "deflate" if setting("COMPRESSION") else None,
+        # 单条消息最大字节数，超出会以 1009 关闭连接
+        "max_size": setting("MAX_SIZE"),
+        # 接收队列上限 (帧数)，满后停止从套接字读取形成背压
+        "max_queue": setting("MAX_QUEUE"),
+        # 写缓冲高/低水位 (字节)，超过高水位时 send() 会等待排空
+        "write_limit": (setting("WRITE_LIMIT_HIGH"), setting("WRITE_LIMIT_LOW")),
+        "ping_interval": setting("PING_INTERVAL"),
+        "ping_timeout": setting("PING_TIMEOUT"),
+    }
+    # 压缩时限制解压后与线上字节数之比 (防解压炸弹)
+    if options["compression"] and setting("MAX_COMPRESSION_RATIO"):
+        options["compression"] = None
+        options["extensions"] = _deflate_extensions(link, setting("MAX_COMPRESSION_RATIO"))
+    return options
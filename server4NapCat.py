@@ -2,13 +2,18 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import Callable, Awaitable, Optional, Set, Dict, Any
+from typing import Callable, Awaitable, Optional, Set, Dict, Any, List, Tuple
 
 # 引入最新的 websockets 服务端模块
 from websockets.asyncio.server import serve, ServerConnection
 from websockets.exceptions import ConnectionClosedError
 
 import config
+import memoryReport
+import runtimeProfile
+from deliveryTracker import DeliveryTracker
+from frameGuard import FrameGuard
+from loadShedder import SheddingQueue, classify_napcat_event
 
 # 配置日志
 logger = logging.getLogger("NapCatServer")
@@ -16,10 +21,23 @@ logger = logging.getLogger("NapCatServer")
 # --- 类型定义 ---
 # 回调函数类型：接收 dict，返回 Awaitable[None]
 MessageHandlerType = Callable[[Dict[str, Any]], Awaitable[None]]
+# 连接建立回调：无参数，在后台任务中执行 (此时已可调用 call_napcat_api)
+ConnectHandlerType = Callable[[], Awaitable[None]]
+# 多进程模式下的转发函数 (本进程没有 NapCat 连接时使用)
+ForwardNotifyType = Callable[[Dict[str, Any]], Awaitable[bool]]
+ForwardCallType = Callable[[str, Dict[str, Any], float], Awaitable[Dict[str, Any]]]
 
 # --- 全局状态管理 ---
 # NapCat 消息接收回调（由外部注入）
 _napcat_message_handler: Optional[MessageHandlerType] = None
+# NapCat 连接建立回调（由外部注入，如预热群信息缓存）
+_napcat_connect_handler: Optional[ConnectHandlerType] = None
+
+# 多进程模式：转交其他进程发送 (由 workerCluster 注入)
+_napcat_forward_notify: Optional[ForwardNotifyType] = None
+_napcat_forward_call: Optional[ForwardCallType] = None
+# 多进程模式：监听套接字启用 SO_REUSEPORT
+_reuse_port = False
 
 # 保存所有活跃连接的集合
 _active_connections: Set[ServerConnection] = set()
@@ -30,6 +48,49 @@ _connection_iterator = None
 # 用于存储等待响应的 Future 对象
 _pending_api_requests: Dict[str, asyncio.Future] = {}
 
+# 连接存活状态 {连接: {"connected_at", "last_heartbeat", "interval", "online"}}
+# 时间均为 loop.time()；interval 取自心跳包 (秒)，未收到心跳前为 None
+_connection_liveness: Dict[ServerConnection, Dict[str, Any]] = {}
+
+# 变化后需要重建监听套接字的配置项 (连接参数只对新连接生效)
+_LISTEN_SETTINGS = {"NAPCAT_WS_HOST", "NAPCAT_WS_PORT"} | runtimeProfile.ws_option_names("napcat")
+# 通知 start_server 重新绑定监听地址 (关闭时也用于停止监听)
+_rebind_event: Optional[asyncio.Event] = None
+# 绑定监听地址失败后的重试间隔 (秒)
+_BIND_RETRY_INTERVAL = 5
+
+# 异步通知的投递跟踪 (DELIVERY_CONFIRM_ENABLE 且 NAPCAT_ENABLE_ECHO 时启用)
+# OneBot 响应：retcode == 0 表示成功
+_delivery = DeliveryTracker(
+    "napcat",
+    lambda payload: _send_to_napcat_impl(payload),
+    lambda response: response.get("retcode", 0) == 0,
+)
+
+# 入站事件队列 (LOAD_SHED_ENABLE 时使用)
+_inbound_queue = SheddingQueue("napcat", classify_napcat_event)
+
+# 业务回调任务 (LOAD_SHED_ENABLE 关闭时使用)
+# 回调中可能调用 call_napcat_api，其响应要由接收循环读取，因此回调不能在接收循环内等待；
+# 同时执行的回调达到上限时接收循环等待空位，保留 websockets / TCP 的背压
+_MAX_CONCURRENT_HANDLERS = 32
+_handler_slots = asyncio.Semaphore(_MAX_CONCURRENT_HANDLERS)
+_handler_tasks: Set[asyncio.Task] = set()
+
+# 入站消息大小检查与按对端的拒收统计
+_frame_guard = FrameGuard("napcat")
+
+# --- 优雅关闭状态 ---
+# 是否继续接收新的入站事件 / 新连接
+_accepting_inbound = True
+# 在途的发送 / 业务回调数量
+_inflight_sends = 0
+_inflight_handlers = 0
+# 累计完成的发送次数 (用于统计关闭期间排空的数量)
+_completed_sends = 0
+# 关闭期间丢弃的入站事件数
+_dropped_inbound = 0
+
 
 # ==========================================
 # 对外公共接口 (Public API)
@@ -44,6 +105,31 @@ def register_napcat_message_handler(handler: MessageHandlerType):
     logger.info("已注册 NapCat 消息处理回调函数。")
 
 
+def register_napcat_connect_handler(handler: ConnectHandlerType):
+    """
+    [接口] 注册 NapCat 连接建立回调 (每次有新连接通过鉴权后调用)
+    """
+    global _napcat_connect_handler
+    _napcat_connect_handler = handler
+
+
+def register_napcat_forwarder(notify: ForwardNotifyType, call: ForwardCallType):
+    """
+    [接口] 注册转发函数 (多进程模式)：本进程没有 NapCat 连接时，通知与 API 调用交给其他进程
+    """
+    global _napcat_forward_notify, _napcat_forward_call
+    _napcat_forward_notify = notify
+    _napcat_forward_call = call
+
+
+def enable_shared_listener():
+    """
+    [接口] 监听套接字启用 SO_REUSEPORT (多进程模式，需在 start_server 之前调用)
+    """
+    global _reuse_port
+    _reuse_port = True
+
+
 async def call_napcat_api(action: str, params: Optional[Dict] = None, timeout: float = 10.0) -> Dict[str, Any]:
     """
     [接口] 调用 NapCat API 并异步等待响应结果 (核心功能)
@@ -54,8 +140,13 @@ async def call_napcat_api(action: str, params: Optional[Dict] = None, timeout: f
     :return: API 响应结果字典 (包含 status, retcode, data 等)
     :raises asyncio.TimeoutError: 请求超时
     :raises ConnectionError: 没有可用的连接
+    :raises RuntimeError: 响应超过软上限 (NAPCAT_WS_SOFT_MAX_SIZE) 被丢弃
     :raises Exception: 其他发送错误
     """
+    # 0. 多进程模式：本进程没有连接时交给持有连接的进程
+    if not _active_connections and _napcat_forward_call is not None:
+        return await _napcat_forward_call(action, params or {}, timeout)
+
     # 1. 生成唯一的请求追踪 ID (echo)
     request_uuid = str(uuid.uuid4())
 
@@ -85,6 +176,10 @@ async def call_napcat_api(action: str, params: Optional[Dict] = None, timeout: f
     except asyncio.TimeoutError:
         logger.error(f"[API调用失败] 请求超时 ({timeout}s): {action}, echo: {request_uuid}")
         raise
+    except RuntimeError as e:
+        # 响应超过软上限被丢弃
+        logger.error(f"[API调用失败] {e}: {action}, echo: {request_uuid}")
+        raise
     except Exception as e:
         logger.error(f"[API调用失败] 发送请求时出错: {e}, echo: {request_uuid}")
         raise ConnectionError(f"Failed to send API request: {e}") from e
@@ -96,12 +191,18 @@ async def call_napcat_api(action: str, params: Optional[Dict] = None, timeout: f
 async def send_to_napcat_async_notification(data_dict: dict) -> bool:
     """
     [接口] 发送异步通知数据到 NapCat (不等待响应)
-    适用于无需回复的场景。
+    适用于无需回复的场景。开启投递确认时，回执由接收循环异步匹配，失败自动重发。
     """
     # 确保不携带 echo，避免污染 API 请求池
     if 'echo' in data_dict:
         del data_dict['echo']
 
+    if not _active_connections and _napcat_forward_notify is not None:
+        return await _napcat_forward_notify(data_dict)
+
+    if config.DELIVERY_CONFIRM_ENABLE and config.NAPCAT_ENABLE_ECHO:
+        return await _delivery.send(data_dict)
+
     try:
         await _send_to_napcat_impl(data_dict)
         return True
@@ -109,6 +210,155 @@ async def send_to_napcat_async_notification(data_dict: dict) -> bool:
         # _send_to_napcat_impl 已经记录了错误日志
         return False
 
+
+def stop_accepting():
+    """
+    [接口] 关闭流程：停止监听新连接、丢弃新的入站事件 (API 响应仍会被处理)
+    """
+    global _accepting_inbound
+    _accepting_inbound = False
+    if _rebind_event is not None:
+        _rebind_event.set()
+
+
+async def drain(deadline: float) -> Dict[str, int]:
+    """
+    [接口] 关闭流程：在截止时间前等待在途发送、业务回调与 API 请求完成，
+    超时仍未完成的 API 请求以 ConnectionError 结束
+    """
+    loop = asyncio.get_running_loop()
+    completed_before = _completed_sends
+
+    while (_inflight_sends or _inflight_handlers or _handler_tasks or len(_inbound_queue) or _pending_api_requests
+           or _delivery.pending_count()) and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+
+    cancelled_api = 0
+    for future in list(_pending_api_requests.values()):
+        if not future.done():
+            future.set_exception(ConnectionError("NapCat gateway is shutting down"))
+            cancelled_api += 1
+    unacked = _delivery.abandon_all()
+
+    return {
+        "drained_sends": _completed_sends - completed_before,
+        "dropped_sends": _inflight_sends,
+        "dropped_handlers": _inflight_handlers,
+        "cancelled_api": cancelled_api,
+        "unacked_notifications": unacked,
+        "dropped_inbound": _dropped_inbound,
+        "dropped_queued": len(_inbound_queue),
+        "shed_overload": _inbound_queue.shed_total(),
+    }
+
+
+async def run_inbound_worker_task():
+    """
+    [接口] 后台任务：按顺序处理入站队列中的事件 (LOAD_SHED_ENABLE 关闭时队列始终为空)
+    """
+    while True:
+        data = await _inbound_queue.get()
+        await _dispatch_inbound(data)
+
+
+def get_load_shed_stats() -> Dict[str, Any]:
+    """
+    [接口] 入站队列统计 (排队数、最大排队时延、是否处于丢弃状态、按事件类型的丢弃数)
+    """
+    return _inbound_queue.stats()
+
+
+def get_delivery_stats() -> Dict[str, Any]:
+    """
+    [接口] 异步通知投递统计 (submitted / acked / retried / failed / success_rate 等)
+    """
+    return _delivery.stats()
+
+
+def get_frame_stats() -> Dict[str, Any]:
+    """
+    [接口] 入站消息大小限制与按对端的拒收统计
+    """
+    return _frame_guard.stats()
+
+
+def get_memory_usage() -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 内存估算：API 待响应表、投递待确认表、入站队列、各连接的收发缓冲
+    """
+    return {
+        "pending_api": memoryReport.usage(_pending_api_requests),
+        **_delivery.memory_usage(),
+        "inbound_queue": _inbound_queue.memory_usage(),
+        "connections": memoryReport.connection_buffers(list(_active_connections)),
+    }
+
+
+def dump_undelivered() -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    [接口] 状态快照：导出未送达的异步通知 (DELIVERY_REPLAY_TTL 秒后过期)
+    """
+    return _delivery.dump_undelivered(config.DELIVERY_REPLAY_TTL)
+
+
+def restore_undelivered(entries: List[Tuple[float, Dict[str, Any]]]):
+    """
+    [接口] 状态快照：恢复未送达的通知，连接建立后补发
+    """
+    _delivery.restore_undelivered(entries)
+
+
+def get_connection_liveness() -> List[Dict[str, Any]]:
+    """
+    [接口] 获取每个 NapCat 连接的存活视图
+
+    :return: [{remote, connected_for, last_heartbeat_ago, interval, missed, online}]
+    """
+    now = asyncio.get_running_loop().time()
+    view = []
+    for ws, state in list(_connection_liveness.items()):
+        last = state["last_heartbeat"]
+        interval = state["interval"]
+        view.append({
+            "remote": ws.remote_address,
+            "connected_for": round(now - state["connected_at"], 1),
+            "last_heartbeat_ago": None if last is None else round(now - last, 1),
+            "interval": interval,
+            "missed": _missed_heartbeats(state, now),
+            "online": state["online"],
+        })
+    return view
+
+
+async def run_liveness_reaper_task():
+    """
+    [接口] 存活巡检任务：连续错过 NAPCAT_HEARTBEAT_MAX_MISSED 次心跳的连接
+    会被移出连接池并主动关闭，避免继续被 _send_to_napcat_impl 选中
+    """
+    loop = asyncio.get_running_loop()
+    logger.info(
+        f"[存活巡检] 已启动 (间隔 {config.NAPCAT_HEARTBEAT_CHECK_INTERVAL}s, "
+        f"允许错过 {config.NAPCAT_HEARTBEAT_MAX_MISSED} 次心跳)"
+    )
+
+    while True:
+        await asyncio.sleep(config.NAPCAT_HEARTBEAT_CHECK_INTERVAL)
+        now = loop.time()
+        for ws, state in list(_connection_liveness.items()):
+            missed = _missed_heartbeats(state, now)
+            if missed >= config.NAPCAT_HEARTBEAT_MAX_MISSED:
+                _evict_connection(ws, missed)
+
+
+async def close_connections():
+    """
+    [接口] 关闭流程：以 1001 (Going Away) 关闭所有 NapCat 连接
+    """
+    await asyncio.gather(
+        *(ws.close(code=1001, reason="bridge shutting down") for ws in list(_active_connections)),
+        return_exceptions=True,
+    )
+
 # ==========================================
 # 内部实现细节 (Internal Implementation)
 # ==========================================
@@ -117,7 +367,7 @@ async def _send_to_napcat_impl(data_dict: dict):
     """
     [内部] 底层发送实现，负责选择连接并执行发送操作
     """
-    global _connection_iterator
+    global _connection_iterator, _inflight_sends, _completed_sends
 
     if not _active_connections:
         raise ConnectionError("No active NapCat connections available.")
@@ -139,9 +389,11 @@ async def _send_to_napcat_impl(data_dict: dict):
             raise ConnectionError("Connection pool became empty during selection.")
 
     # 执行发送
+    _inflight_sends += 1
     try:
         json_str = json.dumps(data_dict, ensure_ascii=False)
         await target_ws.send(json_str)
+        _completed_sends += 1
         if config.DEBUG_MODE and 'echo' not in data_dict:
             # 仅在不是 API 请求时打印详细发送日志，避免刷屏
             logger.debug(f"[中枢 -> NapCat(通知)] 已发送: {json_str[:150]}...")
@@ -150,12 +402,63 @@ async def _send_to_napcat_impl(data_dict: dict):
         # 发送失败可能是连接断了，但让 handle_connection 的 finally 块去处理移除逻辑
         # 这里只抛出异常通知上层
         raise
+    finally:
+        _inflight_sends -= 1
+
+
+def _missed_heartbeats(state: Dict[str, Any], now: float) -> int:
+    """
+    [内部] 计算连接已错过的心跳次数 (未上报心跳间隔的连接不参与判定)
+    """
+    if state["interval"] is None:
+        return 0
+    return int((now - state["last_heartbeat"]) // state["interval"])
+
+
+def _record_meta_event(websocket: ServerConnection, data: Dict[str, Any]):
+    """
+    [内部] 记录心跳 / 生命周期元事件，更新连接存活状态
+    """
+    state = _connection_liveness.get(websocket)
+    if state is None:
+        return
+
+    if data.get("meta_event_type") == "heartbeat":
+        state["last_heartbeat"] = asyncio.get_running_loop().time()
+        # OneBot 心跳的 interval 单位为毫秒
+        interval_ms = data.get("interval")
+        if isinstance(interval_ms, (int, float)) and interval_ms > 0:
+            state["interval"] = interval_ms / 1000
+        status = data.get("status")
+        if isinstance(status, dict) and "online" in status:
+            state["online"] = status.get("online")
+
+
+def _evict_connection(websocket: ServerConnection, missed: int):
+    """
+    [内部] 将失活连接移出连接池，并在后台关闭
+    """
+    global _connection_iterator
+
+    logger.warning(
+        f"[存活巡检] 连接 {websocket.remote_address} 已错过 {missed} 次心跳，判定失活并驱逐。"
+    )
+    _active_connections.discard(websocket)
+    _connection_liveness.pop(websocket, None)
+    _connection_iterator = None
+    # 对端可能已无响应，关闭握手交给后台任务，避免阻塞巡检
+    asyncio.get_running_loop().create_task(
+        websocket.close(code=4008, reason="heartbeat timeout")
+    )
 
 
 async def _handle_api_response(data: Dict[str, Any], echo_id: str):
     """
-    [内部] 处理 API 响应结果
+    [内部] 处理 API 响应结果 (异步通知的投递回执优先由投递跟踪器处理)
     """
+    if _delivery.resolve(echo_id, data):
+        return
+
     future = _pending_api_requests.get(echo_id)
     if future and not future.done():
         # 找到对应的 Future，设置结果，唤醒等待者
@@ -165,6 +468,53 @@ async def _handle_api_response(data: Dict[str, Any], echo_id: str):
         logger.warning(f"[API响应过期] 收到了一个未知的或已超时的响应, echo: {echo_id}")
 
 
+async def _dispatch_inbound(data: Dict[str, Any]):
+    """
+    [内部] 调用业务回调处理一条入站事件
+    """
+    global _inflight_handlers
+
+    if _napcat_message_handler:
+        # 【重要】使用 try-except 包裹业务逻辑，防止回调出错搞崩底层连接
+        _inflight_handlers += 1
+        try:
+            await _napcat_message_handler(data)
+        except Exception as business_err:
+            logger.error(f"[业务回调异常] 处理 NapCat 事件时出错: {business_err}", exc_info=True)
+        finally:
+            _inflight_handlers -= 1
+    elif config.DEBUG_MODE:
+        logger.debug("[接收] 收到事件但未设置回调，已丢弃。")
+
+
+async def _dispatch_in_slot(data: Dict[str, Any]):
+    """
+    [内部] 在独立任务中处理一条入站事件，结束后释放回调名额
+    """
+    try:
+        await _dispatch_inbound(data)
+    finally:
+        _handler_slots.release()
+
+
+async def _replay_undelivered():
+    """
+    [内部] 连接建立后补发上次运行未送达的通知 (需开启投递确认)
+    """
+    if config.DELIVERY_CONFIRM_ENABLE and config.NAPCAT_ENABLE_ECHO:
+        await _delivery.replay()
+
+
+async def _run_connect_handler():
+    """
+    [内部] 执行连接建立回调，异常只记录日志
+    """
+    try:
+        await _napcat_connect_handler()
+    except Exception as e:
+        logger.error(f"[连接回调异常] 执行 NapCat 连接回调时出错: {e}", exc_info=True)
+
+
 async def handle_napcat_connection(websocket: ServerConnection):
     """
     [内部] WebSocket 连接处理器 (每个连接一个协程)
@@ -178,13 +528,28 @@ async def handle_napcat_connection(websocket: ServerConnection):
 
     logger.info(f"[连接管理] NapCat 已连接: {websocket.remote_address}")
     _active_connections.add(websocket)
+    _connection_liveness[websocket] = {
+        "connected_at": asyncio.get_running_loop().time(),
+        "last_heartbeat": None,
+        "interval": None,
+        "online": None,
+    }
     # 重置迭代器以纳入新连接
-    global _connection_iterator
+    global _connection_iterator, _dropped_inbound
     _connection_iterator = None
 
+    # 连接回调需要等待 API 响应，必须在接收循环之外的任务中执行
+    if _napcat_connect_handler:
+        asyncio.get_running_loop().create_task(_run_connect_handler())
+    asyncio.get_running_loop().create_task(_replay_undelivered())
+
     try:
         # 2. 消息接收循环
         async for message in websocket:
+            # 超过软上限的消息不解析 (若是 API 响应，等待的调用立即失败)
+            if not _frame_guard.accept(websocket, message):
+                _frame_guard.fail_pending(message, _pending_api_requests)
+                continue
             try:
                 data = json.loads(message)
 
@@ -206,30 +571,39 @@ async def handle_napcat_connection(websocket: ServerConnection):
                     await _handle_api_response(data, echo_id)
                     continue
 
-                # 过滤心跳包 (Meta Event)
+                # 心跳包 (Meta Event)：只记录存活状态，不进入业务流程
                 if data.get('post_type') == 'meta_event':
+                    _record_meta_event(websocket, data)
+                    continue
+
+                # 关闭流程中：不再接收新的入站事件
+                if not _accepting_inbound:
+                    _dropped_inbound += 1
                     continue
 
                 # ---> 进入普通事件处理流程 (调用业务回调)
-                if _napcat_message_handler:
-                    # 【重要】使用 try-except 包裹业务逻辑，防止回调出错搞崩底层连接
-                    try:
-                        await _napcat_message_handler(data)
-                    except Exception as business_err:
-                        logger.error(f"[业务回调异常] 处理 NapCat 事件时出错: {business_err}", exc_info=True)
-                elif config.DEBUG_MODE:
-                    logger.debug("[接收] 收到事件但未设置回调，已丢弃。")
+                # 开启过载保护时只入队，由 run_inbound_worker_task 按排队时延决定处理或丢弃
+                if config.LOAD_SHED_ENABLE:
+                    await _inbound_queue.put(data)
+                else:
+                    await _handler_slots.acquire()
+                    task = asyncio.get_running_loop().create_task(_dispatch_in_slot(data))
+                    _handler_tasks.add(task)
+                    task.add_done_callback(_handler_tasks.discard)
 
             except json.JSONDecodeError:
+                _frame_guard.record_invalid(websocket)
                 logger.warning(f"[接收] 收到非法 JSON 数据，长度: {len(message)}")
 
     except ConnectionClosedError as e:
+        _frame_guard.record_close(websocket, e)
         logger.info(f"[连接断开] NapCat 连接关闭: {websocket.remote_address}, 代码: {e.code}, 原因: {e.reason}")
     except Exception as e:
         logger.error(f"[连接异常] 处理连接时发生意外错误: {websocket.remote_address}, {e}", exc_info=True)
     finally:
         # 3. 清理工作
         _active_connections.discard(websocket)
+        _connection_liveness.pop(websocket, None)
         _connection_iterator = None # 重置迭代器
         logger.info(f"[连接清理] 连接已移除: {websocket.remote_address}. 剩余活跃连接: {len(_active_connections)}")
 
@@ -237,13 +611,71 @@ async def handle_napcat_connection(websocket: ServerConnection):
 async def start_server():
     """
     [内部] 启动监听服务的主入口
+    监听地址变化 (配置热重载) 时只重建监听套接字，已建立的连接不受影响。
+    新地址绑定失败时退回原地址；都失败时每隔 _BIND_RETRY_INTERVAL 秒重试 (配置再次变化时立即重试)。
+    """
+    global _rebind_event
+    _rebind_event = asyncio.Event()
+    # 上一次成功监听的地址
+    bound: Optional[Tuple[str, int]] = None
+
+    while True:
+        host, port = config.NAPCAT_WS_HOST, config.NAPCAT_WS_PORT
+        server = await _bind(host, port)
+        if server is None and bound is not None and bound != (host, port):
+            logger.warning(f"[服务启动] 退回原监听地址 ws://{bound[0]}:{bound[1]}")
+            host, port = bound
+            server = await _bind(host, port)
+
+        if server is None:
+            try:
+                await asyncio.wait_for(_rebind_event.wait(), _BIND_RETRY_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            bound = (host, port)
+            logger.info("[服务已就绪] NapCat WebSocket 服务器开始监听。")
+            try:
+                # 一直运行，直到需要重新绑定监听地址
+                await _rebind_event.wait()
+            finally:
+                # 只关闭监听套接字，保留现有连接
+                server.close(close_connections=False)
+                # 等监听套接字真正关闭后再绑定新地址 (close 在后台任务中执行；
+                # 不用 wait_closed：它要等到全部现有连接断开)
+                while server.sockets:
+                    await asyncio.sleep(0)
+            if _accepting_inbound:
+                logger.info(f"[配置重载] 已停止监听 ws://{host}:{port}，正在切换到新地址...")
+
+        if not _accepting_inbound:
+            logger.info("[服务关闭] 已停止监听新的 NapCat 连接。")
+            return
+        _rebind_event.clear()
+
+
+async def _bind(host: str, port: int):
+    """
+    [内部] 在指定地址上开始监听，失败 (端口被占用 / 地址无效等) 时记录日志并返回 None
+    """
+    logger.info(f"[服务启动] 正在初始化 NapCat 监听: ws://{host}:{port}")
+    try:
+        # 连接参数 (压缩、max_size、缓冲水位、心跳) 来自配置
+        # 多进程模式下各进程共享同一端口 (SO_REUSEPORT)
+        return await serve(handle_napcat_connection, host, port, reuse_port=_reuse_port or None,
+                           **runtimeProfile.ws_options("napcat"))
+    except OSError as e:
+        logger.error(f"[服务启动] 无法监听 ws://{host}:{port}: {e}")
+        return None
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：仅当监听地址或连接参数变化时才重建监听套接字
+    Token 在每次握手时读取，无需额外处理。
     """
-    logger.info(f"[服务启动] 正在初始化 NapCat 监听: ws://{config.NAPCAT_WS_HOST}:{config.NAPCAT_WS_PORT}")
-    # 设置较高的 max_size 防止处理大图片数据包时报错
-    async with serve(handle_napcat_connection, config.NAPCAT_WS_HOST, config.NAPCAT_WS_PORT, max_size=2**24):
-        logger.info("[服务已就绪] NapCat WebSocket 服务器开始监听。")
-        # 创建一个永远处于 pending 状态的 Future，让服务一直运行下去
-        await asyncio.get_running_loop().create_future()
+    if changed & _LISTEN_SETTINGS and _rebind_event is not None:
+        _rebind_event.set()
 
 
 # 单元测试入口
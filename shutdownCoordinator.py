@@ -0,0 +1,138 @@
+# shutdownCoordinator.py
+import asyncio
+import logging
+import signal
+from typing import Callable, Awaitable, Optional, Dict, List, Tuple
+
+logger = logging.getLogger("Shutdown")
+
+# --- 类型定义 ---
+# 停止接收：同步函数，调用后不再接受新的入站工作
+StopHookType = Callable[[], None]
+# 排空：接收截止时间 (loop.time())，返回统计字典 {指标名: 数量}
+DrainHookType = Callable[[float], Awaitable[Dict[str, int]]]
+# 关闭：释放连接 / 资源
+CloseHookType = Callable[[], Awaitable[None]]
+
+# --- 全局状态管理 ---
+# 已注册的关闭参与者 [(名称, stop, drain, close)]
+_participants: List[Tuple[str, Optional[StopHookType], Optional[DrainHookType], Optional[CloseHookType]]] = []
+
+# 关闭请求事件 (由信号或业务代码触发)
+_shutdown_requested: Optional[asyncio.Event] = None
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def register_shutdown_participant(name: str,
+                                  stop_accepting: Optional[StopHookType] = None,
+                                  drain: Optional[DrainHookType] = None,
+                                  close: Optional[CloseHookType] = None):
+    """
+    [接口] 注册关闭流程参与者
+
+    关闭分三个阶段，每个阶段按注册顺序作用于所有参与者：
+    1. stop_accepting: 停止接收新的入站帧 / 新连接
+    2. drain: 在统一截止时间前并发排空在途工作，返回统计
+    3. close: 关闭连接
+    """
+    _participants.append((name, stop_accepting, drain, close))
+
+
+def request_shutdown(reason: str = "manual"):
+    """
+    [接口] 请求优雅关闭 (可重复调用)
+    """
+    event = _get_shutdown_event()
+    if not event.is_set():
+        logger.info(f"[关闭] 收到关闭请求 ({reason})，开始优雅关闭...")
+        event.set()
+
+
+def install_shutdown_signal_handlers(loop: asyncio.AbstractEventLoop):
+    """
+    [接口] 注册 SIGTERM / SIGINT：收到后触发优雅关闭
+    Windows 下不支持 add_signal_handler，仍由 KeyboardInterrupt 兜底。
+    """
+    for sig_name in ("SIGTERM", "SIGINT"):
+        sig = getattr(signal, sig_name, None)
+        if sig is None:
+            continue
+        try:
+            loop.add_signal_handler(sig, request_shutdown, sig_name)
+        except (NotImplementedError, RuntimeError) as e:
+            logger.debug(f"[关闭] 无法注册 {sig_name} 处理: {e}")
+
+
+async def wait_for_shutdown_request():
+    """
+    [接口] 等待关闭请求
+    """
+    await _get_shutdown_event().wait()
+
+
+async def run_graceful_shutdown(timeout: float) -> Dict[str, Dict[str, int]]:
+    """
+    [接口] 执行优雅关闭流程，并输出排空 / 丢弃报告
+
+    :param timeout: 排空阶段的总时限 (秒)
+    :return: {参与者名称: 统计字典}
+    """
+    loop = asyncio.get_running_loop()
+
+    # 1. 停止接收
+    for name, stop_accepting, _, _ in _participants:
+        if stop_accepting is None:
+            continue
+        try:
+            stop_accepting()
+        except Exception as e:
+            logger.error(f"[关闭] {name} 停止接收时出错: {e}", exc_info=True)
+
+    # 2. 并发排空 (共享同一个截止时间)
+    deadline = loop.time() + timeout
+    drainers = [(name, drain) for name, _, drain, _ in _participants if drain is not None]
+    results = await asyncio.gather(*(drain(deadline) for _, drain in drainers), return_exceptions=True)
+
+    report: Dict[str, Dict[str, int]] = {}
+    for (name, _), result in zip(drainers, results):
+        if isinstance(result, BaseException):
+            logger.error(f"[关闭] {name} 排空时出错: {result}")
+            continue
+        report[name] = result
+
+    # 3. 关闭连接
+    for name, _, _, close in _participants:
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception as e:
+            logger.error(f"[关闭] {name} 关闭时出错: {e}", exc_info=True)
+
+    _log_report(report)
+    return report
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _get_shutdown_event() -> asyncio.Event:
+    global _shutdown_requested
+    if _shutdown_requested is None:
+        _shutdown_requested = asyncio.Event()
+    return _shutdown_requested
+
+
+def _log_report(report: Dict[str, Dict[str, int]]):
+    """
+    [内部] 打印关闭报告
+    """
+    logger.info("[关闭报告] ----------------------------------------")
+    for name, stats in report.items():
+        detail = ", ".join(f"{key}={value}" for key, value in stats.items())
+        logger.info(f"[关闭报告] {name}: {detail or '无在途工作'}")
+    logger.info("[关闭报告] ----------------------------------------")
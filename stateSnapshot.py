@@ -0,0 +1,200 @@
+# stateSnapshot.py
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Callable, Optional, Dict, Any, List, Tuple
+
+import config
+
+logger = logging.getLogger("StateSnapshot")
+
+# ============================================================
+# 内存状态快照 (重启后热启动)
+# ============================================================
+# 说明：
+# - 各模块注册一个快照分区：导出函数返回 [(过期时间, 条目)]，恢复函数接收未过期的条目
+#   过期时间为墙上时间 (time.time())，None 表示不过期
+# - 关闭时与每 STATE_SNAPSHOT_INTERVAL 秒写入 STATE_SNAPSHOT_FILE
+#   (紧凑 JSON + gzip，先写临时文件再替换)
+# - 文件带格式版本号，各分区带各自的版本号；版本不一致的分区直接丢弃，不做迁移
+# - 启动时加载，已过期的条目跳过；整个文件超过 STATE_SNAPSHOT_MAX_AGE 秒时整体忽略
+# ============================================================
+
+# 文件格式版本 (修改文件结构时递增)
+_FORMAT_VERSION = 1
+
+# --- 类型定义 ---
+# 导出：返回 [(过期时间或 None, 可 JSON 序列化的条目)]
+SnapshotDumpType = Callable[[], List[Tuple[Optional[float], Any]]]
+# 恢复：接收未过期的条目 [(过期时间或 None, 条目)]
+SnapshotRestoreType = Callable[[List[Tuple[Optional[float], Any]]], None]
+
+# --- 全局状态管理 ---
+# 已注册的分区 {分区名: (版本, 导出, 恢复)}
+_sections: Dict[str, Tuple[int, SnapshotDumpType, SnapshotRestoreType]] = {}
+
+# 多进程模式下每个进程使用独立的快照文件 (文件名后缀)
+_instance_suffix = ""
+
+# 统计
+_snapshot_stats: Dict[str, Any] = {
+    "saves": 0, "save_failures": 0, "last_save_ms": None, "last_size": 0,
+    "restored": {}, "expired": 0,
+}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def register_snapshot_section(name: str, dump: SnapshotDumpType, restore: SnapshotRestoreType, version: int = 1):
+    """
+    [接口] 注册快照分区 (需在 load_snapshot 之前调用)
+
+    :param version: 分区格式版本，条目结构变化时递增 (旧文件中的该分区会被丢弃)
+    """
+    _sections[name] = (version, dump, restore)
+
+
+def set_instance_name(name: str):
+    """
+    [接口] 多进程模式：为本进程的快照文件名加上后缀
+    """
+    global _instance_suffix
+    _instance_suffix = f".{name}"
+
+
+def load_snapshot() -> int:
+    """
+    [接口] 加载快照并恢复各分区 (启动时调用)
+
+    :return: 恢复的条目数
+    """
+    if not config.STATE_SNAPSHOT_ENABLE:
+        return 0
+    path = _snapshot_path()
+    if not os.path.exists(path):
+        return 0
+
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            raw = json.loads(gzip.decompress(f.read()))
+    except (OSError, ValueError, EOFError) as e:
+        logger.error(f"[快照] 读取 {path} 失败，冷启动: {e}")
+        return 0
+
+    if raw.get("format") != _FORMAT_VERSION:
+        logger.warning(f"[快照] 文件格式版本 {raw.get('format')} 与当前 {_FORMAT_VERSION} 不一致，已忽略")
+        return 0
+    now = time.time()
+    age = now - raw.get("saved_at", 0)
+    if age > config.STATE_SNAPSHOT_MAX_AGE:
+        logger.info(f"[快照] 快照已保存 {age:.0f}s，超过 {config.STATE_SNAPSHOT_MAX_AGE}s，已忽略")
+        return 0
+
+    total = 0
+    for name, section in raw.get("sections", {}).items():
+        registered = _sections.get(name)
+        if registered is None:
+            continue
+        version, _, restore = registered
+        if section.get("version") != version:
+            logger.warning(f"[快照] 分区 {name} 版本 {section.get('version')} 与当前 {version} 不一致，已跳过")
+            continue
+
+        entries = [(expires, item) for expires, item in section.get("entries", [])
+                   if expires is None or expires > now]
+        _snapshot_stats["expired"] += len(section.get("entries", [])) - len(entries)
+        try:
+            restore(entries)
+        except Exception as e:
+            logger.error(f"[快照] 恢复分区 {name} 失败: {e}", exc_info=True)
+            continue
+        _snapshot_stats["restored"][name] = len(entries)
+        total += len(entries)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"[快照] 已恢复 {total} 条状态 (跳过过期 {_snapshot_stats['expired']} 条，"
+                f"快照保存于 {age:.0f}s 前，耗时 {elapsed_ms:.1f}ms)")
+    return total
+
+
+async def save_snapshot() -> bool:
+    """
+    [接口] 导出全部分区并写入快照文件 (导出在事件循环中完成，压缩与写入在线程中完成)
+    """
+    if not config.STATE_SNAPSHOT_ENABLE:
+        return True
+
+    started = time.perf_counter()
+    sections = {}
+    for name, (version, dump, _) in _sections.items():
+        try:
+            sections[name] = {"version": version, "entries": [list(entry) for entry in dump()]}
+        except Exception as e:
+            logger.error(f"[快照] 导出分区 {name} 失败: {e}", exc_info=True)
+    payload = json.dumps(
+        {"format": _FORMAT_VERSION, "saved_at": round(time.time(), 3), "sections": sections},
+        ensure_ascii=False, separators=(",", ":"),
+    )
+
+    try:
+        size = await asyncio.to_thread(_write_file, _snapshot_path(), payload)
+    except OSError as e:
+        _snapshot_stats["save_failures"] += 1
+        logger.error(f"[快照] 保存失败: {e}")
+        return False
+
+    _snapshot_stats["saves"] += 1
+    _snapshot_stats["last_save_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _snapshot_stats["last_size"] = size
+    return True
+
+
+async def run_snapshot_task():
+    """
+    [接口] 后台任务：每 STATE_SNAPSHOT_INTERVAL 秒保存一次快照
+    """
+    while True:
+        await asyncio.sleep(config.STATE_SNAPSHOT_INTERVAL)
+        await save_snapshot()
+
+
+async def close():
+    """
+    [接口] 关闭流程：保存最终快照 (需注册在各链路之后，以包含关闭时未送达的通知)
+    """
+    await save_snapshot()
+
+
+def get_snapshot_stats() -> Dict[str, Any]:
+    """
+    [接口] 快照统计 (保存次数、耗时、文件大小、各分区恢复条数)
+    """
+    stats = dict(_snapshot_stats)
+    stats["restored"] = dict(_snapshot_stats["restored"])
+    return stats
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _snapshot_path() -> str:
+    return config.STATE_SNAPSHOT_FILE + _instance_suffix
+
+
+def _write_file(path: str, payload: str) -> int:
+    """
+    [内部] 压缩并原子写入 (先写临时文件再替换)，返回文件大小
+    """
+    data = gzip.compress(payload.encode("utf-8"), compresslevel=6)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
@@ -0,0 +1,257 @@
+# statusBoard.py
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+import config
+from server4NapCat import call_napcat_api
+
+logger = logging.getLogger("StatusBoard")
+
+# ============================================================
+# QQ 群实时状态 (在线人数 / 各服务器在线玩家)
+# ============================================================
+# 说明：
+# - 在线名单由 player_join / player_quit 事件增量维护，不轮询 MC 服务器
+#   (中枢启动前已在线的玩家要等其重新进服后才会计入)
+# - 与 MC 插件的连接断开 (含服务器重启) 时清空名单：断线期间的退出事件无法得知
+# - 名单变化后等待 STATUS_BOARD_DEBOUNCE 秒合并后续变化，再渲染状态文本；
+#   与上次发布的文本相同 (如短时间内进出服) 时不调用 API
+# - 两次发布至少间隔 STATUS_BOARD_MIN_INTERVAL 秒；发布失败时按指数退避重试
+# - 发布方式 (STATUS_BOARD_MODE)：
+#     card   : 修改机器人自己的群名片，如 "MC 在线 3 人" (不打扰群成员)
+#     notice : 发布群公告 (完整名单)，发布成功后删除上一条状态公告
+# - 需要 NAPCAT_ENABLE_ECHO (需要获取机器人 QQ 号与公告 ID)
+# ============================================================
+
+MODE_CARD = "card"
+MODE_NOTICE = "notice"
+
+# 每个服务器最多列出的玩家名
+_MAX_LISTED = 20
+
+# 发布失败后的重试间隔 (秒，指数退避)
+_RETRY_MIN = 10
+_RETRY_MAX = 600
+
+# --- 全局状态管理 ---
+# 在线玩家 {服务器名: {玩家标识: 玩家名}}
+_online: Dict[str, Dict[str, str]] = {}
+
+# 名单发生变化 (由发布任务消费)
+_changed = asyncio.Event()
+
+# 上次成功发布的文本 / 时间 (time.monotonic())
+_last_published: Optional[str] = None
+_last_publish_at = 0.0
+# notice 模式：上一条状态公告的 ID
+_notice_id: Optional[str] = None
+# 机器人 QQ 号 (首次发布时获取)
+_self_id: Optional[int] = None
+
+# 统计
+_board_stats: Dict[str, int] = {"events": 0, "renders": 0, "published": 0, "unchanged": 0, "failures": 0}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def record_event(event: Dict[str, Any]):
+    """
+    [接口] 按 player_join / player_quit 事件更新在线名单
+    """
+    key = event.get("player_uuid") or event.get("player_nickname")
+    if not key:
+        return
+    server = event.get("server_name") or "服务器"
+    players = _online.setdefault(server, {})
+    _board_stats["events"] += 1
+
+    if event.get("sub_type") == "player_join":
+        if players.get(key) == event.get("player_nickname"):
+            return
+        players[key] = event.get("player_nickname") or str(key)
+    elif players.pop(key, None) is None:
+        # 中枢启动前就已在线的玩家退出，名单不变
+        return
+    _changed.set()
+
+
+def reset_online():
+    """
+    [接口] 清空在线名单 (MC 插件连接断开时调用)
+    """
+    if any(_online.values()):
+        logger.info(f"[状态] MC 连接已断开，清空在线名单 ({online_count()} 人)")
+        _changed.set()
+    _online.clear()
+
+
+def online_count() -> int:
+    """
+    [接口] 当前在线总人数
+    """
+    return sum(len(players) for players in _online.values())
+
+
+def render_status() -> str:
+    """
+    [接口] 渲染完整状态文本 (各服务器在线玩家)
+    """
+    lines = [f"🟢 MC 在线 {online_count()} 人"]
+    for server in sorted(_online):
+        names = sorted(_online[server].values())
+        listed = "、".join(names[:_MAX_LISTED])
+        if len(names) > _MAX_LISTED:
+            listed += f" 等 {len(names)} 人"
+        lines.append(f"[{server}] {len(names)} 人" + (f": {listed}" if names else ""))
+    return "\n".join(lines)
+
+
+async def run_status_board_task():
+    """
+    [接口] 后台任务：名单变化时防抖合并，渲染结果变化时才发布
+    """
+    logger.info(f"[状态] 群状态已启用 (模式 {config.STATUS_BOARD_MODE}，防抖 {config.STATUS_BOARD_DEBOUNCE}s)")
+    retry_delay = _RETRY_MIN
+    while True:
+        await _changed.wait()
+        # 合并防抖窗口内的全部变化
+        await asyncio.sleep(config.STATUS_BOARD_DEBOUNCE)
+        # 距上次发布不足最小间隔时继续等待 (期间的变化一并合并)
+        wait = _last_publish_at + config.STATUS_BOARD_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _changed.clear()
+        if await _publish_if_changed():
+            retry_delay = _RETRY_MIN
+            continue
+        # 发布失败：退避后重试 (期间的名单变化一并合并)
+        _changed.set()
+        await asyncio.sleep(retry_delay)
+        retry_delay = min(retry_delay * 2, _RETRY_MAX)
+
+
+def get_board_stats() -> Dict[str, Any]:
+    """
+    [接口] 状态发布统计
+    """
+    stats: Dict[str, Any] = dict(_board_stats)
+    stats["online"] = online_count()
+    stats["servers"] = len(_online)
+    return stats
+
+
+def dump_snapshot() -> List[Tuple[None, Dict[str, Any]]]:
+    """
+    [接口] 状态快照：导出上次发布的文本与公告 ID (重启后不重复发布相同内容)
+    在线名单不导出：中枢停止期间的进出服无法得知
+    """
+    if _last_published is None:
+        return []
+    return [(None, {"published": _last_published, "notice_id": _notice_id})]
+
+
+def restore_snapshot(entries: List[Tuple[None, Dict[str, Any]]]):
+    """
+    [接口] 状态快照：恢复上次发布的文本与公告 ID
+    """
+    global _last_published, _notice_id
+    for _, item in entries:
+        _last_published = item.get("published")
+        _notice_id = item.get("notice_id")
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+async def _publish_if_changed() -> bool:
+    """
+    [内部] 渲染并与上次发布的文本比较，不同才调用 API；发布失败时返回 False
+    """
+    global _last_published, _last_publish_at
+
+    _board_stats["renders"] += 1
+    if config.STATUS_BOARD_MODE == MODE_NOTICE:
+        text = render_status()
+    else:
+        text = config.STATUS_BOARD_CARD_FORMAT.format(online=online_count())
+    if text == _last_published:
+        _board_stats["unchanged"] += 1
+        return True
+
+    try:
+        if config.STATUS_BOARD_MODE == MODE_NOTICE:
+            await _publish_notice(text)
+        else:
+            await _publish_card(text)
+    except Exception as e:
+        _board_stats["failures"] += 1
+        logger.warning(f"[状态] 发布群状态失败: {e}")
+        return False
+
+    _last_published = text
+    _last_publish_at = time.monotonic()
+    _board_stats["published"] += 1
+    logger.debug(f"[状态] 已发布群状态: {text.splitlines()[0]}")
+    return True
+
+
+async def _call(action: str, params: Dict[str, Any]) -> Any:
+    """
+    [内部] 调用 NapCat API，失败 (retcode != 0) 时抛出 RuntimeError
+    """
+    resp = await call_napcat_api(action, params, timeout=5.0)
+    if resp.get("retcode", 0) != 0:
+        raise RuntimeError(f"{action}: {resp.get('message') or resp.get('wording') or resp.get('retcode')}")
+    return resp.get("data")
+
+
+async def _get_self_id() -> int:
+    global _self_id
+    if _self_id is None:
+        _self_id = int((await _call("get_login_info", {}))["user_id"])
+    return _self_id
+
+
+async def _publish_card(text: str):
+    """
+    [内部] card 模式：修改机器人自己的群名片
+    """
+    await _call("set_group_card", {
+        "group_id": config.TARGET_QQ_GROUP_ID,
+        "user_id": await _get_self_id(),
+        "card": text,
+    })
+
+
+async def _publish_notice(text: str):
+    """
+    [内部] notice 模式：先发布新公告并记录其 ID，成功后再删除上一条状态公告
+    (发布失败时旧公告保留，群内不会出现没有状态公告的空档)
+    """
+    global _notice_id
+    group_id = config.TARGET_QQ_GROUP_ID
+    old_id = _notice_id
+
+    await _call("_send_group_notice", {"group_id": group_id, "content": text})
+
+    # 发布接口不返回公告 ID，从公告列表中找回 (找不到时下次不删除，新公告已发布不影响本次结果)
+    _notice_id = None
+    try:
+        self_id = await _get_self_id()
+        for notice in await _call("_get_group_notice", {"group_id": group_id}) or []:
+            if notice.get("sender_id") == self_id and (notice.get("message") or {}).get("text") == text:
+                _notice_id = notice.get("notice_id")
+                break
+    except Exception as e:
+        logger.debug(f"[状态] 获取新公告 ID 失败: {e}")
+
+    if old_id and old_id != _notice_id:
+        try:
+            await _call("_del_group_notice", {"group_id": group_id, "notice_id": old_id})
+        except Exception as e:
+            logger.debug(f"[状态] 删除旧公告失败 (可能已被手动删除): {e}")
@@ -0,0 +1,208 @@
+# textComponent.py
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Optional, Dict, Any, Set
+
+import config
+from mcTranslator import translate
+
+logger = logging.getLogger("TextComponent")
+
+# ============================================================
+# Minecraft JSON 文本组件 → QQ 纯文本
+# ============================================================
+# 说明：
+# - 部分 Mod / 插件服务端的聊天内容是 JSON 文本组件字符串
+#   (text / translate + with / extra 任意嵌套)，直接转发会在 QQ 中出现原始 JSON
+# - 快速路径：首字符不是 { [ " 的字符串视为纯文本，不做 JSON 解析
+# - 组件用显式栈展开，不受 Python 递归深度限制；解析失败时原样返回
+# - 展开结果按原始 JSON 字符串做 LRU 缓存 (服务器前缀、称号等会反复出现)
+# ============================================================
+
+# 旧式格式代码 (§a / §l / §r 等)
+_LEGACY_FORMAT = re.compile(r"§[0-9a-fk-orx]", re.IGNORECASE)
+
+# 展开时最多处理的组件节点数，防止异常数据占用事件循环
+_MAX_NODES = 2048
+
+# --- 全局状态管理 ---
+# 带 LRU 缓存的展开函数 (按 MC_COMPONENT_CACHE_SIZE 重建)
+_flatten_cached = None
+
+# 统计
+_component_stats: Dict[str, int] = {"plain": 0, "parsed": 0, "invalid": 0}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def flatten_text(value: Any, parse_json: bool = True) -> str:
+    """
+    [接口] 将聊天内容 (纯文本 / JSON 文本组件字符串 / 已解析的组件) 转为 QQ 纯文本
+
+    :param parse_json: 为 False 时字符串一律按纯文本处理 (如玩家输入的普通聊天，内容恰好是合法 JSON 也不展开)
+    :return: 展开后的文本，旧式格式代码已去除
+    """
+    if value is None:
+        return ""
+
+    if not isinstance(value, str):
+        return _strip_legacy(_flatten_component(value))
+
+    # 快速路径：不可能是 JSON 的字符串
+    head = value[:1]
+    if head.isspace():
+        head = value.lstrip()[:1]
+    if not parse_json or head not in ("{", "[", '"'):
+        _component_stats["plain"] += 1
+        return _strip_legacy(value)
+
+    if _flatten_cached is None:
+        return _flatten_json(value)
+    return _flatten_cached(value)
+
+
+def get_component_stats() -> Dict[str, Any]:
+    """
+    [接口] 展开统计 (快速路径 / 解析 / 非法 JSON 次数与缓存命中)
+    """
+    stats: Dict[str, Any] = dict(_component_stats)
+    info = _flatten_cached.cache_info() if _flatten_cached else None
+    stats["cache_hits"] = info.hits if info else 0
+    stats["cache_size"] = info.currsize if info else 0
+    return stats
+
+
+def rebuild_cache():
+    """
+    [接口] 按当前配置重建展开缓存
+    """
+    global _flatten_cached
+    _flatten_cached = lru_cache(maxsize=config.MC_COMPONENT_CACHE_SIZE)(_flatten_json)
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：缓存大小或语言文件变化时清空重建缓存
+    """
+    if changed & {"MC_COMPONENT_CACHE_SIZE", "MC_LANG_FILE"}:
+        rebuild_cache()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _strip_legacy(text: str) -> str:
+    """
+    [内部] 去除旧式格式代码
+    """
+    if "§" not in text:
+        return text
+    return _LEGACY_FORMAT.sub("", text)
+
+
+def _flatten_json(raw: str) -> str:
+    """
+    [内部] 解析 JSON 文本组件字符串并展开 (被 LRU 缓存包装)
+    """
+    try:
+        component = json.loads(raw)
+    except ValueError:
+        # 以 { [ " 开头但不是合法 JSON：当作普通文本
+        _component_stats["invalid"] += 1
+        return _strip_legacy(raw)
+
+    _component_stats["parsed"] += 1
+    return _strip_legacy(_flatten_component(component))
+
+
+def _flatten_component(component: Any) -> str:
+    """
+    [内部] 用显式栈按文档顺序展开组件树
+    """
+    parts = []
+    # 栈中元素为待处理的组件；为保证顺序，子节点逆序入栈
+    stack = [component]
+    nodes = 0
+
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if nodes > _MAX_NODES:
+            logger.warning(f"[文本组件] 组件节点超过 {_MAX_NODES} 个，已截断")
+            break
+
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            if node is not None:
+                parts.append(str(node))
+            continue
+
+        children = list(node.get("extra") or [])
+        url = _click_url(node)
+        if url:
+            # 轻量格式：链接以 "文本 (网址)" 形式保留
+            children.append(f" ({url})")
+
+        text = _node_text(node)
+        if text is None:
+            # 未知翻译 key：保留参数内容 (以空格连接)，参数与 extra 一样入栈展开并计入节点数
+            args = node["with"] if isinstance(node["with"], list) else [node["with"]]
+            children[:0] = [part for arg in args for part in (" ", arg)][1:]
+            text = ""
+
+        stack.extend(reversed(children))
+        parts.append(text)
+
+    return "".join(parts)
+
+
+def _node_text(node: Dict[str, Any]) -> Optional[str]:
+    """
+    [内部] 单个组件节点自身的文本 (不含 extra)；未知翻译 key 且带参数时返回 None，由调用方展开参数
+    """
+    if "text" in node:
+        return str(node["text"])
+
+    if "translate" in node:
+        key = node["translate"]
+        args = node.get("with") or []
+        text = translate(key, args)
+        if text is not None:
+            return text
+        if node.get("fallback"):
+            return str(node["fallback"])
+        # 未知 key：保留参数内容，比显示 key 本身更可读
+        if args:
+            return None
+        return str(key)
+
+    if "keybind" in node:
+        return f"[{node['keybind']}]"
+    if "selector" in node:
+        return str(node["selector"])
+    if "score" in node and isinstance(node["score"], dict):
+        return str(node["score"].get("value") or node["score"].get("name") or "")
+    return ""
+
+
+def _click_url(node: Dict[str, Any]) -> Optional[str]:
+    """
+    [内部] 提取 open_url 点击事件的链接 (兼容 clickEvent / click_event 两种写法)
+    """
+    click = node.get("clickEvent") or node.get("click_event")
+    if not isinstance(click, dict) or click.get("action") != "open_url":
+        return None
+    url = click.get("value") or click.get("url")
+    if not url or url == node.get("text"):
+        return None
+    return str(url)
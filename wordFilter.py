@@ -0,0 +1,239 @@
+# wordFilter.py
+import logging
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import config
+
+logger = logging.getLogger("WordFilter")
+
+# ============================================================
+# 敏感词过滤 (Aho–Corasick 多模式匹配自动机)
+# ============================================================
+# 说明：
+# - 词表编译为一个自动机，单条消息的匹配开销只与消息长度 (及命中数) 有关，
+#   与词表大小无关
+# - 词表文件每行一个词，可用 "词|动作" 指定动作，# 开头为注释
+# - 动作：mask (替换为掩码) / block (整条拦截) / flag (仅记录)
+#   同一条消息命中多个词时，按 block > mask > flag 取最严重的动作
+# ============================================================
+
+ACTION_PASS = "pass"
+ACTION_FLAG = "flag"
+ACTION_MASK = "mask"
+ACTION_BLOCK = "block"
+
+# 动作严重程度 (数值越大越严重)
+_SEVERITY = {ACTION_PASS: 0, ACTION_FLAG: 1, ACTION_MASK: 2, ACTION_BLOCK: 3}
+
+
+class _Automaton:
+    """
+    [内部] 已编译的自动机 (构建后只读，重载时整体替换)
+    """
+    __slots__ = ("goto", "fail", "output", "dict_link", "word_count")
+
+    def __init__(self, words: Dict[str, str]):
+        # 节点 i 的转移表 {字符: 子节点}
+        self.goto: List[Dict[str, int]] = [{}]
+        # 失配指针
+        self.fail: List[int] = [0]
+        # 以节点 i 结尾的词 (长度, 动作)，无则为 None
+        self.output: List[Optional[Tuple[int, str]]] = [None]
+        # 沿失配链最近的一个有输出的节点 (字典后缀链接)，无则为 0
+        self.dict_link: List[int] = [0]
+        self.word_count = len(words)
+
+        for word, action in words.items():
+            node = 0
+            for ch in word:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.dict_link.append(0)
+                node = nxt
+            self.output[node] = (len(word), action)
+
+        # BFS 构建失配指针与字典后缀链接
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                fail_node = self.fail[child]
+                self.dict_link[child] = fail_node if self.output[fail_node] else self.dict_link[fail_node]
+
+    def scan(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        扫描文本，返回所有命中 [(起始下标, 结束下标, 动作)]
+        """
+        goto, fail, output, dict_link = self.goto, self.fail, self.output, self.dict_link
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            out_node = node if output[node] else dict_link[node]
+            while out_node:
+                length, action = output[out_node]
+                hits.append((i + 1 - length, i + 1, action))
+                out_node = dict_link[out_node]
+        return hits
+
+
+# --- 全局状态管理 ---
+# 当前生效的自动机 (未启用或词表为空时为 None)
+_automaton: Optional[_Automaton] = None
+
+# 统计 {动作: 次数}
+_filter_stats: Dict[str, int] = {ACTION_FLAG: 0, ACTION_MASK: 0, ACTION_BLOCK: 0}
+
+# 与过滤器相关的配置项 (变化时重建自动机)
+_FILTER_SETTINGS = {"WORD_FILTER_ENABLE", "WORD_FILTER_FILE", "WORD_FILTER_DEFAULT_ACTION"}
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def load_word_list() -> bool:
+    """
+    [接口] 从 WORD_FILTER_FILE 编译词表并原子替换当前自动机
+
+    :return: 是否加载成功 (失败时保留旧自动机)
+    """
+    global _automaton
+
+    if not config.WORD_FILTER_ENABLE:
+        _automaton = None
+        return True
+
+    try:
+        words = _read_word_file(config.WORD_FILTER_FILE, config.WORD_FILTER_DEFAULT_ACTION)
+    except (OSError, ValueError) as e:
+        logger.error(f"[敏感词] 加载词表失败，继续使用旧词表: {e}")
+        return False
+
+    _automaton = _Automaton(words) if words else None
+    logger.info(f"[敏感词] 词表已加载: {len(words)} 个词 ({config.WORD_FILTER_FILE})")
+    return True
+
+
+def filter_text(text: str) -> Tuple[str, str]:
+    """
+    [接口] 过滤一段文本
+
+    :return: (动作, 处理后的文本)；动作为 block 时调用方应丢弃整条消息
+    """
+    automaton = _automaton
+    if automaton is None or not text:
+        return ACTION_PASS, text
+
+    # 大小写不敏感匹配；lower() 改变长度的极少数字符下退回原文匹配，保证下标对齐
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = text
+
+    hits = automaton.scan(lowered)
+    if not hits:
+        return ACTION_PASS, text
+
+    action = max((hit[2] for hit in hits), key=_SEVERITY.__getitem__)
+    _filter_stats[action] += 1
+
+    if action == ACTION_MASK:
+        text = _mask(text, hits)
+    if action != ACTION_BLOCK and any(hit[2] == ACTION_FLAG for hit in hits):
+        words = {lowered[start:end] for start, end, hit_action in hits if hit_action == ACTION_FLAG}
+        logger.warning(f"[敏感词] 消息命中标记词: {', '.join(sorted(words))}")
+    return action, text
+
+
+def get_filter_stats() -> Dict[str, int]:
+    """
+    [接口] 获取过滤统计 (含当前词表大小)
+    """
+    stats = dict(_filter_stats)
+    stats["words"] = _automaton.word_count if _automaton else 0
+    return stats
+
+
+def word_file_path() -> str:
+    """
+    [接口] 当前词表文件路径 (供文件监视使用)
+    """
+    return config.WORD_FILTER_FILE
+
+
+def apply_config_reload(_prepared, changed: Set[str]):
+    """
+    [接口] 配置热重载 (生效阶段)：过滤相关配置变化时重建自动机
+    """
+    if changed & _FILTER_SETTINGS:
+        load_word_list()
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _read_word_file(path: str, default_action: str) -> Dict[str, str]:
+    """
+    [内部] 读取词表文件 {词(小写): 动作}
+    """
+    if default_action not in _SEVERITY or default_action == ACTION_PASS:
+        raise ValueError(f"Invalid WORD_FILTER_DEFAULT_ACTION: {default_action!r}")
+    if not os.path.exists(path):
+        raise OSError(f"Word list file not found: {path}")
+
+    words: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            word, sep, action = line.rpartition("|")
+            if not sep:
+                word, action = action, default_action
+            word = word.strip().lower()
+            action = action.strip().lower()
+            if action not in _SEVERITY or action == ACTION_PASS:
+                raise ValueError(f"{path}:{line_no}: unknown action {action!r}")
+            if not word:
+                continue
+            # 同一个词出现多次时取更严重的动作
+            if _SEVERITY[action] > _SEVERITY.get(words.get(word, ACTION_PASS), 0):
+                words[word] = action
+    return words
+
+
+def _mask(text: str, hits: List[Tuple[int, int, str]]) -> str:
+    """
+    [内部] 将 mask 命中区间替换为掩码 (差分数组标记，避免逐词切片)
+    """
+    cover = [0] * (len(text) + 1)
+    for start, end, action in hits:
+        if action == ACTION_MASK:
+            cover[start] += 1
+            cover[end] -= 1
+
+    mask_char = config.WORD_FILTER_MASK_CHAR
+    chars = []
+    depth = 0
+    for i, ch in enumerate(text):
+        depth += cover[i]
+        chars.append(mask_char if depth > 0 else ch)
+    return "".join(chars)
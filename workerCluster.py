@@ -0,0 +1,544 @@
+# workerCluster.py
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+from typing import Callable, Awaitable, Optional, Dict, Any, List, Set, Tuple
+
+import config
+import server4NapCat
+import client4McPlugin
+from commandRouter import match_command
+
+logger = logging.getLogger("WorkerCluster")
+
+# ============================================================
+# 多进程模式 (NAPCAT_WORKERS > 1)
+# ============================================================
+# 说明：
+# - 监督进程启动 NAPCAT_WORKERS 个 main.py 子进程，异常退出的子进程会被自动重启
+#   (连续异常退出时重启间隔按指数退避)；收到终止信号后转发 SIGTERM，
+#   超过 SHUTDOWN_DRAIN_TIMEOUT + _KILL_MARGIN 秒仍未退出的子进程用 SIGKILL 结束
+# - 所有子进程通过 SO_REUSEPORT 共享 NapCat 监听端口，由内核把连接分配到各进程；
+#   每个进程独立完成 JSON 解析、消息段转换、过滤、模板渲染等工作
+# - 0 号进程 (primary) 独占 McPlugin 连接；其余进程 (worker) 通过本地 Unix 套接字
+#   把发往 MC 的通知 / API 调用，以及群命令 (依赖玩家统计等进程内状态) 转交给 primary
+# - primary 自身没有 NapCat 连接时，MC → QQ 的消息转交给持有连接的 worker
+# - IPC 帧格式：4 字节长度 + 1 字节帧类型 + 紧凑 JSON
+# - 仅支持 Linux / macOS (需要 SO_REUSEPORT 与 Unix 套接字)
+# ============================================================
+
+ROLE_SINGLE = "single"
+ROLE_PRIMARY = "primary"
+ROLE_WORKER = "worker"
+
+# 子进程的角色 / 序号通过环境变量传递
+_ROLE_ENV = "LINKMC_ROLE"
+_INDEX_ENV = "LINKMC_WORKER_INDEX"
+
+# 帧头：正文长度 (不含帧头) + 帧类型
+_HEADER = struct.Struct("!IB")
+# 单帧正文上限 (字节)，超过视为协议错误并断开
+_MAX_FRAME = 2**26
+
+# 帧类型
+FRAME_STATUS = 1         # worker → primary  {"napcat": NapCat 连接数}
+FRAME_MC_NOTIFY = 2      # worker → primary  {"kind", "kwargs"}
+FRAME_MC_CALL = 3        # worker → primary  {"id", "kind", "params", "timeout"}
+FRAME_QQ_EVENT = 4       # worker → primary  {"data"}
+FRAME_NAPCAT_NOTIFY = 5  # primary → worker  {"payload"}
+FRAME_NAPCAT_CALL = 6    # primary → worker  {"id", "action", "params", "timeout"}
+FRAME_RESULT = 7         # 双向              {"id", "ok", "data" | "error"}
+
+_FRAME_NAMES = {
+    FRAME_STATUS: "status", FRAME_MC_NOTIFY: "mc_notify", FRAME_MC_CALL: "mc_call",
+    FRAME_QQ_EVENT: "qq_event", FRAME_NAPCAT_NOTIFY: "napcat_notify",
+    FRAME_NAPCAT_CALL: "napcat_call", FRAME_RESULT: "result",
+}
+
+# 不等待处理完成的通知类帧 (在独立任务中处理，不保证顺序)：
+# 群命令可能执行 RCON / MC API 调用 (数秒)，不能阻塞同一 worker 后续的聊天通知与 RESULT 帧
+_BACKGROUND_FRAMES = {FRAME_QQ_EVENT}
+
+# 子进程异常退出后的重启间隔 (秒)：连续异常退出时每次翻倍，最长 _RESTART_MAX_DELAY
+_RESTART_DELAY = 3.0
+_RESTART_MAX_DELAY = 120.0
+# 运行超过该时长 (秒) 后退出不算连续异常退出，重启间隔恢复为 _RESTART_DELAY
+_STABLE_UPTIME = 60.0
+# 转发 SIGTERM 后，在子进程自身的关闭时限之外再等待的时间 (秒)，之后 SIGKILL
+_KILL_MARGIN = 5.0
+# worker 上报 NapCat 连接数 / 重连 primary 的间隔 (秒)
+_STATUS_INTERVAL = 1.0
+
+# 帧处理函数：接收 (对端, 正文)，返回值作为 RESULT 的 data (仅带 id 的请求)
+FrameHandlerType = Callable[["_Peer", Dict[str, Any]], Awaitable[Any]]
+
+# --- 全局状态管理 ---
+# 本进程的 QQ 消息业务回调 (primary 用它处理 worker 转交的群命令)
+_qq_handler: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+# primary：已连接的 worker
+_workers: List["_Peer"] = []
+_worker_cursor = itertools.count()
+_ipc_server: Optional[asyncio.AbstractServer] = None
+# worker：到 primary 的连接 (未连接时为 None)
+_primary: Optional["_Peer"] = None
+
+# 统计 {方向: {帧类型名: 数量}}
+_frame_stats: Dict[str, Dict[str, int]] = {"sent": {}, "received": {}}
+_byte_stats: Dict[str, int] = {"sent": 0, "received": 0}
+
+
+# ==========================================
+# 帧编码
+# ==========================================
+
+def encode_frame(frame_type: int, body: Dict[str, Any]) -> bytes:
+    """
+    [接口] 编码一帧 (正文为紧凑 JSON)
+    """
+    data = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(data), frame_type) + data
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
+    """
+    [接口] 读取一帧
+
+    :raises asyncio.IncompleteReadError: 连接已关闭
+    :raises ValueError: 帧长度超限
+    """
+    length, frame_type = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if length > _MAX_FRAME:
+        raise ValueError(f"IPC frame too large: {length} bytes")
+    body = json.loads(await reader.readexactly(length))
+    _count_frame("received", frame_type, _HEADER.size + length)
+    return frame_type, body
+
+
+class _Peer:
+    """
+    [内部] IPC 连接的一端：发送帧、匹配请求与响应、分派收到的帧
+    """
+
+    def __init__(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        # 对端 (worker) 当前持有的 NapCat 连接数
+        self.napcat_connections = 0
+        self._seq = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        # 请求与后台帧的处理任务 (保持引用，防止被回收)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def send(self, frame_type: int, body: Dict[str, Any]):
+        frame = encode_frame(frame_type, body)
+        self.writer.write(frame)
+        _count_frame("sent", frame_type, len(frame))
+        await self.writer.drain()
+
+    async def call(self, frame_type: int, body: Dict[str, Any], timeout: float) -> Any:
+        """
+        发送请求并等待对端的 RESULT 帧；对端执行失败时抛出 ConnectionError
+        """
+        request_id = next(self._seq)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self.send(frame_type, {**body, "id": request_id, "timeout": timeout})
+            # 对端自己也有超时，这里多等一点以便拿到对端的错误信息
+            result = await asyncio.wait_for(future, timeout + 1.0)
+        finally:
+            self._pending.pop(request_id, None)
+        if not result.get("ok"):
+            raise ConnectionError(f"{self.name}: {result.get('error')}")
+        return result.get("data")
+
+    async def serve(self, handlers: Dict[int, FrameHandlerType]):
+        """
+        读取并分派帧直到连接关闭。
+        通知类帧按顺序逐条处理 (保持消息顺序)；带 id 的请求与 _BACKGROUND_FRAMES 在独立任务中处理，避免阻塞读取
+        """
+        try:
+            while True:
+                frame_type, body = await read_frame(self.reader)
+
+                if frame_type == FRAME_RESULT:
+                    future = self._pending.get(body.get("id"))
+                    if future is not None and not future.done():
+                        future.set_result(body)
+                    continue
+
+                handler = handlers.get(frame_type)
+                if handler is None:
+                    logger.warning(f"[IPC] {self.name} 发来未知帧类型 {frame_type}，已忽略")
+                elif "id" in body:
+                    self._spawn(self._answer(handler, body))
+                elif frame_type in _BACKGROUND_FRAMES:
+                    self._spawn(self._handle(frame_type, handler, body))
+                else:
+                    await self._handle(frame_type, handler, body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as e:
+            logger.error(f"[IPC] {self.name} 协议错误，断开连接: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"IPC connection to {self.name} closed"))
+            self.writer.close()
+
+    def _spawn(self, coro: Awaitable[None]):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, frame_type: int, handler: FrameHandlerType, body: Dict[str, Any]):
+        try:
+            await handler(self, body)
+        except Exception as e:
+            logger.error(f"[IPC] 处理 {_FRAME_NAMES.get(frame_type)} 帧出错: {e}", exc_info=True)
+
+    async def _answer(self, handler: FrameHandlerType, body: Dict[str, Any]):
+        try:
+            result = {"id": body["id"], "ok": True, "data": await handler(self, body)}
+        except Exception as e:
+            result = {"id": body["id"], "ok": False, "error": f"{type(e).__name__}: {e}"}
+        try:
+            await self.send(FRAME_RESULT, result)
+        except Exception:
+            pass
+
+
+# ==========================================
+# 对外公共接口 (Public API)
+# ==========================================
+
+def current_role() -> str:
+    """
+    [接口] 本进程的角色：single (单进程) / primary / worker
+    """
+    return os.environ.get(_ROLE_ENV, ROLE_SINGLE)
+
+
+def worker_index() -> int:
+    return int(os.environ.get(_INDEX_ENV, "0"))
+
+
+def should_supervise() -> bool:
+    """
+    [接口] 是否以监督进程方式启动 (NAPCAT_WORKERS > 1 且平台支持)
+    """
+    if config.NAPCAT_WORKERS <= 1 or current_role() != ROLE_SINGLE:
+        return False
+    if sys.platform == "win32" or not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning("[多进程] 当前平台不支持 SO_REUSEPORT / Unix 套接字，回退为单进程模式")
+        return False
+    return True
+
+
+def run_supervisor():
+    """
+    [接口] 监督进程主循环 (同步)：启动子进程，转发终止信号，重启异常退出的子进程
+    """
+    count = config.NAPCAT_WORKERS
+    stopping = False
+    # 转发 SIGTERM 后强制结束子进程的时间点
+    kill_at: Optional[float] = None
+    procs: List[subprocess.Popen] = []
+    restart_at: Dict[int, float] = {}
+    # 各子进程的启动时间 / 连续异常退出次数
+    started_at: Dict[int, float] = {}
+    failures: Dict[int, int] = {}
+
+    def spawn(index: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        env[_ROLE_ENV] = ROLE_PRIMARY if index == 0 else ROLE_WORKER
+        env[_INDEX_ENV] = str(index)
+        started_at[index] = time.monotonic()
+        return subprocess.Popen([sys.executable] + sys.argv, env=env)
+
+    def on_signal(signum, _frame):
+        nonlocal stopping, kill_at
+        stopping = True
+        if kill_at is None:
+            kill_at = time.monotonic() + config.SHUTDOWN_DRAIN_TIMEOUT + _KILL_MARGIN
+        for proc in procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    logger.info(f"[多进程] 监督进程启动 {count} 个子进程 (0 号负责 McPlugin 连接)")
+    procs.extend(spawn(i) for i in range(count))
+
+    while True:
+        time.sleep(0.5)
+        now = time.monotonic()
+        alive = 0
+        for index, proc in enumerate(procs):
+            code = proc.poll()
+            if code is None:
+                alive += 1
+                continue
+            if stopping:
+                continue
+            if index not in restart_at:
+                if now - started_at[index] >= _STABLE_UPTIME:
+                    failures[index] = 0
+                failures[index] = failures.get(index, 0) + 1
+                delay = min(_RESTART_DELAY * 2 ** (failures[index] - 1), _RESTART_MAX_DELAY)
+                logger.warning(f"[多进程] {index} 号进程异常退出 (code={code}，连续 {failures[index]} 次)，"
+                               f"{delay:g}s 后重启")
+                restart_at[index] = now + delay
+            elif now >= restart_at[index]:
+                del restart_at[index]
+                procs[index] = spawn(index)
+                alive += 1
+        if stopping and not alive:
+            break
+        if stopping and kill_at is not None and now >= kill_at:
+            for index, proc in enumerate(procs):
+                if proc.poll() is None:
+                    logger.warning(f"[多进程] {index} 号进程超过关闭时限仍未退出，强制结束 (SIGKILL)")
+                    proc.kill()
+            kill_at = None
+    logger.info("[多进程] 所有子进程已退出。")
+
+
+def wrap_napcat_handler(handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> Callable[[Dict[str, Any]], Awaitable[None]]:
+    """
+    [接口] 包装 QQ 消息业务回调：worker 进程把群命令转交给 primary，其余消息在本进程处理
+    """
+    global _qq_handler
+    _qq_handler = handler
+    if current_role() != ROLE_WORKER:
+        return handler
+
+    async def wrapped(data: Dict[str, Any]):
+        if _primary is not None and _is_group_command(data):
+            try:
+                await _primary.send(FRAME_QQ_EVENT, {"data": data})
+                return
+            except Exception as e:
+                logger.warning(f"[多进程] 群命令转交 primary 失败，改为本进程处理: {e}")
+        await handler(data)
+
+    return wrapped
+
+
+def install_forwarders():
+    """
+    [接口] 按角色安装链路转发：worker 的 MC 流量全部转交 primary；
+    primary 在本进程没有 NapCat 连接时把 QQ 流量转交 worker
+    """
+    role = current_role()
+    if role == ROLE_WORKER:
+        client4McPlugin.register_mc_forwarder(_forward_mc_notify, _forward_mc_call)
+    elif role == ROLE_PRIMARY:
+        server4NapCat.register_napcat_forwarder(_forward_napcat_notify, _forward_napcat_call)
+    if role != ROLE_SINGLE:
+        server4NapCat.enable_shared_listener()
+
+
+async def run_ipc_task():
+    """
+    [接口] 后台任务：primary 监听 IPC 套接字，worker 连接 primary (断开后自动重连)
+    """
+    if current_role() == ROLE_PRIMARY:
+        await _run_primary_server()
+    elif current_role() == ROLE_WORKER:
+        await _run_worker_client()
+
+
+async def close():
+    """
+    [接口] 关闭流程：关闭 IPC 监听与连接
+    """
+    if _ipc_server is not None:
+        _ipc_server.close()
+    for peer in list(_workers) + ([_primary] if _primary else []):
+        peer.writer.close()
+
+
+def get_cluster_stats() -> Dict[str, Any]:
+    """
+    [接口] 多进程统计：角色、对端连接、按帧类型的收发数
+    """
+    peers = list(_workers) if current_role() == ROLE_PRIMARY else ([_primary] if _primary else [])
+    return {
+        "role": current_role(),
+        "index": worker_index(),
+        "peers": [{"name": p.name, "napcat_connections": p.napcat_connections} for p in peers],
+        "frames": {direction: dict(counts) for direction, counts in _frame_stats.items()},
+        "bytes": dict(_byte_stats),
+    }
+
+
+# ==========================================
+# 内部实现细节 (Internal Implementation)
+# ==========================================
+
+def _count_frame(direction: str, frame_type: int, size: int):
+    counts = _frame_stats[direction]
+    name = _FRAME_NAMES.get(frame_type, str(frame_type))
+    counts[name] = counts.get(name, 0) + 1
+    _byte_stats[direction] += size
+
+
+def _is_group_command(data: Dict[str, Any]) -> bool:
+    if data.get("post_type") != "message" or not config.QQ_COMMAND_ENABLE:
+        return False
+    return match_command((data.get("raw_message") or "").strip()) is not None
+
+
+# --- primary 侧 ---
+
+async def _run_primary_server():
+    global _ipc_server
+    path = config.CLUSTER_IPC_SOCKET
+    if os.path.exists(path):
+        os.unlink(path)
+    _ipc_server = await asyncio.start_unix_server(_on_worker_connected, path)
+    logger.info(f"[多进程] primary 已监听 IPC 套接字: {path}")
+    async with _ipc_server:
+        await _ipc_server.serve_forever()
+
+
+async def _on_worker_connected(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    peer = _Peer("worker", reader, writer)
+    _workers.append(peer)
+    try:
+        await peer.serve({
+            FRAME_STATUS: _on_status,
+            FRAME_MC_NOTIFY: _on_mc_notify,
+            FRAME_MC_CALL: _on_mc_call,
+            FRAME_QQ_EVENT: _on_qq_event,
+        })
+    finally:
+        _workers.remove(peer)
+        logger.info(f"[多进程] {peer.name} 已断开 IPC 连接")
+
+
+async def _on_status(peer: "_Peer", body: Dict[str, Any]):
+    if "index" in body:
+        peer.name = f"worker-{body['index']}"
+    peer.napcat_connections = int(body.get("napcat", 0))
+
+
+async def _on_mc_notify(_peer: "_Peer", body: Dict[str, Any]):
+    await client4McPlugin.send_to_mc_async_notification(body["kind"], **body.get("kwargs", {}))
+
+
+async def _on_mc_call(_peer: "_Peer", body: Dict[str, Any]) -> Dict[str, Any]:
+    return await client4McPlugin.call_mc_plugin_api(body["kind"], body.get("params"), body.get("timeout", 10.0))
+
+
+async def _on_qq_event(_peer: "_Peer", body: Dict[str, Any]):
+    if _qq_handler is not None:
+        await _qq_handler(body["data"])
+
+
+def _pick_napcat_worker() -> Optional["_Peer"]:
+    """
+    [内部] 轮询选择一个持有 NapCat 连接的 worker
+    """
+    candidates = [peer for peer in _workers if peer.napcat_connections > 0]
+    if not candidates:
+        return None
+    return candidates[next(_worker_cursor) % len(candidates)]
+
+
+async def _forward_napcat_notify(payload: Dict[str, Any]) -> bool:
+    peer = _pick_napcat_worker()
+    if peer is None:
+        logger.error("[多进程] 没有任何进程持有 NapCat 连接，通知已丢弃")
+        return False
+    try:
+        await peer.send(FRAME_NAPCAT_NOTIFY, {"payload": payload})
+        return True
+    except Exception as e:
+        logger.error(f"[多进程] 转交 NapCat 通知到 {peer.name} 失败: {e}")
+        return False
+
+
+async def _forward_napcat_call(action: str, params: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    peer = _pick_napcat_worker()
+    if peer is None:
+        raise ConnectionError("No active NapCat connections in any worker process.")
+    return await peer.call(FRAME_NAPCAT_CALL, {"action": action, "params": params}, timeout)
+
+
+# --- worker 侧 ---
+
+async def _run_worker_client():
+    global _primary
+    path = config.CLUSTER_IPC_SOCKET
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            await asyncio.sleep(_STATUS_INTERVAL)
+            continue
+
+        peer = _Peer("primary", reader, writer)
+        _primary = peer
+        logger.info(f"[多进程] worker-{worker_index()} 已连接 primary")
+        reporter = asyncio.get_running_loop().create_task(_report_status_loop(peer))
+        try:
+            await peer.serve({
+                FRAME_NAPCAT_NOTIFY: _on_napcat_notify,
+                FRAME_NAPCAT_CALL: _on_napcat_call,
+            })
+        finally:
+            reporter.cancel()
+            _primary = None
+        logger.warning("[多进程] 与 primary 的 IPC 连接已断开，正在重连...")
+        await asyncio.sleep(_STATUS_INTERVAL)
+
+
+async def _report_status_loop(peer: "_Peer"):
+    """
+    [内部] 连接数变化时向 primary 上报 (primary 据此选择 MC → QQ 的出口)
+    """
+    last = None
+    while True:
+        count = len(server4NapCat.get_connection_liveness())
+        if count != last:
+            await peer.send(FRAME_STATUS, {"index": worker_index(), "napcat": count})
+            last = count
+        await asyncio.sleep(_STATUS_INTERVAL)
+
+
+async def _on_napcat_notify(_peer: "_Peer", body: Dict[str, Any]):
+    await server4NapCat.send_to_napcat_async_notification(body["payload"])
+
+
+async def _on_napcat_call(_peer: "_Peer", body: Dict[str, Any]) -> Dict[str, Any]:
+    return await server4NapCat.call_napcat_api(body["action"], body.get("params"), body.get("timeout", 10.0))
+
+
+async def _forward_mc_notify(kind: str, kwargs: Dict[str, Any]) -> bool:
+    if _primary is None:
+        logger.error(f"[多进程] 尚未连接 primary，发往 MC 的通知已丢弃: kind={kind}")
+        return False
+    try:
+        await _primary.send(FRAME_MC_NOTIFY, {"kind": kind, "kwargs": kwargs})
+        return True
+    except Exception as e:
+        logger.error(f"[多进程] 转交 MC 通知失败: {e}")
+        return False
+
+
+async def _forward_mc_call(kind: str, params: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    if _primary is None:
+        raise ConnectionError("Not connected to the primary process.")
+    return await _primary.call(FRAME_MC_CALL, {"kind": kind, "params": params}, timeout)